@@ -1,7 +1,6 @@
 import logging
 from datetime import datetime, timezone as dt_timezone
 from urllib.parse import urlencode
-import stripe
 from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework import status
@@ -23,8 +22,6 @@ from .utils import (
 # NOTE: Will be importing shared-core pricing methods shortly
 # from billing.pricing import calculateFulfillmentFee ...
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +30,13 @@ BASE_SUB_PRICE = 'price_1T52ikBQXaySV5ukpVrv7EcZ' # $30 AUD
 EXTRA_SEAT_PRICE = 'price_1T52ilBQXaySV5uk2fmUWXlw' # $5 AUD
 
 
+def _stripe():
+    # Imported on first use so workers and non-payment endpoints don't pay for the SDK at boot.
+    import stripe
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
 def _frontend_base_url():
     return getattr(settings, 'FRONTEND_BASE_URL', 'http://localhost:5173').rstrip('/')
 
@@ -340,7 +344,7 @@ def create_subscription_checkout(request):
     customer_name = billing_account_display_name(account)
     if not subscription.stripe_customer_id:
         try:
-            customer = stripe.Customer.create(
+            customer = _stripe().Customer.create(
                 email=customer_email,
                 name=customer_name
             )
@@ -357,7 +361,7 @@ def create_subscription_checkout(request):
     try:
         # 3. IF INVOICE: Create subscription directly without checkout, set to send_invoice
         if payment_method_input == 'invoice':
-            sub = stripe.Subscription.create(
+            sub = _stripe().Subscription.create(
                 customer=subscription.stripe_customer_id,
                 items=line_items,
                 collection_method='send_invoice',
@@ -381,7 +385,7 @@ def create_subscription_checkout(request):
 
         # 4. IF CARD: Create a Stripe Checkout Session for collection
         else:
-            checkout_session = stripe.checkout.Session.create(
+            checkout_session = _stripe().checkout.Session.create(
                 customer=subscription.stripe_customer_id,
                 payment_method_types=['card'],
                 line_items=line_items,
@@ -462,7 +466,7 @@ def update_subscription_seats(request):
             return Response(payload)
 
         success_url, cancel_url = _extra_seat_return_urls(account, platform=platform)
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = _stripe().checkout.Session.create(
             customer=subscription.stripe_customer_id,
             payment_method_types=['card'],
             line_items=[{'price': EXTRA_SEAT_PRICE, 'quantity': desired_extra_seats}],
@@ -529,8 +533,7 @@ def charge_shift_fulfillment(request, shift_id):
             shift=shift,
             status=ShiftOffer.Status.ACCEPTED_AWAITING_PAYMENT,
         ).exists()
-        shift.payment_status = 'PENDING' if has_pending_payment else 'PAID'
-        shift.save(update_fields=['payment_status'])
+        shift.set_payment_status('PENDING' if has_pending_payment else 'PAID')
         if billing_state == BILLING_STATE_PRE_LIVE:
             return Response({
                 'free': True,
@@ -602,7 +605,7 @@ def charge_shift_fulfillment(request, shift_id):
         else:
             billing_contact = account.get('billing_contact') or user
             session_kwargs['customer_email'] = getattr(billing_contact, 'email', None) or user.email
-        checkout_session = stripe.checkout.Session.create(**session_kwargs)
+        checkout_session = _stripe().checkout.Session.create(**session_kwargs)
         return Response({'url': checkout_session.url})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -709,7 +712,7 @@ def charge_penalty(request, shift_id):
         else:
             billing_contact = account.get('billing_contact') or user
             session_kwargs['customer_email'] = getattr(billing_contact, 'email', None) or user.email
-        checkout_session = stripe.checkout.Session.create(**session_kwargs)
+        checkout_session = _stripe().checkout.Session.create(**session_kwargs)
         return Response({'url': checkout_session.url})
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -727,7 +730,8 @@ def stripe_webhook(request):
     """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-    
+    stripe = _stripe()
+
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
@@ -806,8 +810,7 @@ def stripe_webhook(request):
                             shift=shift_obj,
                             status=ShiftOffer.Status.ACCEPTED_AWAITING_PAYMENT,
                         ).exists()
-                        shift_obj.payment_status = 'PENDING' if has_pending_payment else 'PAID'
-                        shift_obj.save(update_fields=['payment_status'])
+                        shift_obj.set_payment_status('PENDING' if has_pending_payment else 'PAID')
                 except Exception as e:
                     logger.warning('Could not finalize paid shift offers: %s', e)
 
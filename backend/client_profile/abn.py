@@ -0,0 +1,223 @@
+"""
+ABN register (ABR) lookups with a shared TTL cache.
+
+Owner, pharmacy and worker forms often check the same ABN within minutes, and
+every re-verification used to scrape and parse the ABR page again. Results are
+cached per ABN (``ABN_CACHE_TTL``); numbers that fail the ABN checksum are
+rejected without a request, and numbers the register doesn't know are cached
+for ``ABN_NEGATIVE_CACHE_TTL``. Concurrent lookups of one ABN are coalesced:
+threads in a process share a lock, and processes elect one fetcher through a
+cache lock while the others wait for its result.
+"""
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+ABN_WEIGHTS = (10, 1, 3, 5, 7, 9, 11, 13, 15, 17, 19)
+CACHE_PREFIX = "abn-lookup:v1:"
+LOCK_PREFIX = "abn-lookup-lock:"
+WAIT_POLL_SECONDS = 0.2
+
+# Striped in-process locks: a fixed pool, so memory doesn't grow with each ABN
+# seen. Two uncached ABNs on one stripe wait for each other's fetch.
+LOCAL_LOCK_STRIPES = 64
+_local_locks = tuple(threading.Lock() for _ in range(LOCAL_LOCK_STRIPES))
+
+
+@dataclass(frozen=True)
+class AbnLookup:
+    abn: str
+    legal_name: str = ""
+    fields: dict = field(default_factory=dict)
+    found: bool = False
+    html: str | None = None
+    cached: bool = False
+
+
+def normalise_abn(abn_number):
+    return re.sub(r"\D", "", str(abn_number or ""))
+
+
+def is_valid_abn(abn):
+    """The ATO's ABN checksum: weighted sum with the first digit less one, mod 89."""
+    if len(abn) != 11:
+        return False
+    digits = [int(char) for char in abn]
+    digits[0] -= 1
+    return sum(d * w for d, w in zip(digits, ABN_WEIGHTS)) % 89 == 0
+
+
+def fetch_abn_html(abn):
+    """Raw ABR page, or ``None`` on a network/HTTP error (never cached)."""
+    import requests
+
+    url = settings.ABN_LOOKUP_URL.format(abn=abn)
+    logger.info(f"[abn_lookup] Fetching {url}")
+    try:
+        resp = requests.get(url, timeout=settings.ABN_LOOKUP_TIMEOUT)
+        resp.raise_for_status()
+    except Exception as e:
+        logger.info(f"[abn_lookup] Error fetching ABN: {e}")
+        return None
+    return resp.text
+
+
+def parse_abn_html(html_text: str) -> dict:
+    """
+    Parse ABR HTML to lift:
+      - entity_name (legalName)
+      - entity_type
+      - abn_status  (raw line e.g. 'Active from 18 Aug 2020')
+      - abn_gst_registered (bool)
+      - abn_gst_from, abn_gst_to (date or None)
+    """
+    out = {}
+    if not html_text:
+        return out
+
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_text, "html.parser")
+    rows = soup.select('div[itemtype="http://schema.org/LocalBusiness"] table tbody tr')
+
+    def _clean(s: str) -> str:
+        # normalise non-breaking spaces etc.
+        return (s or "").replace("\xa0", " ").strip()
+
+    for r in rows:
+        th_el = r.find('th')
+        td_el = r.find('td')
+        th = _clean(th_el.get_text(" ", strip=True) if th_el else "")
+        td = _clean(td_el.get_text(" ", strip=True) if td_el else "")
+
+        if th.startswith("Entity name:"):
+            span = td_el.find('span', {"itemprop": "legalName"}) if td_el else None
+            out["entity_name"] = _clean(span.get_text(" ", strip=True) if span else td)
+
+        elif th.startswith("Entity type:"):
+            out["entity_type"] = td
+
+        elif th.startswith("ABN status:"):
+            out["abn_status"] = td
+
+        elif th.startswith("Goods") and "GST" in th:
+            # Examples seen:
+            #   'Not currently registered for GST'
+            #   'Registered from 19 May 2025'
+            #   'Registered from 1 September 2023 to 30 June 2024'
+            txt = td
+            out["gst_text"] = txt
+
+            low = txt.lower()
+            if "not currently" in low:
+                out["abn_gst_registered"] = False
+                out["abn_gst_from"] = None
+                out["abn_gst_to"] = None
+            else:
+                out["abn_gst_registered"] = True
+
+                # allow full or abbreviated month names, and optional "to ..."
+                # normalise multiples spaces
+                import datetime
+                txt_norm = re.sub(r"\s+", " ", txt)
+
+                # try to capture "from <date>"
+                m_from = re.search(
+                    r"\bfrom\s+(\d{1,2}\s+[A-Za-z]+\s+\d{4})",
+                    txt_norm,
+                    flags=re.IGNORECASE,
+                )
+                # try to capture "to <date>" (rare)
+                m_to = re.search(
+                    r"\bto\s+(\d{1,2}\s+[A-Za-z]+\s+\d{4})",
+                    txt_norm,
+                    flags=re.IGNORECASE,
+                )
+
+                def _parse_date(s: str):
+                    for fmt in ("%d %b %Y", "%d %B %Y"):
+                        try:
+                            return datetime.datetime.strptime(s, fmt).date()
+                        except Exception:
+                            pass
+                    return None
+
+                out["abn_gst_from"] = _parse_date(m_from.group(1)) if m_from else None
+                out["abn_gst_to"]   = _parse_date(m_to.group(1)) if m_to else None
+
+    if "entity_name" not in out:
+        tag = soup.find("span", {"itemprop": "legalName"})
+        if tag:
+            out["entity_name"] = _clean(tag.get_text(strip=True))
+
+    return out
+
+
+def _local_lock(abn):
+    return _local_locks[hash(abn) % LOCAL_LOCK_STRIPES]
+
+
+def _fetch_and_store(abn):
+    html = fetch_abn_html(abn)
+    if html is None:
+        # ABR unreachable: report a miss but let the next caller retry.
+        return AbnLookup(abn=abn)
+    fields = parse_abn_html(html)
+    legal_name = fields.get("entity_name", "")
+    result = AbnLookup(abn=abn, legal_name=legal_name, fields=fields, found=bool(legal_name), html=html)
+    ttl = settings.ABN_CACHE_TTL if result.found else settings.ABN_NEGATIVE_CACHE_TTL
+    cache.set(CACHE_PREFIX + abn, {"legal_name": legal_name, "fields": fields, "found": result.found}, ttl)
+    return result
+
+
+def _from_cache(abn):
+    hit = cache.get(CACHE_PREFIX + abn)
+    return AbnLookup(abn=abn, cached=True, **hit) if hit is not None else None
+
+
+def _wait_for_other_process(abn):
+    deadline = time.monotonic() + settings.ABN_LOOKUP_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_SECONDS)
+        hit = _from_cache(abn)
+        if hit is not None:
+            return hit
+        if cache.get(LOCK_PREFIX + abn) is None:
+            break
+    return None
+
+
+def lookup_abn(abn_number):
+    """Cached, coalesced ABR lookup. ``html`` is only set on a fresh fetch."""
+    abn = normalise_abn(abn_number)
+    if not is_valid_abn(abn):
+        logger.info(f"[abn_lookup] {abn_number!r} fails the ABN checksum; not querying ABR.")
+        return AbnLookup(abn=abn)
+
+    hit = _from_cache(abn)
+    if hit is not None:
+        return hit
+
+    with _local_lock(abn):
+        # Another thread in this process may have fetched it while we waited.
+        hit = _from_cache(abn)
+        if hit is not None:
+            return hit
+
+        lock_key = LOCK_PREFIX + abn
+        if cache.add(lock_key, 1, settings.ABN_LOOKUP_TIMEOUT + 5):
+            try:
+                return _fetch_and_store(abn)
+            finally:
+                cache.delete(lock_key)
+
+        # Another process is fetching this ABN; take its result if it lands in time.
+        hit = _wait_for_other_process(abn)
+        return hit if hit is not None else _fetch_and_store(abn)
@@ -0,0 +1,75 @@
+"""
+A local stand-in for the ABN register so ABN parsing and caching can be tested
+and benchmarked offline. Point ``settings.ABN_LOOKUP_URL`` at ``url_template``.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ABR_ENTITY_PAGE = """<html><body>
+<div itemscope itemtype="http://schema.org/LocalBusiness">
+<table><tbody>
+<tr><th>Entity name:</th><td><span itemprop="legalName">{name}</span></td></tr>
+<tr><th>ABN status:</th><td>Active from 01 Nov 1999</td></tr>
+<tr><th>Entity type:</th><td>Individual/Sole Trader</td></tr>
+<tr><th>Goods &amp; Services Tax (GST):</th><td>Registered from 19 May 2025</td></tr>
+</tbody></table>
+</div>
+</body></html>"""
+
+ABR_NO_MATCH_PAGE = "<html><body><p>No record found for this ABN.</p></body></html>"
+
+
+class StubAbrServer:
+    """
+    Serves ABR-shaped pages for ``entities`` (ABN -> legal name) and a no-match
+    page for anything else, after ``latency_ms``. ``requests`` counts hits.
+    """
+
+    def __init__(self, entities=None, latency_ms=0):
+        self.entities = dict(entities or {})
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url_template(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/ABN/View?id={{abn}}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._count_lock:
+                    stub.requests += 1
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                abn = parse_qs(urlparse(self.path).query).get("id", [""])[0]
+                name = stub.entities.get(abn)
+                body = (ABR_ENTITY_PAGE.format(name=name) if name else ABR_NO_MATCH_PAGE).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
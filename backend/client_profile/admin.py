@@ -426,12 +426,24 @@ class PillLedgerEntryAdmin(admin.ModelAdmin):
     autocomplete_fields = ("user", "rule", "referral_event", "shift")
 
 
+@admin.register(PillBalance)
+class PillBalanceAdmin(admin.ModelAdmin):
+    list_display = ("user", "balance", "updated_at")
+    search_fields = ("user__email",)
+    readonly_fields = ("user", "balance", "updated_at")
+
+
 @admin.register(ShiftSlotAssignment)
 class ShiftSlotAssignmentAdmin(admin.ModelAdmin):
-    list_display = ('id','shift','slot','user','assigned_at')
+    list_display = ('id','shift','slot','user','starts_at','assigned_at')
     list_filter  = ('shift','user')
     search_fields = ('user__username','shift__pharmacy__name')
 
+@admin.register(ShiftReminderDelivery)
+class ShiftReminderDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('id','assignment','starts_at','sent_at')
+    readonly_fields = ('assignment','starts_at','run_token','sent_at')
+
 @admin.register(ShiftInterest)
 class ShiftInterestAdmin(admin.ModelAdmin):
     list_display = ('id','shift','slot','user','revealed','expressed_at')
@@ -472,6 +484,19 @@ admin.site.register(RefereeResponse)
 
 admin.site.register(MembershipApplication)
 
+
+@admin.register(MembershipImportJob)
+class MembershipImportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "created_by", "status", "processed_rows", "total_rows", "created_count", "created_at")
+    list_filter = ("status",)
+    search_fields = ("created_by__email",)
+    readonly_fields = (
+        "created_by", "status", "total_rows", "processed_rows", "created_count",
+        "results", "errors", "created_at", "updated_at", "finished_at",
+    )
+    exclude = ("rows",)
+
+
 admin.site.register(Message)
 
 
@@ -562,6 +587,15 @@ class RatingAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(RatingAggregate)
+class RatingAggregateAdmin(admin.ModelAdmin):
+    list_display = ("id", "worker", "pharmacy", "average", "count", "updated_at")
+    search_fields = ("worker__email", "pharmacy__name")
+    readonly_fields = (
+        "worker", "pharmacy", "count", "total", "average",
+        "stars_1", "stars_2", "stars_3", "stars_4", "stars_5", "updated_at",
+    )
+
 @admin.register(PharmacyHubPost)
 class PharmacyHubPostAdmin(admin.ModelAdmin):
     list_display = (
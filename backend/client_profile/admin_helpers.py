@@ -6,6 +6,7 @@ from django.contrib.auth import get_user_model
 from django.db.models import QuerySet
 
 from .models import PharmacyAdmin, Pharmacy
+from .permission_context import get_permission_context
 
 
 AdminCapability = str
@@ -43,30 +44,33 @@ def assignment_for(user, pharmacy) -> Optional[PharmacyAdmin]:
     )
 
 
+# The checks below read the user's request-scoped permission context, so
+# repeated checks (one per row of a list) don't query PharmacyAdmin each time.
+# ``pharmacy`` may be a Pharmacy or its id.
+
 def is_admin_of(user, pharmacy_id: int) -> bool:
     if user is None or pharmacy_id is None:
         return False
-    return PharmacyAdmin.objects.filter(
-        user=user,
-        pharmacy_id=pharmacy_id,
-        is_active=True,
-    ).exists()
+    return get_permission_context(user).is_admin_of(pharmacy_id)
 
 
 def has_admin_capability(user, pharmacy, capability: AdminCapability) -> bool:
-    assignment = assignment_for(user, pharmacy)
-    if not assignment:
+    if user is None or pharmacy is None:
         return False
-    return assignment.has_capability(capability)
+    return get_permission_context(user).has_admin_capability(getattr(pharmacy, "pk", pharmacy), capability)
 
 
 def is_owner_admin(user, pharmacy) -> bool:
-    assignment = assignment_for(user, pharmacy)
-    return bool(assignment and assignment.admin_level == PharmacyAdmin.AdminLevel.OWNER)
+    if user is None or pharmacy is None:
+        return False
+    level = get_permission_context(user).admin_level(getattr(pharmacy, "pk", pharmacy))
+    return level == PharmacyAdmin.AdminLevel.OWNER
 
 
 def is_any_admin(user) -> bool:
-    return admin_assignments_for(user).exists()
+    if user is None:
+        return False
+    return bool(get_permission_context(user).admin_levels)
 
 
 def can_manage_admins(user, pharmacy) -> bool:
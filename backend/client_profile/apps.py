@@ -1,5 +1,11 @@
 from django.apps import AppConfig
-from django.db.utils import OperationalError, ProgrammingError
+from django.db.models.signals import post_migrate
+
+
+def _ensure_calendar_schedules(sender, **kwargs):
+    from .calendar_schedules import ensure_calendar_schedules
+    ensure_calendar_schedules()
+
 
 class ClientProfileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -11,9 +17,6 @@ class ClientProfileConfig(AppConfig):
         Importing signals here connects the signal handlers.
         """
         import client_profile.signals
-        try:
-            from .calendar_schedules import ensure_calendar_schedules
-            ensure_calendar_schedules()
-        except (OperationalError, ProgrammingError):
-            # Database might not be ready during migrations or startup.
-            pass
+        # Schedules are synced after `migrate` (run on every deploy) instead of on
+        # every web/worker boot, so process start-up doesn't touch the database.
+        post_migrate.connect(_ensure_calendar_schedules, sender=self)
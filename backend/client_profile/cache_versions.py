@@ -0,0 +1,70 @@
+"""
+Version stamps for caches built from a user's memberships and the pharmacies
+and organisations they can see (the hub context, the authenticated-user
+payload).
+
+A cached entry records the versions of every user, pharmacy and organisation
+it was built from and is only served while they all still match. Signals
+(``client_profile.signals``) bump the versions when memberships, admin
+assignments, organisation roles, community groups or pharmacy/organisation
+profiles change, so one change invalidates every dependent cache at once
+without the caches having to know about each other.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_PREFIX = "cache-version:"
+
+
+def user_version_key(user_id):
+    return f"{VERSION_PREFIX}user:{user_id}"
+
+
+def pharmacy_version_key(pharmacy_id):
+    return f"{VERSION_PREFIX}pharmacy:{pharmacy_id}"
+
+
+def organization_version_key(organization_id):
+    return f"{VERSION_PREFIX}organization:{organization_id}"
+
+
+def dependency_keys(pharmacy_ids=(), organization_ids=()):
+    return [pharmacy_version_key(pk) for pk in pharmacy_ids if pk] + [
+        organization_version_key(pk) for pk in organization_ids if pk
+    ]
+
+
+def current_versions(keys):
+    keys = list(keys)
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # A version that was evicted (or never bumped) gets a fresh stamp rather
+        # than a fixed default, so entries stored under the old one stop matching.
+        # ``add`` lets concurrent readers agree on a single seed.
+        version = time.time_ns()
+        for key in missing:
+            cache.add(key, version, None)
+        found.update(cache.get_many(missing))
+    return {key: found.get(key) for key in keys}
+
+
+def is_current(versions):
+    return current_versions(versions) == versions
+
+
+def bump_cache_versions(user_ids=(), pharmacy_ids=(), organization_ids=()):
+    """Invalidate every cached entry built from any of these rows."""
+    keys = [user_version_key(pk) for pk in user_ids if pk] + dependency_keys(pharmacy_ids, organization_ids)
+    if not keys:
+        return
+
+    def bump():
+        version = time.time_ns()
+        cache.set_many({key: version for key in keys}, None)
+
+    bump()
+    # Again after commit, in case an entry was rebuilt from the old rows meanwhile.
+    transaction.on_commit(bump)
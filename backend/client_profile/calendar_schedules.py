@@ -5,7 +5,7 @@ from typing import Iterable
 
 def ensure_calendar_schedules() -> None:
     """
-    Create or update Django-Q schedules for calendar tasks.
+    Create or update Django-Q schedules for calendar and hub maintenance tasks.
     """
     from django_q.models import Schedule
 
@@ -28,6 +28,12 @@ def ensure_calendar_schedules() -> None:
             "schedule_type": Schedule.HOURLY,
             "repeats": -1,
         },
+        {
+            "name": "hub-counters-repair-daily",
+            "func": "client_profile.tasks.repair_hub_counters",
+            "schedule_type": Schedule.DAILY,
+            "repeats": -1,
+        },
     ]
 
     for definition in schedule_defs:
@@ -6,13 +6,18 @@ Calendar-related scheduled tasks.
 from __future__ import annotations
 
 import logging
+import uuid
+from calendar import isleap, monthrange
 from datetime import date, timedelta
+from functools import reduce
+from operator import or_
+from types import SimpleNamespace
 
-from django.apps import apps
 from django.db.models import Q
 from django.utils import timezone
 
 from .notifications import notify_users
+from .recurrence_utils import expand_recurrence_dates
 from .timezone_utils import get_pharmacy_timezone
 from .models import (
     CalendarEvent,
@@ -22,6 +27,7 @@ from .models import (
     ShiftSlotAssignment,
     WorkNote,
     WorkNoteAssignee,
+    WorkNoteDelivery,
 )
 
 logger = logging.getLogger(__name__)
@@ -31,76 +37,105 @@ logger = logging.getLogger(__name__)
 # Birthday Event Generation
 # ============================================================
 
-def generate_birthday_events_for_pharmacy(pharmacy_id: int, target_date: date | None = None) -> int:
+BIRTHDAY_LOOKAHEAD_DAYS = 30
+DOB_FIELDS = ("user__pharmacistonboarding__date_of_birth", "user__otherstaffonboarding__date_of_birth")
+
+
+def _birthday_window_q(field: str, start: date, end: date) -> Q:
     """
-    Generate birthday events for all active staff at a pharmacy.
-    Uses idempotent get_or_create based on (source_membership, date, source).
+    Q matching dates of birth in ``field`` whose month/day falls between
+    ``start`` and ``end`` (inclusive), one range per calendar month spanned.
+    29 February birthdays count as 28 February in non-leap years.
+    """
+    parts = []
+    day = start
+    while day <= end:
+        month_end = min(end, date(day.year, day.month, monthrange(day.year, day.month)[1]))
+        parts.append(Q(**{
+            f"{field}__month": day.month,
+            f"{field}__day__gte": day.day,
+            f"{field}__day__lte": month_end.day,
+        }))
+        if (month_end.month, month_end.day) == (2, 28) and not isleap(month_end.year):
+            parts.append(Q(**{f"{field}__month": 2, f"{field}__day": 29}))
+        day = month_end + timedelta(days=1)
+    return reduce(or_, parts)
+
+
+def _next_birthday(dob: date, on_or_after: date) -> date:
+    for year in (on_or_after.year, on_or_after.year + 1):
+        try:
+            birthday = dob.replace(year=year)
+        except ValueError:  # 29 February
+            birthday = date(year, 2, 28)
+        if birthday >= on_or_after:
+            return birthday
+    return birthday
+
 
-    Returns the number of birthday events created.
+def generate_birthday_events(target_date: date | None = None, pharmacy_ids=None) -> int:
+    """
+    Create the birthday events for active memberships whose birthday falls in
+    the next BIRTHDAY_LOOKAHEAD_DAYS days, for every pharmacy (or only
+    ``pharmacy_ids``) at once.
+
+    A DOB lives on PharmacistOnboarding or OtherStaffOnboarding, not on Membership;
+    one query joins both to the memberships, pre-filtered on month/day. Existing
+    events are checked in one query and new ones are bulk-created (the
+    unique_birthday_event constraint absorbs a concurrent run).
+
+    Returns the number of new events submitted for insert. A concurrent run
+    may insert some of them first, in which case the constraint skips them, so
+    this counts attempts rather than rows this call inserted.
     """
     if target_date is None:
         target_date = timezone.now().date()
+    window_end = target_date + timedelta(days=BIRTHDAY_LOOKAHEAD_DAYS)
 
-    pharmacy = Pharmacy.objects.filter(id=pharmacy_id).first()
-    if not pharmacy:
-        return 0
-
-    created_count = 0
-
-    memberships = Membership.objects.filter(pharmacy_id=pharmacy_id, is_active=True).select_related("user")
-
-    for membership in memberships:
-        dob = _get_dob_for_membership(membership)
-        if not dob:
-            continue
-
-        birthday_this_year = dob.replace(year=target_date.year)
-        days_until = (birthday_this_year - target_date).days
-        if days_until < 0 or days_until > 30:
-            continue
-
-        user = membership.user
-        title = f"Birthday: {user.get_full_name() or user.email}"
-
-        event, created = CalendarEvent.objects.get_or_create(
-            source_membership=membership,
-            date=birthday_this_year,
+    memberships = Membership.objects.filter(is_active=True, pharmacy__isnull=False).filter(
+        reduce(or_, (_birthday_window_q(field, target_date, window_end) for field in DOB_FIELDS))
+    )
+    if pharmacy_ids is not None:
+        memberships = memberships.filter(pharmacy_id__in=pharmacy_ids)
+
+    candidates = []
+    for membership_id, pharmacy_id, first_name, last_name, email, pharmacist_dob, other_dob in memberships.values_list(
+        "id", "pharmacy_id", "user__first_name", "user__last_name", "user__email", *DOB_FIELDS
+    ):
+        # Pharmacist onboarding wins when a user has both.
+        birthday = _next_birthday(pharmacist_dob or other_dob, target_date)
+        if birthday <= window_end:
+            full_name = f"{first_name} {last_name}".strip()
+            candidates.append((membership_id, pharmacy_id, birthday, full_name or email, full_name))
+
+    existing = set(
+        CalendarEvent.objects.filter(
+            source=CalendarEvent.Source.BIRTHDAY,
+            source_membership_id__in=[membership_id for membership_id, *_ in candidates],
+            date__range=(target_date, window_end),
+        ).values_list("source_membership_id", "date")
+    )
+    events = [
+        CalendarEvent(
+            source_membership_id=membership_id,
+            pharmacy_id=pharmacy_id,
+            date=birthday,
+            series_end=birthday,
             source=CalendarEvent.Source.BIRTHDAY,
-            defaults={
-                "pharmacy": pharmacy,
-                "title": title,
-                "description": f"Happy Birthday to {user.get_full_name()}!",
-                "all_day": True,
-            },
+            title=f"Birthday: {display_name}",
+            description=f"Happy Birthday to {full_name}!",
+            all_day=True,
         )
+        for membership_id, pharmacy_id, birthday, display_name, full_name in candidates
+        if (membership_id, birthday) not in existing
+    ]
+    CalendarEvent.objects.bulk_create(events, batch_size=500, ignore_conflicts=True)
+    return len(events)
 
-        if created:
-            created_count += 1
-            logger.info(f"Created birthday event for membership {membership.id} on {birthday_this_year}")
-
-    return created_count
-
-
-def _get_dob_for_membership(membership: Membership) -> date | None:
-    """
-    Get date of birth for a membership by checking linked onboarding records.
-    DOB lives on PharmacistOnboarding and OtherStaffOnboarding, not on Membership.
-    """
-    user = membership.user
-    if not user:
-        return None
-
-    PharmacistOnboarding = apps.get_model("client_profile", "PharmacistOnboarding")
-    pharmacist_onboarding = PharmacistOnboarding.objects.filter(user=user).first()
-    if pharmacist_onboarding and pharmacist_onboarding.date_of_birth:
-        return pharmacist_onboarding.date_of_birth
 
-    OtherStaffOnboarding = apps.get_model("client_profile", "OtherStaffOnboarding")
-    other_onboarding = OtherStaffOnboarding.objects.filter(user=user).first()
-    if other_onboarding and other_onboarding.date_of_birth:
-        return other_onboarding.date_of_birth
-
-    return None
+def generate_birthday_events_for_pharmacy(pharmacy_id: int, target_date: date | None = None) -> int:
+    """Birthday events for one pharmacy's active staff; see generate_birthday_events."""
+    return generate_birthday_events(target_date, pharmacy_ids=[pharmacy_id])
 
 
 def generate_all_birthday_events():
@@ -109,212 +144,192 @@ def generate_all_birthday_events():
     Run this once per day (e.g., at midnight or early morning).
     """
     logger.info("[generate_all_birthday_events] Starting...")
-
-    today = timezone.now().date()
-    total_created = 0
-
-    pharmacy_ids = Pharmacy.objects.values_list("id", flat=True)
-
-    for pharmacy_id in pharmacy_ids:
-        try:
-            created = generate_birthday_events_for_pharmacy(pharmacy_id, today)
-            total_created += created
-        except Exception as e:
-            logger.error(f"[generate_all_birthday_events] Error for pharmacy {pharmacy_id}: {e}")
-
-    logger.info(f"[generate_all_birthday_events] Completed. Created {total_created} events.")
-    return total_created
+    attempted = generate_birthday_events(timezone.now().date())
+    logger.info(f"[generate_all_birthday_events] Completed. Submitted {attempted} new events.")
+    return attempted
 
 
 # ============================================================
 # Work Note Notifications
 # ============================================================
-
-def _users_already_notified(note_id, user_ids, day_str):
+#
+# Pharmacies are grouped by timezone (there are only a handful of distinct
+# values), so each hourly run works out "this local hour" once per group and
+# only queries pharmacies where it is the hour that matters. Recurring notes
+# are expanded for the local day with recurrence_utils. Each (note, user,
+# occurrence date) is claimed in WorkNoteDelivery before notifying, so the
+# shift-start run, the 9 AM fallback and any overlapping run notify a user at
+# most once per occurrence.
+
+
+def _timezone_groups(now_utc):
+    """[(local_now, timezone_values)] for the distinct Pharmacy.timezone values, merged by resolved zone."""
+    groups = {}
+    for tz_name in Pharmacy.objects.order_by().values_list("timezone", flat=True).distinct():
+        tz = get_pharmacy_timezone(SimpleNamespace(timezone=tz_name))
+        groups.setdefault(tz.key, (tz, []))[1].append(tz_name)
+    return [(now_utc.astimezone(tz), names) for tz, names in groups.values()]
+
+
+def _timezone_filter(names, field="timezone"):
+    """Q matching pharmacies whose ``field`` is one of ``names`` (blank/None meaning the default zone)."""
+    q = Q(**{f"{field}__in": [name for name in names if name]})
+    if not all(names):
+        q |= Q(**{f"{field}__isnull": True}) | Q(**{field: ""})
+    return q
+
+
+def _notes_occurring(pharmacy_days):
+    """
+    Work notes flagged notify_on_shift_start that occur on each pharmacy's
+    local day (``{pharmacy_id: local_date}``), recurring series included.
     """
-    Return subset of user_ids that already have a WORK_NOTE notification for this note and day.
+    by_day = {}
+    for pharmacy_id, day in pharmacy_days.items():
+        by_day.setdefault(day, []).append(pharmacy_id)
+    if not by_day:
+        return
+    day_q = reduce(or_, (
+        Q(pharmacy_id__in=pharmacy_ids)
+        & (Q(date=day) | Q(Q(series_end__isnull=True) | Q(series_end__gte=day), recurrence__isnull=False, date__lt=day))
+        for day, pharmacy_ids in by_day.items()
+    ))
+    notes = WorkNote.objects.filter(day_q, notify_on_shift_start=True).prefetch_related("assignees__membership")
+    for note in notes:
+        day = pharmacy_days[note.pharmacy_id]
+        if note.date == day or expand_recurrence_dates(note.date, note.recurrence, day, day):
+            yield note, day
+
+
+def _claim_deliveries(recipients, run_token):
     """
-    if not user_ids:
-        return set()
-    return set(
-        Notification.objects.filter(
-            type=Notification.Type.WORK_NOTE,
-            user_id__in=user_ids,
-            payload__work_note_id=str(note_id),
-            payload__date=day_str,
-        ).values_list("user_id", flat=True)
+    Insert WorkNoteDelivery rows for ``{(note, day): user_ids}`` and return
+    the same mapping restricted to the rows this run inserted.
+    """
+    rows = [
+        WorkNoteDelivery(work_note=note, user_id=user_id, occurrence_date=day, run_token=run_token)
+        for (note, day), user_ids in recipients.items()
+        for user_id in user_ids
+    ]
+    if not rows:
+        return {}
+    WorkNoteDelivery.objects.bulk_create(rows, ignore_conflicts=True)
+    won = set(
+        WorkNoteDelivery.objects.filter(run_token=run_token).values_list("work_note_id", "user_id", "occurrence_date")
     )
+    claimed = {}
+    for (note, day), user_ids in recipients.items():
+        user_ids = {user_id for user_id in user_ids if (note.id, user_id, day) in won}
+        if user_ids:
+            claimed[(note, day)] = user_ids
+    return claimed
+
+
+def _send_work_note_notifications(recipients, *, fallback=False):
+    """Claim, notify and stamp assignees; returns the number of users notified."""
+    claimed = _claim_deliveries(recipients, uuid.uuid4().hex)
+    sent = 0
+    now = timezone.now()
+    for (note, day), user_ids in claimed.items():
+        payload = {"work_note_id": note.id, "pharmacy_id": note.pharmacy_id, "date": str(day)}
+        if fallback:
+            payload["fallback"] = True
+        notify_users(
+            user_ids=list(user_ids),
+            title=f"Work Note: {note.title}",
+            body=(note.body or "")[:200],
+            notification_type=Notification.Type.WORK_NOTE,
+            action_url=f"/dashboard/calendar?pharmacy_id={note.pharmacy_id}&date={day}&note_id={note.id}",
+            payload=payload,
+        )
+        sent += len(user_ids)
+        logger.info(
+            f"Sent work note notification for note {note.id} ({day}) to {len(user_ids)} users "
+            f"(pharmacy {note.pharmacy_id})"
+        )
+    if claimed:
+        # Last-notified stamp on the assignment; recurring notes update it per occurrence.
+        WorkNoteAssignee.objects.filter(reduce(or_, (
+            Q(work_note_id=note.id, membership__user_id__in=user_ids)
+            for (note, _day), user_ids in claimed.items()
+        ))).update(notified_at=now)
+    return sent
 
 
 def send_shift_start_work_note_notifications():
     """
-    Hourly scheduled task to send work note notifications when shifts start.
-    Uses pharmacy timezone to determine the current hour/day locally.
+    Hourly scheduled task: notify staff whose shift starts this local hour
+    about the pharmacy's work notes for today.
     """
     logger.info("[send_shift_start_work_note_notifications] Starting...")
 
-    now_utc = timezone.now()
-    today_utc = now_utc.date()
-    date_window = [today_utc + timedelta(days=delta) for delta in (-1, 0, 1)]
-
-    assignments = (
-        ShiftSlotAssignment.objects.select_related("shift", "shift__pharmacy", "slot", "user")
-        .filter(Q(slot_date__in=date_window) | Q(slot_date__isnull=True))
-    )
-
-    pharmacy_assignment_map = {}
-    for assignment in assignments:
-        pharmacy = assignment.shift.pharmacy
-        if pharmacy is None:
-            continue
-        pharmacy_assignment_map.setdefault(pharmacy.id, {"pharmacy": pharmacy, "assignments": []})[
-            "assignments"
-        ].append(assignment)
-
-    notifications_sent = 0
-
-    for pharmacy_id, entry in pharmacy_assignment_map.items():
-        pharmacy = entry["pharmacy"]
-        tz = get_pharmacy_timezone(pharmacy)
-        local_now = now_utc.astimezone(tz)
-        local_today = local_now.date()
-        local_hour = local_now.hour
-
-        users_starting_now = set()
-        for assignment in entry["assignments"]:
-            slot_date = assignment.slot_date or getattr(assignment.slot, "date", None)
-            if slot_date != local_today:
-                continue
-            start_time = getattr(assignment.slot, "start_time", None)
-            if start_time and start_time.hour == local_hour:
-                users_starting_now.add(assignment.user_id)
-
-        if not users_starting_now:
-            continue
-
-        work_notes = (
-            WorkNote.objects.filter(
-                pharmacy_id=pharmacy_id,
-                date=local_today,
-                notify_on_shift_start=True,
-            ).prefetch_related("assignees__membership")
+    # Shifts starting this local hour, for every zone at once; the day is the zone's local date.
+    windows = []
+    for local_now, names in _timezone_groups(timezone.now()):
+        hour_start = local_now.replace(minute=0, second=0, microsecond=0)
+        windows.append(
+            _timezone_filter(names, "shift__pharmacy__timezone")
+            & Q(starts_at__gte=hour_start, starts_at__lt=hour_start + timedelta(hours=1))
         )
-
-        for note in work_notes:
-            recipient_user_ids = set()
-
-            if note.is_general:
-                recipient_user_ids = set(users_starting_now)
-            else:
-                for assignee in note.assignees.all():
-                    assignee_user_id = assignee.membership.user_id
-                    if assignee_user_id in users_starting_now and assignee.notified_at is None:
-                        recipient_user_ids.add(assignee_user_id)
-
-            if not recipient_user_ids:
-                continue
-
-            already = _users_already_notified(note.id, recipient_user_ids, str(local_today))
-            to_notify = recipient_user_ids - already
-            if not to_notify:
-                continue
-
-            action_url = f"/dashboard/calendar?pharmacy_id={pharmacy_id}&date={local_today}&note_id={note.id}"
-            notify_users(
-                user_ids=list(to_notify),
-                title=f"Work Note: {note.title}",
-                body=(note.body or "")[:200],
-                notification_type=Notification.Type.WORK_NOTE,
-                action_url=action_url,
-                payload={
-                    "work_note_id": note.id,
-                    "pharmacy_id": pharmacy_id,
-                    "date": str(local_today),
-                },
-            )
-
-            WorkNoteAssignee.objects.filter(
-                work_note=note,
-                membership__user_id__in=to_notify,
-                notified_at__isnull=True,
-            ).update(notified_at=local_now)
-
-            notifications_sent += len(to_notify)
-            logger.info(
-                f"Sent work note notification for note {note.id} to {len(to_notify)} users (pharmacy {pharmacy_id})"
-            )
-
+    starts = ShiftSlotAssignment.objects.filter(reduce(or_, windows)) if windows else ShiftSlotAssignment.objects.none()
+
+    users_starting_now = {}
+    pharmacy_days = {}
+    for pharmacy_id, user_id, starts_at, pharmacy_tz in starts.values_list(
+        "shift__pharmacy_id", "user_id", "starts_at", "shift__pharmacy__timezone"
+    ):
+        users_starting_now.setdefault(pharmacy_id, set()).add(user_id)
+        pharmacy_days[pharmacy_id] = starts_at.astimezone(
+            get_pharmacy_timezone(SimpleNamespace(timezone=pharmacy_tz))
+        ).date()
+
+    recipients = {}
+    for note, day in _notes_occurring(pharmacy_days):
+        starting = users_starting_now[note.pharmacy_id]
+        if note.is_general:
+            user_ids = set(starting)
+        else:
+            user_ids = {assignee.membership.user_id for assignee in note.assignees.all()} & starting
+        if user_ids:
+            recipients[(note, day)] = user_ids
+
+    notifications_sent = _send_work_note_notifications(recipients)
     logger.info(f"[send_shift_start_work_note_notifications] Completed. Sent {notifications_sent} notifications.")
     return notifications_sent
 
 
 def send_9am_work_note_fallback():
     """
-    9 AM (pharmacy local) scheduled task as fallback for work note notifications.
-    Sends notifications for all work notes for today that haven't been notified yet.
+    Hourly scheduled task; at 9 AM pharmacy-local time it notifies everyone a
+    work note for today applies to who hasn't been notified by a shift start.
     """
     logger.info("[send_9am_work_note_fallback] Starting...")
 
-    now_utc = timezone.now()
-    notifications_sent = 0
-
-    pharmacies = Pharmacy.objects.in_bulk(list(Pharmacy.objects.values_list("id", flat=True)))
-
-    for pharmacy_id, pharmacy in pharmacies.items():
-        tz = get_pharmacy_timezone(pharmacy)
-        local_now = now_utc.astimezone(tz)
+    pharmacy_days = {}
+    for local_now, names in _timezone_groups(timezone.now()):
         if local_now.hour != 9:
             continue
-        local_today = local_now.date()
-
-        work_notes = (
-            WorkNote.objects.filter(
-                pharmacy_id=pharmacy_id,
-                date=local_today,
-                notify_on_shift_start=True,
-            ).prefetch_related("assignees__membership__user")
+        pharmacy_days.update(
+            dict.fromkeys(Pharmacy.objects.filter(_timezone_filter(names)).values_list("id", flat=True), local_now.date())
         )
 
-        for note in work_notes:
-            recipient_user_ids = set()
-
-            if note.is_general:
-                memberships = Membership.objects.filter(pharmacy_id=note.pharmacy_id, is_active=True)
-                recipient_user_ids = set(memberships.values_list("user_id", flat=True))
-            else:
-                for assignee in note.assignees.filter(notified_at__isnull=True):
-                    recipient_user_ids.add(assignee.membership.user_id)
-
-            if not recipient_user_ids:
-                continue
-
-            already = _users_already_notified(note.id, recipient_user_ids, str(local_today))
-            to_notify = recipient_user_ids - already
-            if not to_notify:
-                continue
-
-            action_url = f"/dashboard/calendar?pharmacy_id={note.pharmacy_id}&date={local_today}&note_id={note.id}"
-            notify_users(
-                user_ids=list(to_notify),
-                title=f"Work Note: {note.title}",
-                body=(note.body or "")[:200],
-                notification_type=Notification.Type.WORK_NOTE,
-                action_url=action_url,
-                payload={
-                    "work_note_id": note.id,
-                    "pharmacy_id": note.pharmacy_id,
-                    "date": str(local_today),
-                    "fallback": True,
-                },
-            )
-
-            WorkNoteAssignee.objects.filter(
-                work_note=note,
-                membership__user_id__in=to_notify,
-                notified_at__isnull=True,
-            ).update(notified_at=local_now)
-
-            notifications_sent += len(to_notify)
-
+    notes = list(_notes_occurring(pharmacy_days))
+    general_pharmacy_ids = {note.pharmacy_id for note, _day in notes if note.is_general}
+    members = {}
+    for pharmacy_id, user_id in Membership.objects.filter(
+        pharmacy_id__in=general_pharmacy_ids, is_active=True
+    ).values_list("pharmacy_id", "user_id"):
+        members.setdefault(pharmacy_id, set()).add(user_id)
+
+    recipients = {}
+    for note, day in notes:
+        if note.is_general:
+            user_ids = members.get(note.pharmacy_id, set())
+        else:
+            user_ids = {assignee.membership.user_id for assignee in note.assignees.all()}
+        if user_ids:
+            recipients[(note, day)] = user_ids
+
+    notifications_sent = _send_work_note_notifications(recipients, fallback=True)
     logger.info(f"[send_9am_work_note_fallback] Completed. Sent {notifications_sent} notifications.")
     return notifications_sent
@@ -13,6 +13,7 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 
+from core.db_router import ReplicaReadMixin
 from users.org_roles import (
     membership_capabilities,
     membership_visible_pharmacies,
@@ -20,7 +21,8 @@ from users.org_roles import (
 )
 from users.models import OrganizationMembership
 
-from .admin_helpers import is_admin_of, pharmacies_user_admins
+from .admin_helpers import pharmacies_user_admins
+from .permission_context import get_permission_context
 from .hub.api import HubScopeResolver
 from .models import (
     CalendarEvent,
@@ -105,27 +107,30 @@ class CalendarScopeMixin:
         Check if user can create/edit calendar events for a pharmacy.
         Requires admin permissions or MANAGE_ROSTER capability.
         """
-        if is_admin_of(user, pharmacy_id):
-            return True
-        
-        # Check org-level permissions
-        pharmacy = Pharmacy.objects.filter(id=pharmacy_id).select_related('organization', 'owner').first()
-        if pharmacy and pharmacy.organization_id:
-            org_membership = OrganizationMembership.objects.filter(
-                user=user,
-                organization_id=pharmacy.organization_id,
-            ).first()
-            if org_membership:
-                caps = membership_capabilities(org_membership)
-                if OrgCapability.MANAGE_ROSTER in caps or OrgCapability.MANAGE_ADMINS in caps:
-                    return True
+        return pharmacy_id in self.calendar_manager_pharmacy_ids(user, [pharmacy_id])
 
-        if pharmacy and pharmacy.owner_id:
-            owner_user_id = getattr(pharmacy.owner, "user_id", None)
-            if owner_user_id == user.id:
-                return True
-        
-        return False
+    def calendar_manager_pharmacy_ids(self, user, pharmacy_ids):
+        """
+        The subset of ``pharmacy_ids`` the user can manage calendars for: as a
+        pharmacy admin, owner, or through an org role with MANAGE_ROSTER or
+        MANAGE_ADMINS. One query for the pharmacies' organisations at most.
+        """
+        ctx = get_permission_context(user)
+        managed = {
+            pharmacy_id
+            for pharmacy_id in pharmacy_ids
+            if ctx.is_admin_of(pharmacy_id) or ctx.is_owner_of(pharmacy_id)
+        }
+        remaining = set(pharmacy_ids) - managed
+        if remaining and ctx.org_roles:
+            for pharmacy_id, organization_id in Pharmacy.objects.filter(
+                id__in=remaining,
+                organization_id__in=list(ctx.org_roles),
+            ).values_list('id', 'organization_id'):
+                caps = ctx.org_capabilities(organization_id)
+                if OrgCapability.MANAGE_ROSTER in caps or OrgCapability.MANAGE_ADMINS in caps:
+                    managed.add(pharmacy_id)
+        return managed
     
     def can_create_work_notes(self, user, pharmacy_id):
         """
@@ -137,11 +142,7 @@ class CalendarScopeMixin:
             return True
         
         # Any active member of this pharmacy can create work notes
-        return Membership.objects.filter(
-            user=user,
-            pharmacy_id=pharmacy_id,
-            is_active=True,
-        ).exists()
+        return get_permission_context(user).membership_id(pharmacy_id) is not None
     
     def can_view_birthdays(self, user, pharmacy_id):
         """
@@ -423,10 +424,14 @@ class WorkNoteViewSet(
         return Response(self.get_serializer(note).data)
 
 
-class CalendarFeedView(CalendarScopeMixin, viewsets.ViewSet):
+class CalendarFeedView(ReplicaReadMixin, CalendarScopeMixin, viewsets.ViewSet):
     """
     Aggregated calendar feed combining events and work notes.
     Provides a single endpoint for the calendar UI.
+
+    Recurring items are expanded into one entry per occurrence; with
+    ``?compact=1`` each series is returned once with ``occurrence_dates``
+    (and, for work notes, per-date ``occurrence_state``).
     """
     permission_classes = [permissions.IsAuthenticated]
     
@@ -493,58 +498,33 @@ class CalendarFeedView(CalendarScopeMixin, viewsets.ViewSet):
             )
             work_note_query = work_note_query.filter(pharmacy_id__in=accessible_pharmacy_ids)
         
-        date_from_iso = date_from.isoformat()
-        recurring_event_q = (
-            Q(recurrence__isnull=False)
-            & ~Q(recurrence={})
-            & Q(date__lte=date_to)
-            & (
-                Q(recurrence__until_date__isnull=True)
-                | Q(recurrence__until_date="")
-                | Q(recurrence__until_date__gte=date_from_iso)
-            )
-        )
-        event_query = event_query.filter(
-            Q(recurrence__isnull=True, date__gte=date_from, date__lte=date_to)
-            | recurring_event_q
-        )
+        compact = str(request.query_params.get('compact', '')).strip().lower() in ("1", "true", "yes", "on")
 
-        recurring_note_q = (
-            Q(recurrence__isnull=False)
-            & ~Q(recurrence={})
-            & Q(date__lte=date_to)
-            & (
-                Q(recurrence__until_date__isnull=True)
-                | Q(recurrence__until_date="")
-                | Q(recurrence__until_date__gte=date_from_iso)
+        # One-off items by date; recurring series by their indexed [date, series_end]
+        # span (series_end is null when the rule has no until_date).
+        def in_window(query):
+            return query.filter(
+                Q(recurrence__isnull=True, date__gte=date_from, date__lte=date_to)
+                | Q(
+                    Q(series_end__isnull=True) | Q(series_end__gte=date_from),
+                    recurrence__isnull=False,
+                    date__lte=date_to,
+                )
             )
-        )
-        work_note_query = work_note_query.filter(
-            Q(recurrence__isnull=True, date__gte=date_from, date__lte=date_to)
-            | recurring_note_q
-        )
 
-        events = list(event_query.order_by('date', 'start_time'))
-        work_notes = list(work_note_query.order_by('date'))
+        events = list(in_window(event_query).order_by('date', 'start_time'))
+        work_notes = list(in_window(work_note_query).order_by('date'))
 
         note_pharmacy_ids = {note.pharmacy_id for note in work_notes}
-        membership_map = {}
-        if note_pharmacy_ids:
-            membership_map = {
-                m.pharmacy_id: m.id
-                for m in Membership.objects.filter(
-                    user=user,
-                    is_active=True,
-                    pharmacy_id__in=note_pharmacy_ids,
-                )
-            }
-
-        admin_pharmacy_ids = {
-            pharmacy_id
+        ctx = get_permission_context(user)
+        membership_map = {
+            pharmacy_id: ctx.membership_id(pharmacy_id)
             for pharmacy_id in note_pharmacy_ids
-            if self.can_manage_calendar(user, pharmacy_id)
+            if ctx.membership_id(pharmacy_id) is not None
         }
 
+        admin_pharmacy_ids = self.calendar_manager_pharmacy_ids(user, note_pharmacy_ids)
+
         completion_set = set()
         if work_notes and membership_map:
             completion_set = set(
@@ -577,70 +557,68 @@ class CalendarFeedView(CalendarScopeMixin, viewsets.ViewSet):
                 )
                 completion_by_map.setdefault(key, []).append(name)
 
-        serialized_events = []
-        for evt in events:
-            base_data = CalendarEventSerializer(evt, many=False, context={'request': request}).data
-            rec_dates = expand_recurrence_dates(evt.date, evt.recurrence, date_from, date_to)
-            if not rec_dates:
-                base_data['is_occurrence'] = False
-                serialized_events.append(base_data)
-            else:
-                for occurrence in rec_dates:
-                    occurrence_data = dict(base_data)
-                    occurrence_data['occurrence_date'] = occurrence.isoformat()
-                    occurrence_data['series_id'] = base_data['id']
-                    occurrence_data['is_occurrence'] = True
-                    occurrence_data['id'] = f"{base_data['id']}-{occurrence.isoformat()}"
-                    occurrence_data['date'] = occurrence.isoformat()
-                    serialized_events.append(occurrence_data)
-
-        serialized_notes = []
-        for note in work_notes:
-            base_data = WorkNoteSerializer(note, many=False, context={'request': request}).data
+        def note_state(note, occurrence):
+            state = {}
             membership_id = membership_map.get(note.pharmacy_id)
-            rec_dates = expand_recurrence_dates(note.date, note.recurrence, date_from, date_to)
-            if not rec_dates:
-                if membership_id:
-                    base_data['status'] = (
-                        WorkNote.Status.DONE
-                        if (note.id, membership_id, note.date) in completion_set
-                        else WorkNote.Status.OPEN
-                    )
-                if note.pharmacy_id in admin_pharmacy_ids:
-                    base_data['completed_by'] = completion_by_map.get(
-                        (note.id, note.date),
-                        [],
-                    )
-                base_data['is_occurrence'] = False
-                serialized_notes.append(base_data)
-            else:
-                for occurrence in rec_dates:
-                    occurrence_data = dict(base_data)
-                    if membership_id:
-                        occurrence_data['status'] = (
-                            WorkNote.Status.DONE
-                            if (note.id, membership_id, occurrence) in completion_set
-                            else WorkNote.Status.OPEN
-                        )
-                    if note.pharmacy_id in admin_pharmacy_ids:
-                        occurrence_data['completed_by'] = completion_by_map.get(
-                            (note.id, occurrence),
-                            [],
-                        )
-                    occurrence_data['occurrence_date'] = occurrence.isoformat()
-                    occurrence_data['series_id'] = base_data['id']
-                    occurrence_data['is_occurrence'] = True
-                    occurrence_data['id'] = f"{base_data['id']}-{occurrence.isoformat()}"
-                    occurrence_data['date'] = occurrence.isoformat()
-                    serialized_notes.append(occurrence_data)
+            if membership_id:
+                state['status'] = (
+                    WorkNote.Status.DONE
+                    if (note.id, membership_id, occurrence) in completion_set
+                    else WorkNote.Status.OPEN
+                )
+            if note.pharmacy_id in admin_pharmacy_ids:
+                state['completed_by'] = completion_by_map.get((note.id, occurrence), [])
+            return state
+
+        def expand(items, serialized, state=None):
+            """
+            Base rows serialized once (many=True), then repeated per occurrence;
+            in compact mode each series is returned once with its occurrence dates.
+            """
+            output = []
+            for item, base_data in zip(items, serialized):
+                rec_dates = expand_recurrence_dates(item.date, item.recurrence, date_from, date_to)
+                if not rec_dates:
+                    if not date_from <= item.date <= date_to:
+                        continue  # a series with no occurrence in the window
+                    base_data['is_occurrence'] = False
+                    if state:
+                        base_data.update(state(item, item.date))
+                    output.append(base_data)
+                elif compact:
+                    base_data['is_occurrence'] = False
+                    base_data['occurrence_dates'] = [occurrence.isoformat() for occurrence in rec_dates]
+                    if state:
+                        base_data['occurrence_state'] = {
+                            occurrence.isoformat(): state(item, occurrence) for occurrence in rec_dates
+                        }
+                    output.append(base_data)
+                else:
+                    for occurrence in rec_dates:
+                        occurrence_data = dict(base_data)
+                        if state:
+                            occurrence_data.update(state(item, occurrence))
+                        occurrence_data['occurrence_date'] = occurrence.isoformat()
+                        occurrence_data['series_id'] = base_data['id']
+                        occurrence_data['is_occurrence'] = True
+                        occurrence_data['id'] = f"{base_data['id']}-{occurrence.isoformat()}"
+                        occurrence_data['date'] = occurrence.isoformat()
+                        output.append(occurrence_data)
+            return output
 
+        serializer_context = {'request': request}
         data = {
-            'events': serialized_events,
-            'work_notes': serialized_notes,
+            'events': expand(events, CalendarEventSerializer(events, many=True, context=serializer_context).data),
+            'work_notes': expand(
+                work_notes,
+                WorkNoteSerializer(work_notes, many=True, context=serializer_context).data,
+                note_state,
+            ),
             'date_from': date_from.isoformat(),
             'date_to': date_to.isoformat(),
             'pharmacy_id': pharmacy_id,
             'organization_id': organization_id,
+            'compact': compact,
         }
         
         return Response(data)
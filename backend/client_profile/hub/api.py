@@ -8,7 +8,7 @@ from django.http import QueryDict
 
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, Q, F
+from django.db.models import Count, Q, F, Prefetch
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django_q.tasks import async_task
@@ -20,6 +20,7 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.db_router import ReplicaReadMixin
 from users.models import OrganizationMembership
 from client_profile.notifications import notify_users
 
@@ -43,6 +44,7 @@ from ..models import (
     PharmacyHubPollVote,
 )
 from ..serializers import (
+    HUB_RECENT_COMMENT_COUNT,
     HubCommentSerializer,
     HubCommunityGroupSerializer,
     HubOrganizationProfileSerializer,
@@ -55,6 +57,9 @@ from ..serializers import (
     HubPollCommentSerializer,
 )
 from ..file_validation import ATTACHMENT_UPLOAD_POLICY, validate_uploaded_file
+from .context_cache import cached_hub_context
+from .counters import adjust_comment_count, remove_reaction, set_reaction, soft_delete_comment
+from ..permission_context import get_permission_context
 
 
 CHEMISTTASKER_HUB_DEFINITIONS = {
@@ -148,6 +153,57 @@ def _notify_hub_post_owner(*, post, actor_user, title, body="", payload=None):
     )
 
 
+# Reverse one-to-ones ``_resolve_user_profile_photo`` walks for an author's photo.
+HUB_AUTHOR_PROFILE_RELATIONS = (
+    "pharmacistonboarding",
+    "otherstaffonboarding",
+    "exploreronboarding",
+    "owneronboarding",
+)
+
+
+def _author_profiles(*user_paths):
+    """``select_related`` paths that load each author's onboarding profiles with the row."""
+    return [f"{path}__{relation}" for path in user_paths for relation in HUB_AUTHOR_PROFILE_RELATIONS]
+
+
+def _viewer_reactions_prefetch(reaction_model, membership, user, member_field="member"):
+    """
+    The viewer's own reactions for every object on a page in one query, as
+    ``prefetched_viewer_reactions``. Matches the serializers' lookup: by
+    membership when acting through one, otherwise by user.
+    """
+    if membership is not None and member_field:
+        viewer = {member_field: membership}
+    else:
+        viewer = {"user": user}
+    return Prefetch(
+        "reactions",
+        queryset=reaction_model.objects.filter(**viewer),
+        to_attr="prefetched_viewer_reactions",
+    )
+
+
+def _recent_comments_prefetch(comment_model, *prefetches):
+    """
+    The latest ``HUB_RECENT_COMMENT_COUNT`` live comments of every post/poll on
+    a page, as ``prefetched_recent_comments``. Django turns the sliced prefetch
+    into one ``ROW_NUMBER() OVER (PARTITION BY ...)`` query, so busy threads
+    no longer load every comment.
+    """
+    queryset = (
+        comment_model.objects.filter(deleted_at__isnull=True)
+        .select_related(*_author_profiles("author_membership__user", "author_user"))
+        .prefetch_related(*prefetches)
+        .order_by("-created_at")
+    )
+    return Prefetch(
+        "comments",
+        queryset=queryset[:HUB_RECENT_COMMENT_COUNT],
+        to_attr="prefetched_recent_comments",
+    )
+
+
 def get_user_chemisttasker_hubs(user):
     hubs = [CHEMISTTASKER_HUB_DEFINITIONS[PharmacyHubPost.PlatformHub.PUBLIC]]
     top_role = (getattr(user, "role", "") or "").upper()
@@ -206,6 +262,7 @@ class HubAttachmentMixin:
 
 
 def get_user_pharmacy_permissions(user):
+    ctx = get_permission_context(user)
     memberships = (
         Membership.objects.filter(user=user, is_active=True)
         .select_related("pharmacy", "pharmacy__organization", "pharmacy__owner__user")
@@ -233,7 +290,7 @@ def get_user_pharmacy_permissions(user):
         entry = ensure_entry(pharmacy.id)
         entry["membership_id"] = membership.id
         entry["can_create_post"] = True
-        if membership.is_pharmacy_admin:
+        if ctx.is_admin_of(pharmacy.id):
             entry.update(
                 {
                     "can_manage_profile": True,
@@ -242,11 +299,14 @@ def get_user_pharmacy_permissions(user):
                 }
             )
 
-    owner_pharmacies = (
-        Pharmacy.objects.filter(owner__user_id=user.id)
-        .select_related("organization", "owner__user")
+    org_admin_org_ids = set(ctx.org_ids_with_role(HubScopeResolver.org_admin_roles))
+    managed_ids = ctx.owned_pharmacy_ids | ctx.org_admin_pharmacy_ids
+    managed_pharmacies = (
+        Pharmacy.objects.filter(id__in=managed_ids).select_related("organization", "owner__user")
+        if managed_ids
+        else ()
     )
-    for pharmacy in owner_pharmacies:
+    for pharmacy in managed_pharmacies:
         pharmacies[pharmacy.id] = pharmacy
         entry = ensure_entry(pharmacy.id)
         entry.update(
@@ -255,33 +315,12 @@ def get_user_pharmacy_permissions(user):
                 "can_manage_profile": True,
                 "can_create_group": True,
                 "has_admin_permissions": True,
-                "is_owner": True,
             }
         )
-
-    org_admin_org_ids = set(
-        OrganizationMembership.objects.filter(
-            user=user,
-            role__in=HubScopeResolver.org_admin_roles,
-        ).values_list("organization_id", flat=True)
-    )
-    if org_admin_org_ids:
-        admin_pharmacies = (
-            Pharmacy.objects.filter(organization_id__in=org_admin_org_ids)
-            .select_related("organization", "owner__user")
-        )
-        for pharmacy in admin_pharmacies:
-            pharmacies[pharmacy.id] = pharmacy
-            entry = ensure_entry(pharmacy.id)
-            entry.update(
-                {
-                    "can_create_post": True,
-                    "can_manage_profile": True,
-                    "can_create_group": True,
-                    "has_admin_permissions": True,
-                    "is_org_admin": True,
-                }
-            )
+        if ctx.is_owner_of(pharmacy.id):
+            entry["is_owner"] = True
+        if pharmacy.organization_id in org_admin_org_ids:
+            entry["is_org_admin"] = True
 
     return pharmacies, permissions, membership_by_pharmacy, org_admin_org_ids
 
@@ -296,29 +335,25 @@ class HubScopeResolver:
 
     def pharmacy_scope(self, pharmacy_id, pharmacy=None):
         pharmacy = pharmacy or get_object_or_404(Pharmacy, pk=pharmacy_id)
-        membership = (
-            Membership.objects.filter(
-                user=self.user,
-                pharmacy=pharmacy,
-                is_active=True,
+        ctx = get_permission_context(self.user)
+        membership = None
+        if ctx.membership_id(pharmacy.id) is not None:
+            membership = (
+                Membership.objects.filter(pk=ctx.membership_id(pharmacy.id), is_active=True)
+                .select_related("user")
+                .first()
             )
-            .select_related("user")
-            .first()
+        is_owner = ctx.is_owner_of(pharmacy.id)
+        org_admin = bool(
+            pharmacy.organization_id
+            and ctx.org_role(pharmacy.organization_id) in self.org_access_roles
         )
-        is_owner = bool(pharmacy.owner and pharmacy.owner.user_id == self.user.id)
-        org_admin = False
-        if pharmacy.organization_id:
-            org_admin = OrganizationMembership.objects.filter(
-                user=self.user,
-                organization_id=pharmacy.organization_id,
-                role__in=self.org_access_roles,
-            ).exists()
         if not any([membership, is_owner, org_admin]):
             raise PermissionDenied("You do not have access to this pharmacy hub.")
         has_admin = bool(
             org_admin
             or is_owner
-            or (membership and membership.is_pharmacy_admin)
+            or (membership and ctx.is_admin_of(pharmacy.id))
         )
         return {
             "scope_type": "pharmacy",
@@ -679,6 +714,9 @@ class HubScopedViewSetMixin:
 class HubContextBuilder:
     def __init__(self, user):
         self.user = user
+        # What the built payload depends on, for the context cache.
+        self.pharmacy_ids = set()
+        self.organization_ids = set()
 
     def build(self, request):
         (
@@ -718,6 +756,10 @@ class HubContextBuilder:
             pharmacy_permissions,
             membership_by_pharmacy,
         )
+        self.pharmacy_ids = set(pharmacies) | {group["pharmacy"] for group in community_groups}
+        self.organization_ids = {organization.id for organization in organizations} | {
+            group["organization_id"] for group in community_groups if group.get("organization_id")
+        }
         return {
             "pharmacies": pharmacy_data,
             "organizations": organization_data,
@@ -865,7 +907,7 @@ class HubContextView(APIView):
 
     def get(self, request):
         builder = HubContextBuilder(request.user)
-        payload = builder.build(request)
+        payload = cached_hub_context(request.user, request, builder)
         return Response(payload)
 
 
@@ -1011,7 +1053,7 @@ class HubCommunityGroupViewSet(
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class HubPostViewSet(HubAttachmentMixin, HubScopedViewSetMixin, viewsets.ModelViewSet):
+class HubPostViewSet(ReplicaReadMixin, HubAttachmentMixin, HubScopedViewSetMixin, viewsets.ModelViewSet):
     serializer_class = HubPostSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
@@ -1027,14 +1069,26 @@ class HubPostViewSet(HubAttachmentMixin, HubScopedViewSetMixin, viewsets.ModelVi
                 "community_group",
             )
             .prefetch_related(
-                "comments__author_membership__user",
-                "reactions",
                 "attachments",
                 "mentions__membership__user",
             )
             .order_by("-is_pinned", "-pinned_at", "-created_at")
         )
 
+    def _feed_queryset(self, queryset, scope):
+        """Load a feed page's authors, latest comments and the viewer's reactions in bulk."""
+        membership = scope.get("request_membership")
+        user = self.request.user
+        return queryset.select_related(
+            *_author_profiles("author_membership__user", "author_user")
+        ).prefetch_related(
+            _viewer_reactions_prefetch(PharmacyHubReaction, membership, user),
+            _recent_comments_prefetch(
+                PharmacyHubComment,
+                _viewer_reactions_prefetch(PharmacyHubCommentReaction, membership, user),
+            ),
+        )
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update(getattr(self, "extra_serializer_context", {}))
@@ -1116,7 +1170,9 @@ class HubPostViewSet(HubAttachmentMixin, HubScopedViewSetMixin, viewsets.ModelVi
 
     def list(self, request, *args, **kwargs):
         self.scope_context = self._resolve_scope_from_params(request.query_params)
-        queryset = self._apply_scope_filter(self.get_queryset(), self.scope_context)
+        queryset = self._feed_queryset(
+            self._apply_scope_filter(self.get_queryset(), self.scope_context), self.scope_context
+        )
         self._prepare_serializer_context(self.scope_context)
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -1266,6 +1322,7 @@ class HubPostViewSet(HubAttachmentMixin, HubScopedViewSetMixin, viewsets.ModelVi
 
 
 class HubPollViewSet(
+    ReplicaReadMixin,
     HubScopedViewSetMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
@@ -1289,13 +1346,20 @@ class HubPollViewSet(
             .prefetch_related(
                 "options",
                 "votes__membership",
-                "reactions",
-                "comments__author_membership__user",
-                "comments__author_user",
             )
             .order_by("-created_at")
         )
 
+    def _feed_queryset(self, queryset, scope):
+        """Load a feed page's authors, latest comments and the viewer's reactions in bulk."""
+        return queryset.select_related(
+            *_author_profiles("created_by_membership__user", "created_by")
+        ).prefetch_related(
+            # Poll reactions are always per user, never per membership.
+            _viewer_reactions_prefetch(PharmacyHubPollReaction, None, self.request.user, member_field=None),
+            _recent_comments_prefetch(PharmacyHubPollComment),
+        )
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update(getattr(self, "extra_serializer_context", {}))
@@ -1329,7 +1393,7 @@ class HubPollViewSet(
 
     def list(self, request, *args, **kwargs):
         scope = self._resolve_scope_from_params(request.query_params)
-        queryset = self._apply_scope_filter(self.get_queryset(), scope)
+        queryset = self._feed_queryset(self._apply_scope_filter(self.get_queryset(), scope), scope)
         self._prepare_serializer_context(scope, {"request_user": self.request.user})
         page = self.paginate_queryset(queryset)
         polls = page if page is not None else queryset
@@ -1558,16 +1622,17 @@ class HubCommentViewSet(
             membership = resolver.ensure_author_membership(self.scope_context)
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        comment = serializer.save(
-            post=post,
-            author_membership=membership,
-            author_user=request.user,
-            original_body=serializer.validated_data.get("body", ""),
-            is_edited=False,
-            last_edited_at=None,
-            last_edited_by=None,
-        )
-        post.recompute_comment_count()
+        with transaction.atomic():
+            comment = serializer.save(
+                post=post,
+                author_membership=membership,
+                author_user=request.user,
+                original_body=serializer.validated_data.get("body", ""),
+                is_edited=False,
+                last_edited_at=None,
+                last_edited_by=None,
+            )
+            adjust_comment_count(post, 1)
         actor_user = getattr(membership, "user", None) or request.user
         actor_name = _get_user_display_name(actor_user)
         _notify_hub_post_owner(
@@ -1611,8 +1676,7 @@ class HubCommentViewSet(
         if not can_manage and not is_author:
             raise PermissionDenied("You cannot delete this comment.")
         if not comment.deleted_at:
-            comment.soft_delete()
-            comment.post.recompute_comment_count()
+            soft_delete_comment(comment, comment.post)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -1642,14 +1706,7 @@ class HubReactionView(APIView):
             lookup["member"] = membership
         else:
             lookup["user"] = request.user
-        PharmacyHubReaction.objects.update_or_create(
-            **lookup,
-            defaults={
-                "reaction_type": reaction_type,
-                "updated_at": timezone.now(),
-            },
-        )
-        post.recompute_reaction_summary()
+        set_reaction(PharmacyHubReaction, post, lookup, reaction_type)
         actor_user = getattr(membership, "user", None) or request.user
         actor_name = _get_user_display_name(actor_user)
         _notify_hub_post_owner(
@@ -1680,11 +1737,9 @@ class HubReactionView(APIView):
         scope = resolver.from_post(post)
         membership = scope.get("request_membership")
         if membership:
-            PharmacyHubReaction.objects.filter(post=post, member=membership).delete()
+            remove_reaction(PharmacyHubReaction, post, {"post": post, "member": membership})
         else:
-            PharmacyHubReaction.objects.filter(post=post, user=request.user).delete()
-        if membership or request.user.is_authenticated:
-            post.recompute_reaction_summary()
+            remove_reaction(PharmacyHubReaction, post, {"post": post, "user": request.user})
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -1728,14 +1783,7 @@ class HubCommentReactionView(APIView):
             lookup["member"] = membership
         else:
             lookup["user"] = request.user
-        PharmacyHubCommentReaction.objects.update_or_create(
-            **lookup,
-            defaults={
-                "reaction_type": reaction_type,
-                "updated_at": timezone.now(),
-            },
-        )
-        comment.recompute_reaction_summary()
+        set_reaction(PharmacyHubCommentReaction, comment, lookup, reaction_type)
         serializer_context = self._serializer_context(scope, membership)
         response = HubCommentSerializer(comment, context=serializer_context)
         return Response(response.data)
@@ -1746,14 +1794,9 @@ class HubCommentReactionView(APIView):
         scope = resolver.from_post(comment.post)
         membership = scope.get("request_membership")
         if membership:
-            PharmacyHubCommentReaction.objects.filter(
-                comment=comment, member=membership
-            ).delete()
+            remove_reaction(PharmacyHubCommentReaction, comment, {"comment": comment, "member": membership})
         else:
-            PharmacyHubCommentReaction.objects.filter(
-                comment=comment, user=request.user
-            ).delete()
-        comment.recompute_reaction_summary()
+            remove_reaction(PharmacyHubCommentReaction, comment, {"comment": comment, "user": request.user})
         serializer_context = self._serializer_context(scope, membership)
         response = HubCommentSerializer(comment, context=serializer_context)
         return Response(response.data, status=status.HTTP_200_OK)
@@ -1821,17 +1864,18 @@ class HubPollCommentViewSet(
             membership = resolver.ensure_author_membership(scope)
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        comment = PharmacyHubPollComment.objects.create(
-            poll=poll,
-            author_membership=membership,
-            author_user=request.user,
-            body=serializer.validated_data.get("body", ""),
-            original_body=serializer.validated_data.get("body", ""),
-            is_edited=False,
-            last_edited_at=None,
-            last_edited_by=None,
-        )
-        poll.recompute_comment_count()
+        with transaction.atomic():
+            comment = PharmacyHubPollComment.objects.create(
+                poll=poll,
+                author_membership=membership,
+                author_user=request.user,
+                body=serializer.validated_data.get("body", ""),
+                original_body=serializer.validated_data.get("body", ""),
+                is_edited=False,
+                last_edited_at=None,
+                last_edited_by=None,
+            )
+            adjust_comment_count(poll, 1)
         output = self.get_serializer(comment)
         return Response(output.data, status=status.HTTP_201_CREATED)
 
@@ -1867,8 +1911,7 @@ class HubPollCommentViewSet(
         if not can_manage and not is_author:
             raise PermissionDenied("You cannot delete this comment.")
         if not comment.deleted_at:
-            comment.soft_delete()
-            comment.poll.recompute_comment_count()
+            soft_delete_comment(comment, comment.poll)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -1882,15 +1925,7 @@ class HubPollReactionView(APIView):
         serializer = HubReactionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         reaction_type = serializer.validated_data["reaction_type"]
-        PharmacyHubPollReaction.objects.update_or_create(
-            poll=poll,
-            user=request.user,
-            defaults={
-                "reaction_type": reaction_type,
-                "updated_at": timezone.now(),
-            },
-        )
-        poll.recompute_reaction_summary()
+        set_reaction(PharmacyHubPollReaction, poll, {"poll": poll, "user": request.user}, reaction_type)
         context = {
             "request": request,
             "request_membership": scope.get("request_membership"),
@@ -1907,8 +1942,7 @@ class HubPollReactionView(APIView):
         poll = get_object_or_404(PharmacyHubPoll, pk=poll_pk)
         resolver = HubScopeResolver(request.user)
         scope = resolver.from_poll(poll)
-        PharmacyHubPollReaction.objects.filter(poll=poll, user=request.user).delete()
-        poll.recompute_reaction_summary()
+        remove_reaction(PharmacyHubPollReaction, poll, {"poll": poll, "user": request.user})
         context = {
             "request": request,
             "request_membership": scope.get("request_membership"),
@@ -0,0 +1,68 @@
+"""
+Per-user cache of the hub context payload (``HubContextView``).
+
+The payload (pharmacies, organisations with member counts, community groups,
+ChemistTasker hubs) changes rarely but took a dozen queries to build each time
+the hub screen opened. It is cached per user for ``HUB_CONTEXT_CACHE_TTL``
+seconds together with the versions (``client_profile.cache_versions``) of
+everything it was built from: the user, each pharmacy and each organisation
+in it, and is only served while all of them still match. Hits and misses
+are counted for ``hub_context_cache_stats``.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ..cache_versions import current_versions, dependency_keys, is_current, user_version_key
+
+CACHE_PREFIX = "hub-context:v1:"
+STATS_KEYS = {"hits": "hub-context-stats:hits", "misses": "hub-context-stats:misses"}
+
+
+def _payload_key(user_id, request):
+    # Media URLs in the payload are absolute, so keep one entry per host.
+    origin = f"{request.scheme}://{request.get_host()}" if request is not None else ""
+    return f"{CACHE_PREFIX}{user_id}:{hashlib.md5(origin.encode()).hexdigest()[:12]}"
+
+
+def _count(outcome):
+    key = STATS_KEYS[outcome]
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cached_hub_context(user, request, builder):
+    """
+    Return the cached payload for ``user`` or build it with ``builder`` (a
+    ``HubContextBuilder``) and cache it with the versions it depends on.
+    """
+    key = _payload_key(user.pk, request)
+    entry = cache.get(key)
+    if entry is not None and is_current(entry["versions"]):
+        _count("hits")
+        return entry["payload"]
+    _count("misses")
+
+    # Read the user's version before building, so a change made while the
+    # payload is being built leaves it already stale rather than cached as new.
+    user_key = user_version_key(user.pk)
+    user_version = current_versions([user_key])
+    payload = builder.build(request)
+    versions = current_versions(dependency_keys(builder.pharmacy_ids, builder.organization_ids))
+    versions.update(user_version)
+    cache.set(key, {"versions": versions, "payload": payload}, settings.HUB_CONTEXT_CACHE_TTL)
+    return payload
+
+
+def hit_stats(reset=False):
+    counts = cache.get_many(list(STATS_KEYS.values()))
+    stats = {name: counts.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total else None
+    if reset:
+        cache.delete_many(list(STATS_KEYS.values()))
+    return stats
@@ -0,0 +1,149 @@
+"""
+Denormalised hub counters: ``comment_count`` on posts and polls, and
+``reaction_summary`` (reaction type -> count) on posts, comments and polls.
+
+Every reaction toggle and comment adjusts the counter with a single atomic
+UPDATE in the same transaction as the row change, instead of re-aggregating
+all of the target's reactions or comments and saving the result (which cost a
+full GROUP BY per click on busy posts and lost updates when clicks raced).
+``repair_hub_counters`` keeps the full recompute as a periodic safety net for
+rows changed outside these helpers, e.g. reactions removed by a cascade.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from ..models import (
+    PharmacyHubComment,
+    PharmacyHubCommentReaction,
+    PharmacyHubPoll,
+    PharmacyHubPollComment,
+    PharmacyHubPollReaction,
+    PharmacyHubPost,
+    PharmacyHubReaction,
+)
+
+# (counted model, reaction model, comment model or None, FK name used by both)
+COUNTED_MODELS = (
+    (PharmacyHubPost, PharmacyHubReaction, PharmacyHubComment, "post"),
+    (PharmacyHubComment, PharmacyHubCommentReaction, None, "comment"),
+    (PharmacyHubPoll, PharmacyHubPollReaction, PharmacyHubPollComment, "poll"),
+)
+
+
+def adjust_comment_count(target, delta):
+    """Add ``delta`` to ``target.comment_count`` in one UPDATE (never below zero)."""
+    type(target).objects.filter(pk=target.pk).update(
+        comment_count=Greatest(F("comment_count") + delta, 0)
+    )
+    target.refresh_from_db(fields=["comment_count"])
+
+
+def adjust_reaction_summary(target, changes):
+    """
+    Apply ``{reaction_type: delta}`` to ``target.reaction_summary`` as a single
+    jsonb UPDATE. Types that drop to zero are removed, matching the recompute.
+    """
+    changes = {reaction_type: delta for reaction_type, delta in changes.items() if delta}
+    if changes:
+        column = connection.ops.quote_name(type(target)._meta.get_field("reaction_summary").column)
+        current = f"COALESCE({column}, '{{}}'::jsonb)"
+        pairs, params = [], [list(changes)]
+        for reaction_type, delta in changes.items():
+            pairs.append(f"%s::text, NULLIF(GREATEST(COALESCE(({current} ->> %s)::int, 0) + %s, 0), 0)")
+            params.extend([reaction_type, reaction_type, delta])
+        expression = f"({current} - %s::text[]) || jsonb_strip_nulls(jsonb_build_object({', '.join(pairs)}))"
+        type(target).objects.filter(pk=target.pk).update(reaction_summary=RawSQL(expression, params))
+    target.refresh_from_db(fields=["reaction_summary"])
+
+
+def set_reaction(reaction_model, target, lookup, reaction_type):
+    """
+    Create or change the reaction matching ``lookup`` on ``target`` and move the
+    target's summary by the difference, atomically.
+    """
+    with transaction.atomic():
+        existing = reaction_model.objects.select_for_update().filter(**lookup).first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    reaction_model.objects.create(**lookup, reaction_type=reaction_type)
+                adjust_reaction_summary(target, {reaction_type: 1})
+                return
+            except IntegrityError:
+                # A parallel request from the same reactor created it first.
+                existing = reaction_model.objects.select_for_update().get(**lookup)
+        previous = existing.reaction_type
+        if previous == reaction_type:
+            target.refresh_from_db(fields=["reaction_summary"])
+            return
+        existing.reaction_type = reaction_type
+        existing.updated_at = timezone.now()
+        existing.save(update_fields=["reaction_type", "updated_at"])
+        adjust_reaction_summary(target, {previous: -1, reaction_type: 1})
+
+
+def remove_reaction(reaction_model, target, lookup):
+    """Delete the reaction(s) matching ``lookup`` and take them off the summary."""
+    with transaction.atomic():
+        # Locking first means two parallel removals can't both decrement.
+        removed = list(
+            reaction_model.objects.select_for_update().filter(**lookup).values_list("pk", "reaction_type")
+        )
+        if removed:
+            reaction_model.objects.filter(pk__in=[pk for pk, _ in removed]).delete()
+        changes = defaultdict(int)
+        for _, reaction_type in removed:
+            changes[reaction_type] -= 1
+        adjust_reaction_summary(target, changes)
+
+
+def soft_delete_comment(comment, target):
+    """Soft-delete ``comment`` and uncount it, once even if deletes race."""
+    with transaction.atomic():
+        deleted_at = timezone.now()
+        if type(comment).objects.filter(pk=comment.pk, deleted_at__isnull=True).update(deleted_at=deleted_at):
+            comment.deleted_at = deleted_at
+            adjust_comment_count(target, -1)
+
+
+def repair_hub_counters():
+    """
+    Recompute every drifted counter from the underlying rows. Each repair runs
+    under the target's row lock, so it can't interleave with a live increment.
+    Returns the number of rows repaired.
+    """
+    repaired = 0
+    for model, reaction_model, comment_model, fk in COUNTED_MODELS:
+        summaries = defaultdict(dict)
+        for row in reaction_model.objects.values(fk, "reaction_type").order_by().annotate(total=Count("id")):
+            summaries[row[fk]][row["reaction_type"]] = row["total"]
+        counts = None
+        fields = ["pk", "reaction_summary"]
+        if comment_model is not None:
+            counts = dict(
+                comment_model.objects.filter(deleted_at__isnull=True)
+                .values(fk)
+                .order_by()
+                .annotate(total=Count("id"))
+                .values_list(fk, "total")
+            )
+            fields.append("comment_count")
+
+        for row in model.objects.values(*fields).iterator():
+            drifted = (row["reaction_summary"] or {}) != summaries.get(row["pk"], {}) or (
+                counts is not None and row["comment_count"] != counts.get(row["pk"], 0)
+            )
+            if not drifted:
+                continue
+            with transaction.atomic():
+                target = model.objects.select_for_update().get(pk=row["pk"])
+                target.recompute_reaction_summary()
+                if counts is not None:
+                    target.recompute_comment_count()
+            repaired += 1
+    return repaired
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from client_profile.models import ShiftSlotAssignment
+from client_profile.shift_reminders import refresh_assignment_starts
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill ShiftSlotAssignment.starts_at for assignments saved before the column "
+        "existed (or, with --all, recompute every row). Shift reminders only see "
+        "assignments that have it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Recompute rows that already have starts_at too.")
+
+    def handle(self, *args, **options):
+        assignments = ShiftSlotAssignment.objects.all()
+        if not options["all"]:
+            assignments = assignments.filter(starts_at__isnull=True)
+        updated = refresh_assignment_starts(assignments)
+        self.stdout.write(f"Updated starts_at on {updated} assignments.")
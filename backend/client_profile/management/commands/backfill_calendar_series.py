@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from client_profile.models import CalendarEvent, WorkNote
+from client_profile.recurrence_utils import series_end_date
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill CalendarEvent.series_end and WorkNote.series_end from each row's date and "
+        "recurrence rule. Rows saved since the column existed already have it."
+    )
+
+    def handle(self, *args, **options):
+        for model in (CalendarEvent, WorkNote):
+            batch = []
+            for item in model.objects.only("id", "date", "recurrence", "series_end").iterator(chunk_size=1000):
+                series_end = series_end_date(item.date, item.recurrence)
+                if item.series_end != series_end:
+                    item.series_end = series_end
+                    batch.append(item)
+            model.objects.bulk_update(batch, ["series_end"], batch_size=1000)
+            self.stdout.write(f"{model.__name__}: updated series_end on {len(batch)} rows.")
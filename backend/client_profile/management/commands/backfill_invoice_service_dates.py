@@ -0,0 +1,71 @@
+import re
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from client_profile.models import Invoice, InvoiceLineItem, ShiftSlotAssignment
+
+# The invoice forms describe shift rows as "YYYY-MM-DD HH:MM–HH:MM".
+LINE_DATE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\b")
+
+
+class Command(BaseCommand):
+    help = (
+        "Link invoice lines saved before InvoiceLineItem.service_date existed to the "
+        "shift occurrence they bill, matched by the date in their description and the "
+        "issuer's assignment at the invoiced pharmacy. Period-end invoicing treats "
+        "linked occurrences as already invoiced."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report matches without saving them.")
+
+    def handle(self, *args, **options):
+        candidates = []
+        for line in (
+            InvoiceLineItem.objects
+            .filter(service_date__isnull=True, invoice__external=False, invoice__pharmacy__isnull=False)
+            .exclude(category_code="Superannuation")
+            .select_related("invoice")
+            .iterator(chunk_size=500)
+        ):
+            match = LINE_DATE_RE.match(line.description or "")
+            service_date = parse_date(match.group(1)) if match else None
+            if service_date:
+                candidates.append((line, (line.invoice.user_id, line.invoice.pharmacy_id, service_date)))
+
+        shifts_by_key = {}
+        if candidates:
+            keys = [key for _, key in candidates]
+            assignments = ShiftSlotAssignment.objects.filter(
+                user_id__in={user_id for user_id, _, _ in keys},
+                shift__pharmacy_id__in={pharmacy_id for _, pharmacy_id, _ in keys},
+                slot_date__in={service_date for _, _, service_date in keys},
+            ).values_list("user_id", "shift__pharmacy_id", "slot_date", "shift_id")
+            for user_id, pharmacy_id, slot_date, shift_id in assignments:
+                shifts_by_key.setdefault((user_id, pharmacy_id, slot_date), set()).add(shift_id)
+
+        linked, ambiguous = [], 0
+        for line, key in candidates:
+            shift_ids = shifts_by_key.get(key, set())
+            if len(shift_ids) != 1:
+                # No assignment, or several shifts that day: leave the line alone.
+                ambiguous += bool(shift_ids)
+                continue
+            line.shift_id, line.service_date = next(iter(shift_ids)), key[2]
+            linked.append(line)
+
+        if not options["dry_run"]:
+            InvoiceLineItem.objects.bulk_update(linked, ["shift", "service_date"], batch_size=500)
+            Invoice.shifts.through.objects.bulk_create(
+                [
+                    Invoice.shifts.through(invoice_id=invoice_id, shift_id=shift_id)
+                    for invoice_id, shift_id in {(line.invoice_id, line.shift_id) for line in linked}
+                ],
+                ignore_conflicts=True,
+            )
+
+        self.stdout.write(
+            f"Linked {len(linked)} of {len(candidates)} dated lines to a shift occurrence"
+            f" ({ambiguous} ambiguous)" + (" (dry run)" if options["dry_run"] else "")
+        )
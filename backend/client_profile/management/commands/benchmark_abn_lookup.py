@@ -0,0 +1,48 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from client_profile.abn import CACHE_PREFIX, lookup_abn
+from client_profile.abn_stub import StubAbrServer
+
+ABN = "51824753556"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time ABN lookups against a local stub of the ABN register: a cold "
+        "lookup, concurrent lookups of one ABN, and cached repeats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--latency-ms", type=int, default=500, help="Simulated ABR response time.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with StubAbrServer({ABN: "BENCHMARK PTY LTD"}, latency_ms=options["latency_ms"]) as stub, \
+                override_settings(ABN_LOOKUP_URL=stub.url_template):
+            cache.delete(CACHE_PREFIX + ABN)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                results = list(pool.map(lambda _: lookup_abn(ABN), range(options["concurrency"])))
+            burst_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(
+                f"cold burst x{options['concurrency']}: {burst_ms:.1f}ms, "
+                f"{stub.requests} upstream request(s), found={all(r.found for r in results)}"
+            )
+
+            samples = []
+            for _ in range(options["iterations"]):
+                started = time.perf_counter()
+                lookup_abn(ABN)
+                samples.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f"cached x{options['iterations']}: p50={statistics.median(samples):.3f}ms "
+                f"max={max(samples):.3f}ms, upstream requests total {stub.requests}"
+            )
+            cache.delete(CACHE_PREFIX + ABN)
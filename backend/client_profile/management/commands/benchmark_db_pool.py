@@ -0,0 +1,103 @@
+import asyncio
+import copy
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.db import database_sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db_pool import configure_pool
+from users.models import User, WebSocketTicket
+
+DIRECT_ALIAS = "bench_direct"
+POOLED_ALIAS = "bench_pooled"
+
+
+def _summary(samples):
+    ms = sorted(value * 1000 for value in samples)
+    p99 = statistics.quantiles(ms, n=100)[98] if len(ms) > 1 else ms[0]
+    return f"mean={statistics.fmean(ms):7.2f}ms p50={statistics.median(ms):7.2f}ms p99={p99:7.2f}ms"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare connect overhead and p99 latency of REST-style requests and "
+        "websocket connects with and without the psycopg connection pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+
+    def handle(self, *args, **options):
+        base = connections.settings[DEFAULT_DB_ALIAS]
+        if not base["ENGINE"].endswith("postgresql"):
+            raise CommandError("The pool benchmark needs a PostgreSQL default database.")
+
+        direct = copy.deepcopy(base)
+        direct["OPTIONS"].pop("pool", None)
+        direct["CONN_MAX_AGE"] = 0
+        pooled = configure_pool(copy.deepcopy(direct), "web", max_size=options["concurrency"])
+        connections.settings[DIRECT_ALIAS] = direct
+        connections.settings[POOLED_ALIAS] = pooled
+
+        iterations = options["iterations"]
+        concurrency = options["concurrency"]
+        try:
+            for alias in (DIRECT_ALIAS, POOLED_ALIAS):
+                label = "pooled" if alias == POOLED_ALIAS else "direct"
+                self.stdout.write(f"[{label}] connect  {_summary(self._connect(alias, iterations))}")
+                self.stdout.write(f"[{label}] rest     {_summary(self._rest(alias, iterations, concurrency))}")
+                self.stdout.write(f"[{label}] ws       {_summary(asyncio.run(self._websocket(alias, iterations, concurrency)))}")
+        finally:
+            connections[POOLED_ALIAS].close_pool()
+            for alias in (DIRECT_ALIAS, POOLED_ALIAS):
+                connections[alias].close()
+                del connections.settings[alias]
+
+    @staticmethod
+    def _connect(alias, iterations):
+        samples = []
+        for _ in range(iterations):
+            conn = connections[alias]
+            started = time.perf_counter()
+            conn.ensure_connection()
+            samples.append(time.perf_counter() - started)
+            conn.close()
+        return samples
+
+    @staticmethod
+    def _request(alias):
+        # Mirrors an authenticated DRF request: JWT user lookup plus one query,
+        # then request_finished releasing the connection.
+        started = time.perf_counter()
+        User.objects.using(alias).filter(pk=0).first()
+        WebSocketTicket.objects.using(alias).filter(ticket="benchmark").exists()
+        connections[alias].close()
+        return time.perf_counter() - started
+
+    def _rest(self, alias, iterations, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(lambda _: self._request(alias), range(iterations)))
+
+    @staticmethod
+    async def _websocket(alias, iterations, concurrency):
+        # Mirrors JWTAuthMiddleware._get_user_from_ticket: one ORM call through
+        # database_sync_to_async, which closes obsolete connections around it.
+        @database_sync_to_async
+        def lookup_ticket():
+            return WebSocketTicket.objects.using(alias).filter(ticket="benchmark").first()
+
+        semaphore = asyncio.Semaphore(concurrency)
+        samples = []
+
+        async def connect():
+            async with semaphore:
+                started = time.perf_counter()
+                await lookup_ticket()
+                samples.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(connect() for _ in range(iterations)))
+        return samples
@@ -0,0 +1,110 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from client_profile.models import Invoice, InvoiceLineItem, PharmacistOnboarding
+from client_profile.services import generate_invoice_from_shifts
+
+BILLING_DATA = {
+    "external": True,
+    "custom_bill_to_name": "Benchmark Client",
+    "bill_to_email": "client@example.com",
+    "super_rate_snapshot": "11.5",
+    "bank_account_name": "Benchmark",
+    "bsb": "000000",
+    "account_number": "00000000",
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _custom_lines(count):
+    return [
+        {
+            "description": f"Shift {n}",
+            "category_code": "ProfessionalServices",
+            "unit": "Hours",
+            "quantity": "8",
+            "unit_price": "72.50",
+            "discount": "0",
+        }
+        for n in range(count)
+    ]
+
+
+def _per_row_invoice(user, lines):
+    # The previous write pattern: create the invoice, one INSERT per line,
+    # save the totals, then INSERT the superannuation line.
+    invoice = Invoice.objects.create(user=user, external=True, super_rate_snapshot=Decimal("11.5"))
+    subtotal = Decimal("0.00")
+    for ln in lines:
+        qty = Decimal(ln["quantity"])
+        rate = Decimal(ln["unit_price"])
+        total = (qty * rate).quantize(Decimal("0.01"))
+        InvoiceLineItem.objects.create(
+            invoice=invoice, description=ln["description"], quantity=qty,
+            unit_price=rate, total=total, is_manual=True, was_modified=True,
+        )
+        subtotal += total
+    super_amt = (subtotal * Decimal("0.115")).quantize(Decimal("0.01"))
+    invoice.subtotal = subtotal
+    invoice.super_amount = super_amt
+    invoice.total = subtotal + super_amt
+    invoice.save()
+    InvoiceLineItem.objects.create(
+        invoice=invoice, description="Superannuation", category_code="Superannuation",
+        unit="Lump Sum", quantity=Decimal("1.00"), unit_price=super_amt, total=super_amt,
+    )
+    return invoice
+
+
+class Command(BaseCommand):
+    help = (
+        "Time creating an N-line invoice with per-row INSERTs versus the batched "
+        "invoice builder. Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, default=100)
+        parser.add_argument("--iterations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        lines = _custom_lines(options["lines"])
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(
+                    email="invoice-benchmark@example.com",
+                    password=None,
+                    username="invoice-benchmark",
+                    role="PHARMACIST",
+                )
+                PharmacistOnboarding.objects.create(user=user, abn="00000000000")
+
+                runs = {
+                    "per-row": lambda: _per_row_invoice(user, lines),
+                    "batched": lambda: generate_invoice_from_shifts(
+                        user=user, custom_lines=lines, billing_data=BILLING_DATA
+                    ),
+                }
+                for label, build in runs.items():
+                    samples, queries = [], 0
+                    for _ in range(options["iterations"]):
+                        with CaptureQueriesContext(connection) as captured:
+                            started = time.perf_counter()
+                            build()
+                            samples.append((time.perf_counter() - started) * 1000)
+                        queries = len(captured)
+                    self.stdout.write(
+                        f"[{label}] {options['lines']} lines: {queries} queries, "
+                        f"p50={statistics.median(samples):.1f}ms max={max(samples):.1f}ms"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
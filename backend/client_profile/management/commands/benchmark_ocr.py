@@ -0,0 +1,54 @@
+import statistics
+import time
+from pathlib import Path
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from client_profile.models import DocumentOcrResult
+from client_profile.ocr import StubOcrBackend, ocr_document, render_for_ocr
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the document OCR pipeline on a local file with the stub OCR backend: "
+        "render cost, a cold run and cached re-verifications. Cache rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="PDF or image to verify.")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--latency-ms", type=int, default=800, help="Simulated OCR service latency.")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.is_file():
+            raise CommandError(f"No such file: {path}")
+
+        started = time.perf_counter()
+        image_bytes = render_for_ocr(str(path))
+        self.stdout.write(f"render: {(time.perf_counter() - started) * 1000:.1f}ms, {len(image_bytes)} bytes")
+
+        backend = StubOcrBackend(lines=["STUB"], delay_ms=options["latency_ms"])
+        try:
+            with transaction.atomic():
+                DocumentOcrResult.objects.filter(backend=backend.name).delete()
+                samples = []
+                for _ in range(options["iterations"] + 1):
+                    with path.open("rb") as handle:
+                        started = time.perf_counter()
+                        ocr_document(File(handle, name=path.name), backend=backend)
+                        samples.append((time.perf_counter() - started) * 1000)
+                cold, warm = samples[0], samples[1:]
+                self.stdout.write(
+                    f"cold: {cold:.1f}ms; cached x{len(warm)}: p50={statistics.median(warm):.1f}ms "
+                    f"max={max(warm):.1f}ms; OCR calls: {backend.calls}"
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
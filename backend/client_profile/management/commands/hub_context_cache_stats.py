@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from client_profile.hub.context_cache import hit_stats
+
+
+class Command(BaseCommand):
+    help = "Report hit and miss counts for the cached hub context payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after reporting.")
+
+    def handle(self, *args, **options):
+        stats = hit_stats(reset=options["reset"])
+        rate = f"{stats['hit_rate']:.1%}" if stats["hit_rate"] is not None else "n/a"
+        self.stdout.write(f"Hub context cache: {stats['hits']} hits, {stats['misses']} misses, hit rate {rate}")
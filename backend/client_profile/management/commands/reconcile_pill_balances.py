@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from client_profile.models import PillBalance, PillLedgerEntry
+from client_profile.rewards import get_ledger_total
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify every PillBalance row against the sum of the user's ledger entries "
+        "and report (or, with --fix, correct) any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Rewrite drifted balances from the ledger.")
+
+    def handle(self, *args, **options):
+        ledger_totals = dict(
+            PillLedgerEntry.objects.order_by()
+            .values("user_id")
+            .annotate(total=Sum("delta"))
+            .values_list("user_id", "total")
+        )
+        balances = dict(PillBalance.objects.values_list("user_id", "balance"))
+
+        mismatches = []
+        for user_id in sorted(ledger_totals.keys() | balances.keys()):
+            ledger_total = ledger_totals.get(user_id) or 0
+            balance = balances.get(user_id)
+            # Users without a balance row are read from the ledger, so they can't drift.
+            if balance is not None and balance != ledger_total:
+                mismatches.append((user_id, balance, ledger_total))
+
+        for user_id, balance, ledger_total in mismatches:
+            self.stdout.write(f"user {user_id}: balance {balance} != ledger {ledger_total}")
+            if options["fix"]:
+                with transaction.atomic():
+                    account = PillBalance.objects.select_for_update().get(user_id=user_id)
+                    # Recompute under the lock; the ledger may have moved since the scan.
+                    account.balance = get_ledger_total(user_id)
+                    account.save(update_fields=["balance", "updated_at"])
+
+        self.stdout.write(
+            f"Checked {len(ledger_totals.keys() | balances.keys())} users, {len(mismatches)} mismatched"
+            + (" (fixed)" if options["fix"] and mismatches else "")
+        )
+        if mismatches and not options["fix"]:
+            raise CommandError("Pill balances drifted from the ledger; rerun with --fix to correct them.")
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from client_profile.models import RatingAggregate
+from client_profile.ratings import AGGREGATE_FIELDS, RATING_TARGETS, compute_rating_totals, empty_rating_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify every worker and pharmacy RatingAggregate row against the ratings "
+        "themselves and report (or, with --fix, create and correct) any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Create missing rows and rewrite drifted ones.")
+
+    def handle(self, *args, **options):
+        checked, mismatches = 0, []
+        for target_type, (field, _direction, _ratee) in RATING_TARGETS.items():
+            expected = compute_rating_totals(target_type)
+            stored = {
+                row.pop(f"{field}_id"): row
+                for row in RatingAggregate.objects.filter(**{f"{field}__isnull": False}).values(
+                    f"{field}_id", *AGGREGATE_FIELDS
+                )
+            }
+            for target_id in sorted(expected.keys() | stored.keys()):
+                checked += 1
+                want = expected.get(target_id) or empty_rating_totals()
+                have = stored.get(target_id)
+                if have is not None and all(have[key] == want[key] for key in AGGREGATE_FIELDS):
+                    continue
+                mismatches.append((target_type, field, target_id))
+                self.stdout.write(
+                    f"{target_type} {target_id}: stored {have and have['count']} ratings, actual {want['count']}"
+                )
+
+        if options["fix"]:
+            for target_type, field, target_id in mismatches:
+                with transaction.atomic():
+                    aggregate, _ = RatingAggregate.objects.select_for_update().get_or_create(
+                        **{f"{field}_id": target_id}
+                    )
+                    # Recompute under the lock; ratings may have moved since the scan.
+                    totals = compute_rating_totals(target_type, [target_id]).get(target_id) or empty_rating_totals()
+                    for key, value in totals.items():
+                        setattr(aggregate, key, value)
+                    aggregate.save(update_fields=[*AGGREGATE_FIELDS, "updated_at"])
+
+        self.stdout.write(
+            f"Checked {checked} rating targets, {len(mismatches)} missing or mismatched"
+            + (" (fixed)" if options["fix"] and mismatches else "")
+        )
+        if mismatches and not options["fix"]:
+            raise CommandError("Rating aggregates drifted from the ratings; rerun with --fix to correct them.")
@@ -0,0 +1,62 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django_q.tasks import async_task
+
+from client_profile.tasks import PERIOD_INVOICING_FUNC, run_period_invoicing
+
+
+class Command(BaseCommand):
+    help = (
+        "Invoice every completed, un-invoiced ABN shift slot in a date range: one "
+        "invoice per worker and pharmacy, PDFs rendered in parallel, emails throttled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("start", type=date.fromisoformat, help="First day of the period (YYYY-MM-DD).")
+        parser.add_argument("end", type=date.fromisoformat, help="Last day of the period (YYYY-MM-DD).")
+        parser.add_argument("--pharmacy", type=int, action="append", dest="pharmacy_ids",
+                            help="Limit to a pharmacy id; repeat for several.")
+        parser.add_argument("--render-workers", type=int, default=4)
+        parser.add_argument("--emails-per-minute", type=int, default=60)
+        parser.add_argument("--no-email", action="store_true", help="Create invoices and PDFs only.")
+        parser.add_argument("--enqueue", action="store_true", help="Run as a django-q task instead of in this process.")
+        parser.add_argument("--timeout", type=int, default=3600, help="django-q timeout in seconds with --enqueue.")
+
+    def handle(self, *args, **options):
+        if options["end"] < options["start"]:
+            raise CommandError("The period end must not be before its start.")
+
+        kwargs = dict(
+            pharmacy_ids=options["pharmacy_ids"],
+            send_emails=not options["no_email"],
+            render_workers=options["render_workers"],
+            emails_per_minute=options["emails_per_minute"],
+        )
+        if options["enqueue"]:
+            task_id = async_task(
+                PERIOD_INVOICING_FUNC,
+                options["start"].isoformat(),
+                options["end"].isoformat(),
+                q_options={"timeout": options["timeout"]},
+                **kwargs,
+            )
+            self.stdout.write(f"Queued period invoicing as task {task_id}")
+            return
+
+        def progress(stage, done, total):
+            if done == total or done % 25 == 0:
+                self.stdout.write(f"  {stage}: {done}/{total}")
+
+        summary = run_period_invoicing(options["start"], options["end"], progress=progress, **kwargs)
+        self.stdout.write(
+            f"Invoiced {summary['workers']} workers: {summary['invoices']} invoices, "
+            f"{summary['rendered']} PDFs, {summary['emailed']} emails in {summary.get('seconds', 0)}s "
+            f"({summary.get('invoices_per_second')} invoices/s)"
+        )
+        if summary["skipped_workers"]:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped workers with no previous invoice to copy bank details from: {summary['skipped_workers']}"
+            ))
+        if summary["failed"]:
+            self.stdout.write(self.style.ERROR(f"Failed workers: {summary['failed']}"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import import_budget_ms, measure_boot_imports
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what django.setup() plus URLconf loading imports in a fresh "
+        "interpreter and report the slowest packages against the start-up budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=15)
+        parser.add_argument("--settings-module", default=None)
+        parser.add_argument(
+            "--fail-on-budget",
+            action="store_true",
+            help="Exit non-zero when the budget is exceeded or a heavy SDK is imported at boot.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = measure_boot_imports(options["settings_module"])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        budget = import_budget_ms()
+        self.stdout.write(f"Boot imports: {len(report.rows)} modules, {report.total_ms:.0f}ms (budget {budget}ms)")
+        for name, cumulative_us in report.slowest(options["limit"]):
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+        heavy = report.heavy_modules_loaded()
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"Heavy modules imported at boot: {', '.join(heavy)}"))
+
+        if options["fail_on_budget"] and (heavy or report.total_ms > budget):
+            raise CommandError("Start-up import budget exceeded.")
@@ -0,0 +1,378 @@
+"""
+Bulk staff import for ``MembershipViewSet.bulk_import``.
+
+``bulk_invite`` handles each row on its own: it loads the pharmacy, checks
+invite permission, creates the user and membership, and queues an email. A
+few hundred rows time out. An import instead stores the rows on a
+``MembershipImportJob`` and works through them in a django-q task. Pharmacies,
+invite permissions, existing users and their memberships are loaded up front
+in a handful of queries. Rows are validated against that state, and users and
+memberships are ``bulk_create``d one chunk (``MEMBERSHIP_IMPORT_CHUNK_SIZE``)
+per transaction, with progress saved alongside. Invite emails are queued
+together as batched sends at the end.
+"""
+import csv
+import io
+import json
+import logging
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from users.tasks import enqueue_email_batch
+
+from .cache_versions import bump_cache_versions
+from .models import Conversation, Membership, MembershipImportJob, Participant, Pharmacy
+from .permission_context import invalidate_permission_context
+from .utils import build_membership_invite_email, clean_email
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = (
+    "email",
+    "pharmacy",
+    "role",
+    "employment_type",
+    "invited_name",
+    "job_title",
+    "pharmacist_award_level",
+    "otherstaff_classification_level",
+    "intern_half",
+    "student_year",
+)
+CLASSIFICATION_FIELDS = ("pharmacist_award_level", "otherstaff_classification_level", "intern_half", "student_year")
+MEMBERSHIP_ROLES = {role for role, _ in Membership.ROLE_CHOICES}
+
+
+class ImportRowsError(ValueError):
+    pass
+
+
+def _normalise_row(raw):
+    if not isinstance(raw, dict):
+        return {}
+    row = {}
+    for field in IMPORT_FIELDS:
+        value = raw.get(field)
+        if field == "email" and not value:
+            value = raw.get("user_email")
+        if isinstance(value, str):
+            value = value.strip()
+        if field == "email" and value:
+            value = clean_email(str(value).lower())
+        row[field] = value if value not in ("", None) else None
+    return row
+
+
+def read_import_rows(request):
+    """
+    Rows from an uploaded ``file`` (CSV with a header row, or a JSON list) or
+    from a JSON body (a list, or ``{"invitations": [...]}``). CSV uploads are
+    read line by line. More than ``MEMBERSHIP_IMPORT_MAX_ROWS`` is rejected.
+    """
+    limit = settings.MEMBERSHIP_IMPORT_MAX_ROWS
+    upload = request.FILES.get("file")
+    if upload is not None:
+        if upload.name.lower().endswith(".json") or "json" in (upload.content_type or ""):
+            try:
+                source = json.load(upload)
+            except ValueError:
+                raise ImportRowsError("The uploaded file is not valid JSON.")
+        else:
+            source = csv.DictReader(io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""))
+    else:
+        source = request.data.get("invitations") if hasattr(request.data, "get") else request.data
+    if isinstance(source, dict) or source is None or isinstance(source, str):
+        raise ImportRowsError("Provide a list of invitations or a CSV/JSON file.")
+    try:
+        rows = [_normalise_row(raw) for raw in islice(source, limit + 1)]
+    except (UnicodeDecodeError, csv.Error):
+        raise ImportRowsError("The uploaded file could not be read as UTF-8 CSV.")
+    if not rows:
+        raise ImportRowsError("The import has no rows.")
+    if len(rows) > limit:
+        raise ImportRowsError(f"Imports are limited to {limit} rows.")
+    return rows
+
+
+def start_membership_import(inviter, rows):
+    from django_q.tasks import async_task
+
+    job = MembershipImportJob.objects.create(created_by=inviter, rows=rows, total_rows=len(rows))
+    transaction.on_commit(lambda: async_task("client_profile.tasks.run_membership_import", job.pk))
+    return job
+
+
+def import_job_payload(job):
+    return {
+        "job_id": job.pk,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "created_count": job.created_count,
+        "error_count": len(job.errors),
+        "results": job.results,
+        "errors": job.errors,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def _user_role_for(membership_role):
+    if membership_role == "PHARMACIST":
+        return "PHARMACIST"
+    if membership_role in ("INTERN", "STUDENT", "ASSISTANT", "TECHNICIAN"):
+        return "OTHER_STAFF"
+    return "EXPLORER"
+
+
+def _sync_bulk_memberships(memberships, pharmacies, inviter):
+    """
+    ``bulk_create`` skips ``post_save``, so do here what the ``Membership``
+    receivers in ``client_profile.signals`` do for each saved membership.
+    """
+    participants = []
+    for pharmacy_id in {membership.pharmacy_id for membership in memberships}:
+        pharmacy = pharmacies[pharmacy_id]
+        community_chat, _ = Conversation.objects.get_or_create(
+            pharmacy=pharmacy,
+            type=Conversation.Type.GROUP,
+            defaults={"title": pharmacy.name, "created_by": inviter},
+        )
+        participants.extend(
+            Participant(conversation=community_chat, membership=membership)
+            for membership in memberships
+            if membership.pharmacy_id == pharmacy_id
+        )
+    Participant.objects.bulk_create(participants, ignore_conflicts=True)
+
+    user_ids = {membership.user_id for membership in memberships}
+    invalidate_permission_context(user_ids)
+    bump_cache_versions(
+        user_ids=user_ids,
+        pharmacy_ids={membership.pharmacy_id for membership in memberships},
+        organization_ids={pharmacies[membership.pharmacy_id].organization_id for membership in memberships},
+    )
+
+
+class MembershipImport:
+    def __init__(self, job):
+        from .serializers import MAX_ACTIVE_PHARMACY_MEMBERSHIPS
+
+        self.job = job
+        self.inviter = job.created_by
+        self.max_active = MAX_ACTIVE_PHARMACY_MEMBERSHIPS
+        self.messages = []
+
+    def preload(self, rows):
+        """Everything validation needs, in a fixed number of queries."""
+        from .views import _user_can_invite_members_to_pharmacy
+
+        User = get_user_model()
+        pharmacy_ids = set()
+        for row in rows:
+            try:
+                pharmacy_ids.add(int(row["pharmacy"]))
+            except (TypeError, ValueError):
+                pass
+        self.pharmacies = Pharmacy.objects.select_related("owner__user").in_bulk(pharmacy_ids)
+        # One permission check per pharmacy rather than per row.
+        self.can_invite = {
+            pharmacy_id: _user_can_invite_members_to_pharmacy(self.inviter, pharmacy)
+            for pharmacy_id, pharmacy in self.pharmacies.items()
+        }
+
+        emails = {row["email"] for row in rows if row["email"]}
+        self.users = {
+            user.email_lower: user
+            for user in User.objects.annotate(email_lower=Lower("email")).filter(email_lower__in=emails)
+        }
+        user_ids = [user.pk for user in self.users.values()]
+        self.active_counts = dict(
+            Membership.objects.filter(user_id__in=user_ids, is_active=True)
+            .order_by()
+            .values("user_id")
+            .annotate(total=Count("id"))
+            .values_list("user_id", "total")
+        )
+        self.existing_pairs = set(
+            Membership.objects.filter(user_id__in=user_ids).values_list("user_id", "pharmacy_id")
+        )
+
+    def _validate(self, row, new_users, pairs, counts):
+        """Returns (user, created, error) for one row against the preloaded state."""
+        from .serializers import required_user_role_for_membership
+
+        email, role = row["email"], row["role"]
+        if not email or not row["pharmacy"] or not role:
+            return None, False, "email, pharmacy, and role are required."
+        if role == "PHARMACY_ADMIN":
+            return None, False, "Pharmacy admin invitations must use the admin management endpoint."
+        if role not in MEMBERSHIP_ROLES:
+            return None, False, f"Unknown role {role!r}."
+        try:
+            pharmacy_id = int(row["pharmacy"])
+        except (TypeError, ValueError):
+            return None, False, "Pharmacy not found."
+        if pharmacy_id not in self.pharmacies:
+            return None, False, "Pharmacy not found."
+        if not self.can_invite[pharmacy_id]:
+            return None, False, "Not permitted to invite into this pharmacy."
+
+        user = self.users.get(email) or new_users.get(email)
+        created = user is None or user.pk is None
+        if user is None:
+            user = get_user_model()(
+                email=email,
+                role=_user_role_for(role),
+                # Invitees set their own password through the emailed link.
+                password=make_password(None),
+                is_otp_verified=False,
+            )
+        elif not created:
+            required_role = required_user_role_for_membership(role)
+            if required_role and user.role != required_role:
+                User = get_user_model()
+                membership_role_label = dict(Membership.ROLE_CHOICES).get(role, role)
+                user_role_label = dict(User.ROLE_CHOICES).get(user.role, user.role or "Unspecified")
+                required_role_label = dict(User.ROLE_CHOICES).get(required_role, required_role)
+                return None, False, (
+                    f"{user.email} is registered as {user_role_label} and cannot be added as "
+                    f"{membership_role_label}. Ask them to complete the {required_role_label} onboarding first."
+                )
+
+        key = id(user) if user.pk is None else user.pk
+        if counts.get(key, 0) >= self.max_active:
+            return None, False, f"This user already belongs to {self.max_active} pharmacies."
+        if (key, pharmacy_id) in pairs:
+            return None, False, "User is already a member of this pharmacy."
+        return user, created, None
+
+    def _build_membership(self, row, user):
+        employment_type = row["employment_type"] or ""
+        job_title = row["job_title"] or ""
+        if employment_type not in {"FULL_TIME", "PART_TIME"}:
+            job_title = ""
+        return Membership(
+            user=user,
+            pharmacy_id=int(row["pharmacy"]),
+            invited_by=self.inviter,
+            invited_name=row["invited_name"] or "",
+            role=row["role"],
+            employment_type=employment_type,
+            job_title=job_title,
+            **{field: row[field] for field in CLASSIFICATION_FIELDS},
+        )
+
+    def process_chunk(self, chunk):
+        """
+        Validate and insert one chunk in a single transaction. The preloaded
+        state only takes the chunk's changes once it has committed.
+        """
+        new_users, pairs, counts = {}, set(self.existing_pairs), dict(self.active_counts)
+        planned, errors = [], []
+        for line, row in chunk:
+            user, created, error = self._validate(row, new_users, pairs, counts)
+            if error:
+                errors.append({"line": line, "email": row.get("email"), "error": error})
+                continue
+            if created:
+                new_users[row["email"]] = user
+            key = id(user) if user.pk is None else user.pk
+            pairs.add((key, int(row["pharmacy"])))
+            counts[key] = counts.get(key, 0) + 1
+            planned.append((line, row, user, created))
+
+        if planned:
+            try:
+                with transaction.atomic():
+                    get_user_model().objects.bulk_create(new_users.values())
+                    memberships = Membership.objects.bulk_create(
+                        [self._build_membership(row, user) for _, row, user, _ in planned]
+                    )
+                    _sync_bulk_memberships(memberships, self.pharmacies, self.inviter)
+                    self._save_progress(chunk, planned, errors)
+            except IntegrityError as exc:
+                # e.g. one of the emails registered while the import ran.
+                logger.warning("Membership import %s: chunk failed: %s", self.job.pk, exc)
+                errors.extend(
+                    {"line": line, "email": row["email"], "error": "Could not be imported; please retry this row."}
+                    for line, row, _, _ in planned
+                )
+                planned = []
+                self._save_progress(chunk, planned, errors)
+        else:
+            self._save_progress(chunk, planned, errors)
+
+        for _, _, user, _ in planned:
+            self.users[user.email.lower()] = user
+            self.active_counts[user.pk] = self.active_counts.get(user.pk, 0) + 1
+        for _, row, user, created in planned:
+            self.existing_pairs.add((user.pk, int(row["pharmacy"])))
+            self.messages.append(
+                build_membership_invite_email(
+                    user=user,
+                    pharmacy=self.pharmacies[int(row["pharmacy"])],
+                    inviter=self.inviter,
+                    role=row["role"],
+                    user_created=created,
+                )
+            )
+
+    def _save_progress(self, chunk, planned, errors):
+        job = self.job
+        job.processed_rows += len(chunk)
+        job.created_count += len(planned)
+        job.results.extend(
+            {
+                "line": line,
+                "email": row["email"],
+                "role": row["role"],
+                "employment_type": row["employment_type"],
+                "status": "invited",
+            }
+            for line, row, _, _ in planned
+        )
+        job.errors.extend(errors)
+        job.save(update_fields=["processed_rows", "created_count", "results", "errors", "updated_at"])
+
+    def run(self):
+        rows = list(enumerate(self.job.rows, start=1))
+        self.preload([row for _, row in rows])
+        size = settings.MEMBERSHIP_IMPORT_CHUNK_SIZE
+        for start in range(0, len(rows), size):
+            self.process_chunk(rows[start:start + size])
+
+
+def run_membership_import(job_id):
+    job = MembershipImportJob.objects.select_related("created_by").get(pk=job_id)
+    if job.status != MembershipImportJob.Status.PENDING:
+        return job  # already picked up (e.g. a retried task)
+    job.status = MembershipImportJob.Status.RUNNING
+    job.save(update_fields=["status", "updated_at"])
+
+    importer = MembershipImport(job)
+    try:
+        importer.run()
+        job.status = MembershipImportJob.Status.COMPLETED
+    except Exception:
+        logger.exception("Membership import %s failed", job.pk)
+        job.status = MembershipImportJob.Status.FAILED
+    finally:
+        # Invites for every committed chunk go out, even if a later chunk failed.
+        if importer.messages:
+            enqueue_email_batch(importer.messages)
+        job.rows = []
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "rows", "finished_at", "updated_at"])
+    logger.info(
+        "Membership import %s %s: %s/%s rows, %s created, %s errors",
+        job.pk, job.status, job.processed_rows, job.total_rows, job.created_count, len(job.errors),
+    )
+    return job
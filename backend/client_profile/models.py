@@ -10,6 +10,7 @@ from django.contrib.contenttypes.models import ContentType
 from datetime import timedelta
 from django.utils import timezone
 from client_profile.fields import EncryptedTextField
+from client_profile.recurrence_utils import series_end_date
 
 
 GENDER_CHOICES = [
@@ -68,6 +69,24 @@ class OnboardingNotification(models.Model):
     def __str__(self):
         return f"{self.onboarding} – {self.notification_type} sent at {self.sent_at}"
 
+class DocumentOcrResult(models.Model):
+    """
+    OCR text for an uploaded document, keyed by the SHA-256 of its bytes and the
+    OCR backend, so identical uploads are only sent to the OCR service once.
+    """
+    content_hash = models.CharField(max_length=64)
+    backend = models.CharField(max_length=50)
+    lines = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content_hash", "backend"], name="uniq_document_ocr_hash_backend"),
+        ]
+
+    def __str__(self):
+        return f"{self.backend}:{self.content_hash[:12]} ({len(self.lines)} lines)"
+
 class OwnerOnboarding(models.Model):
     ROLE_CHOICES = [
         ("MANAGER", "Pharmacy Manager"),
@@ -1156,6 +1175,45 @@ class MembershipApplication(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.last_name} → {self.pharmacy.name} ({self.status})"
 
+
+class MembershipImportJob(models.Model):
+    """
+    A bulk staff import (CSV or JSON rows) worked through in the background by
+    ``client_profile.membership_import.run_membership_import``. The uploaded
+    rows are kept only until the job finishes; clients poll the counters.
+    """
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        COMPLETED = "COMPLETED", "Completed"
+        FAILED = "FAILED", "Failed"
+
+    id = models.BigAutoField(primary_key=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="membership_import_jobs",
+    )
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    rows = models.JSONField(default=list, blank=True)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    # [{"line", "email", "role", "employment_type", "status"}] / [{"line", "email", "error"}]
+    results = models.JSONField(default=list, blank=True)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_by", "-created_at"], name="membership_import_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"Import {self.pk} by {self.created_by_id}: {self.processed_rows}/{self.total_rows} ({self.status})"
+
 # Chain Model - Represents a chain of pharmacies
 class Chain(models.Model):
     owner = models.ForeignKey(
@@ -1378,17 +1436,67 @@ class Shift(models.Model):
             # super_percent can still be stored for locum/casual (used for superannuation flag)
 
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
+    def save(self, *args, validate=True, **kwargs):
+        # System-driven updates (escalation, payment transitions) pass
+        # validate=False together with update_fields to skip full_clean().
+        if validate:
+            self.full_clean()
         if not self.pk and self.role_needed == 'PHARMACIST':
             self.rate_type = self.rate_type or self.pharmacy.default_rate_type
             self.fixed_rate = self.fixed_rate or self.pharmacy.default_fixed_rate
         super().save(*args, **kwargs)
+
+    def save_internal(self, *fields):
+        """
+        Persist only the given columns without running model validation.
+        Meant for internal state changes, never for user-supplied data.
+        """
+        self.save(update_fields=list(dict.fromkeys(fields)), validate=False)
+
+    def set_payment_status(self, payment_status):
+        """Move the shift to a new payment status; returns True if it changed."""
+        if self.payment_status == payment_status:
+            return False
+        self.payment_status = payment_status
+        self.save_internal('payment_status')
+        return True
+
+    def increment_reveal_count(self):
+        """Atomically bump reveal_count in a single UPDATE."""
+        Shift.objects.filter(pk=self.pk).update(reveal_count=models.F('reveal_count') + 1)
+        self.refresh_from_db(fields=['reveal_count'])
    
     class Meta:
         indexes = [
             models.Index(fields=['pharmacy']),
             models.Index(fields=['created_by']),
+            # Public job board: open PLATFORM shifts, newest first.
+            models.Index(
+                fields=['-created_at'],
+                name='shift_public_board_idx',
+                condition=Q(visibility='PLATFORM', dedicated_user__isnull=True),
+            ),
+            # Auto-escalation only revisits shifts that are not public yet.
+            models.Index(
+                fields=['escalate_to_locum_casual'],
+                name='shift_esc_locum_idx',
+                condition=~Q(visibility='PLATFORM'),
+            ),
+            models.Index(
+                fields=['escalate_to_owner_chain'],
+                name='shift_esc_owner_chain_idx',
+                condition=~Q(visibility='PLATFORM'),
+            ),
+            models.Index(
+                fields=['escalate_to_org_chain'],
+                name='shift_esc_org_chain_idx',
+                condition=~Q(visibility='PLATFORM'),
+            ),
+            models.Index(
+                fields=['escalate_to_platform'],
+                name='shift_esc_platform_idx',
+                condition=~Q(visibility='PLATFORM'),
+            ),
         ]
 
 
@@ -1578,6 +1686,24 @@ class PillLedgerEntry(models.Model):
         return f"{self.user.email}: {self.delta:+d} pills ({self.source})"
 
 
+class PillBalance(models.Model):
+    """
+    Running pill balance per user. Ledger inserts lock this row, so it is always
+    the sum of the user's ``PillLedgerEntry.delta`` values.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="pill_balance",
+    )
+    balance = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.balance} pills"
+
+
 class ShiftSlot(models.Model):
     shift = models.ForeignKey(
         Shift,
@@ -1625,10 +1751,22 @@ class ShiftSlot(models.Model):
             if self.recurring_end_date:
                 raise ValidationError({'recurring_end_date': 'Should be empty for non-recurring slots.'})
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
+    def save(self, *args, validate=True, **kwargs):
+        if validate:
+            self.full_clean()
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['shift', 'date'], name='shiftslot_shift_date_idx'),
+            models.Index(fields=['date', 'end_time'], name='shiftslot_date_end_idx'),
+            models.Index(
+                fields=['recurring_end_date'],
+                name='shiftslot_recurring_end_idx',
+                condition=Q(is_recurring=True),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.shift} slot on {self.date}"
 
@@ -1654,6 +1792,11 @@ class ShiftInterest(models.Model):
 
     expressed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['shift', 'user'], name='shiftinterest_shift_user_idx'),
+        ]
+
     def __str__(self):
         slot_info = f' (slot {self.slot.id})' if self.slot else ''
         return f"{self.user.get_full_name()} interested in {self.shift.pharmacy.name}{slot_info}"
@@ -1695,11 +1838,17 @@ class ShiftSlotAssignment(models.Model):
         blank=True,
         help_text="Details explaining how the rate was calculated"
     )
+    starts_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="UTC start of this occurrence (slot start time on slot_date in the pharmacy's timezone)"
+    )
     class Meta:
         unique_together = ('slot', 'slot_date')
         indexes = [
             models.Index(fields=['slot', 'slot_date']),      # Fast lookup by slot and date
             models.Index(fields=['user', 'slot_date']),      # Fast lookup for all slots by user for a day
+            models.Index(fields=['starts_at']),              # Reminder window scans
         ]
 
     is_rostered = models.BooleanField(default=False) 
@@ -1707,6 +1856,53 @@ class ShiftSlotAssignment(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name()} assigned to slot {self.slot.id}"
 
+    def compute_starts_at(self):
+        from .timezone_utils import get_pharmacy_timezone, local_to_utc
+
+        slot = self.slot
+        return local_to_utc(
+            self.slot_date or slot.date,
+            slot.start_time,
+            get_pharmacy_timezone(self.shift.pharmacy),
+        )
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'slot', 'slot_date'} & set(update_fields):
+            self.starts_at = self.compute_starts_at()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'starts_at'}
+        super().save(*args, **kwargs)
+
+
+class ShiftReminderDelivery(models.Model):
+    """
+    One sent shift reminder, so overlapping scheduler runs never send the same
+    reminder twice. Keyed on the occurrence's start: if the slot is moved,
+    the new time gets its own reminder.
+    """
+    assignment = models.ForeignKey(
+        ShiftSlotAssignment,
+        on_delete=models.CASCADE,
+        related_name='reminder_deliveries'
+    )
+    starts_at = models.DateTimeField()
+    # Identifies the scheduler run that claimed the row.
+    run_token = models.CharField(max_length=32)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['assignment', 'starts_at'], name='shift_reminder_once'),
+        ]
+        indexes = [
+            models.Index(fields=['run_token']),
+            models.Index(fields=['starts_at']),
+        ]
+
+    def __str__(self):
+        return f"Reminder for assignment {self.assignment_id} at {self.starts_at}"
+
 
 class ShiftProfileAccessAudit(models.Model):
     class Action(models.TextChoices):
@@ -2136,6 +2332,54 @@ class Rating(models.Model):
         target = self.ratee_user_id or self.ratee_pharmacy_id
         return f"{self.direction} by {self.rater_user_id} → {target}: {self.stars}★"
 
+class RatingAggregate(models.Model):
+    """
+    Denormalised rating totals for one worker or one pharmacy, kept in step with
+    ``Rating`` by ``client_profile.ratings.record_rating`` under a row lock.
+    """
+    worker = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="rating_aggregate",
+    )
+    pharmacy = models.OneToOneField(
+        Pharmacy,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="rating_aggregate",
+    )
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    average = models.FloatField(default=0.0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    Q(worker__isnull=False, pharmacy__isnull=True)
+                    | Q(worker__isnull=True, pharmacy__isnull=False)
+                ),
+                name="rating_aggregate_single_target",
+            ),
+        ]
+
+    @property
+    def histogram(self):
+        return {stars: getattr(self, f"stars_{stars}") for stars in range(1, 6)}
+
+    def __str__(self):
+        target = f"worker {self.worker_id}" if self.worker_id else f"pharmacy {self.pharmacy_id}"
+        return f"{target}: {self.average:.2f}★ ({self.count})"
+
 ## Invoice model
 class Invoice(models.Model):
     STATUS_CHOICES = [
@@ -2163,6 +2407,15 @@ class Invoice(models.Model):
     pharmacy_address_snapshot = models.TextField(blank=True, default="")
     pharmacy_abn_snapshot     = models.CharField(max_length=20, blank=True, default="")
 
+    # Shifts the invoice was generated for. Lines without a service date still
+    # mark these shifts as billed up to invoice_date, so period-end invoicing
+    # doesn't repeat those occurrences.
+    shifts = models.ManyToManyField(
+        'client_profile.Shift',
+        blank=True,
+        related_name='invoices'
+    )
+
     # External-invoice fields
     external                = models.BooleanField(default=False)
     custom_bill_to_name     = models.CharField(max_length=255, blank=True)
@@ -2266,10 +2519,14 @@ class InvoiceLineItem(models.Model):
         blank=True,
         related_name='invoice_items'
     )
+    # Occurrence date for lines generated from shift slot assignments, so a
+    # recurring shift can be invoiced across several pay periods without repeats.
+    service_date = models.DateField(null=True, blank=True)
+
     class Meta:
         indexes = [
             models.Index(fields=['invoice']),
-            models.Index(fields=['shift']),
+            models.Index(fields=['shift', 'service_date']),
         ]
 
     def __str__(self):
@@ -3540,6 +3797,9 @@ class CalendarEvent(models.Model):
     all_day = models.BooleanField(default=True)
     source = models.CharField(max_length=20, choices=Source.choices, default=Source.MANUAL)
     recurrence = models.JSONField(null=True, blank=True, help_text="Recurrence rule: {'freq': 'DAILY|WEEKLY|MONTHLY', 'interval': int, 'until_date': 'YYYY-MM-DD', 'byweekday': [0-6]}")
+    # Last possible occurrence (date for one-off events, until_date for recurring
+    # ones, null when open-ended) so feeds can range-filter series without JSON lookups.
+    series_end = models.DateField(null=True, blank=True)
     
     # For birthday idempotency: link to the membership whose birthday this represents
     source_membership = models.ForeignKey(
@@ -3566,6 +3826,11 @@ class CalendarEvent(models.Model):
             models.Index(fields=['pharmacy', 'date']),
             models.Index(fields=['organization', 'date']),
             models.Index(fields=['source', 'date']),
+            models.Index(
+                fields=['pharmacy', 'series_end', 'date'],
+                name='calendar_event_series_idx',
+                condition=models.Q(recurrence__isnull=False),
+            ),
         ]
         constraints = [
             models.UniqueConstraint(
@@ -3575,6 +3840,14 @@ class CalendarEvent(models.Model):
             ),
         ]
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'date', 'recurrence'} & set(update_fields):
+            self.series_end = series_end_date(self.date, self.recurrence)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'series_end'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"CalendarEvent#{self.pk} '{self.title}' on {self.date}"
 
@@ -3610,6 +3883,8 @@ class WorkNote(models.Model):
         blank=True,
         help_text="Recurrence rule: {'freq': 'DAILY|WEEKLY|MONTHLY', 'interval': int, 'until_date': 'YYYY-MM-DD', 'byweekday': [0-6]}"
     )
+    # Same as CalendarEvent.series_end.
+    series_end = models.DateField(null=True, blank=True)
     
     # General note (tags all staff)
     is_general = models.BooleanField(
@@ -3632,12 +3907,25 @@ class WorkNote(models.Model):
             models.Index(fields=['pharmacy', 'date']),
             models.Index(fields=['pharmacy', 'status']),
             models.Index(fields=['date', 'notify_on_shift_start']),
+            models.Index(
+                fields=['pharmacy', 'series_end', 'date'],
+                name='work_note_series_idx',
+                condition=models.Q(recurrence__isnull=False),
+            ),
         ]
         ordering = ['-date', '-created_at']
 
     def __str__(self):
         return f"WorkNote#{self.pk} '{self.title}' for {self.pharmacy_id} on {self.date}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'date', 'recurrence'} & set(update_fields):
+            self.series_end = series_end_date(self.date, self.recurrence)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'series_end'}
+        super().save(*args, **kwargs)
+
 
 class WorkNoteAssignee(models.Model):
     """
@@ -3708,3 +3996,33 @@ class WorkNoteCompletion(models.Model):
             f"WorkNoteCompletion#{self.pk} note={self.work_note_id} "
             f"membership={self.membership_id} date={self.occurrence_date}"
         )
+
+
+class WorkNoteDelivery(models.Model):
+    """
+    A work-note notification sent to a user for one occurrence date, so the
+    shift-start and 9 AM runs notify each user once per occurrence.
+    """
+    work_note = models.ForeignKey(
+        WorkNote,
+        on_delete=models.CASCADE,
+        related_name="deliveries",
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="work_note_deliveries",
+    )
+    occurrence_date = models.DateField()
+    # Identifies the scheduler run that claimed the row.
+    run_token = models.CharField(max_length=32, db_index=True)
+    delivered_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("work_note", "user", "occurrence_date")
+        indexes = [
+            models.Index(fields=["work_note", "occurrence_date"]),
+        ]
+
+    def __str__(self):
+        return f"WorkNoteDelivery#{self.pk} note={self.work_note_id} user={self.user_id} date={self.occurrence_date}"
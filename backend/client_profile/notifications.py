@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from typing import Iterable, Optional, Sequence
-import requests
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
@@ -40,6 +39,8 @@ def _broadcast(user_id: int, event_type: str, payload: dict):
 def _send_expo_push(tokens: Sequence[str], title: str, body: str, data: Optional[dict] = None) -> None:
     if not tokens:
         return
+    import requests
+
     payloads = []
     for token in tokens:
         payloads.append({
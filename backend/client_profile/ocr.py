@@ -0,0 +1,192 @@
+"""
+Document OCR for onboarding verification.
+
+Uploads are streamed out of storage in chunks and hashed on the way, OCR text is
+cached per content hash in ``DocumentOcrResult``, PDFs are rendered only as
+large as the OCR service needs, and the OCR call itself goes through a
+pluggable backend (``settings.OCR_BACKEND``) so the pipeline can be exercised
+and benchmarked locally with ``StubOcrBackend``.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from client_profile.models import DocumentOcrResult
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class OcrBackend:
+    """Turns one image into lines of text. ``name`` is part of the cache key."""
+    name = ""
+
+    def extract_lines(self, image_bytes: bytes) -> list[str]:
+        raise NotImplementedError
+
+
+class AzureOcrBackend(OcrBackend):
+    name = "azure-read"
+
+    def __init__(self):
+        endpoint = getattr(settings, "AZURE_OCR_ENDPOINT", None)
+        key = getattr(settings, "AZURE_OCR_KEY", None)
+        if not endpoint or not key:
+            raise Exception("Missing AZURE_OCR_ENDPOINT or AZURE_OCR_KEY in env")
+        from azure.ai.vision.imageanalysis import ImageAnalysisClient
+        from azure.core.credentials import AzureKeyCredential
+
+        self.client = ImageAnalysisClient(endpoint=endpoint, credential=AzureKeyCredential(key))
+
+    def extract_lines(self, image_bytes):
+        from azure.ai.vision.imageanalysis.models import VisualFeatures
+
+        result = self.client.analyze(image_data=image_bytes, visual_features=[VisualFeatures.READ])
+        lines = []
+        if result.read and result.read.blocks:
+            for block in result.read.blocks:
+                for line in block.lines:
+                    lines.append(line.text)
+        return lines
+
+
+class StubOcrBackend(OcrBackend):
+    """Offline backend for tests and benchmarks: fixed lines after an optional delay."""
+    name = "stub"
+
+    def __init__(self, lines=(), delay_ms=0):
+        self.lines = list(lines)
+        self.delay_ms = delay_ms
+        self.calls = 0
+
+    def extract_lines(self, image_bytes):
+        self.calls += 1
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        return list(self.lines)
+
+
+def get_ocr_backend_class():
+    return import_string(settings.OCR_BACKEND)
+
+
+@dataclass
+class OcrOutcome:
+    lines: list[str]
+    content_hash: str
+    cached: bool
+
+
+def _local_path(file):
+    try:
+        path = file.path
+    except (AttributeError, NotImplementedError, ValueError):
+        return None
+    return path if os.path.exists(path) else None
+
+
+@contextmanager
+def spooled_document(file, chunk_size=CHUNK_SIZE):
+    """
+    Yield ``(local_path, sha256_hex)`` for a stored file. Files already on local
+    disk are hashed in place; anything else is streamed in chunks into a private
+    temp directory that is removed when the block exits, whatever happens in it.
+    """
+    digest = hashlib.sha256()
+    local_path = _local_path(file)
+    if local_path:
+        with open(local_path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(chunk_size), b""):
+                digest.update(chunk)
+        yield local_path, digest.hexdigest()
+        return
+
+    with tempfile.TemporaryDirectory(prefix="ocr-") as workdir:
+        target = Path(workdir) / f"document{Path(file.name).suffix}"
+        file.open("rb")
+        try:
+            with open(target, "wb") as out:
+                for chunk in file.chunks(chunk_size):
+                    digest.update(chunk)
+                    out.write(chunk)
+        finally:
+            file.close()
+        yield str(target), digest.hexdigest()
+
+
+def is_pdf_file(local_path):
+    try:
+        with open(local_path, "rb") as handle:
+            if handle.read(5) == b"%PDF-":
+                return True
+    except OSError as exc:
+        logger.info(f"[is_pdf_file] Could not inspect file header for {local_path}: {exc}")
+    return str(local_path).lower().endswith(".pdf")
+
+
+def render_for_ocr(local_path):
+    """
+    Image bytes to send to the OCR backend. Images go as-is; for PDFs only the
+    first page is rasterised, at ``OCR_PDF_DPI`` but never with a side longer
+    than ``OCR_MAX_IMAGE_SIDE`` pixels, straight into memory.
+    """
+    if not is_pdf_file(local_path):
+        with open(local_path, "rb") as handle:
+            return handle.read()
+
+    import fitz  # PyMuPDF
+
+    with fitz.open(local_path) as doc:
+        if doc.page_count < 1:
+            raise Exception("PDF has no pages.")
+        page = doc.load_page(0)
+        longest_side = max(page.rect.width, page.rect.height)
+        zoom = min(settings.OCR_PDF_DPI / 72, settings.OCR_MAX_IMAGE_SIDE / longest_side)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return pix.tobytes("png")
+
+
+def ocr_document(file, backend=None):
+    """
+    OCR a stored file, reusing the cached text for identical content so
+    re-submissions and re-verifications never reach the OCR service again.
+    Empty results are not cached: they are as likely to be a transient
+    service failure as a blank page, so the next attempt calls OCR again.
+    """
+    # The configured backend is only instantiated (SDK import, client set-up) on a miss.
+    backend_name = backend.name if backend else get_ocr_backend_class().name
+    with spooled_document(file) as (local_path, content_hash):
+        cached = (
+            DocumentOcrResult.objects.filter(content_hash=content_hash, backend=backend_name)
+            .exclude(lines=[])
+            .values_list("lines", flat=True)
+            .first()
+        )
+        if cached is not None:
+            logger.info(f"[ocr_document] Cache hit for {file.name} ({content_hash[:12]})")
+            return OcrOutcome(lines=cached, content_hash=content_hash, cached=True)
+
+        image_bytes = render_for_ocr(local_path)
+        backend = backend or get_ocr_backend_class()()
+        lines = backend.extract_lines(image_bytes)
+
+    logger.info(f"[ocr_document] OCR done for {file.name}, found {len(lines)} lines.")
+    if lines:
+        # A concurrent verification may have stored it first; an empty row cached
+        # before empty results were skipped is overwritten.
+        DocumentOcrResult.objects.bulk_create(
+            [DocumentOcrResult(content_hash=content_hash, backend=backend_name, lines=lines)],
+            update_conflicts=True,
+            unique_fields=["content_hash", "backend"],
+            update_fields=["lines"],
+        )
+    return OcrOutcome(lines=lines, content_hash=content_hash, cached=False)
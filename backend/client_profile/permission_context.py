@@ -0,0 +1,182 @@
+"""
+Per-user permission context: the pharmacies a user belongs to, administers,
+owns or manages through an organisation, loaded in a fixed handful of queries.
+
+Capability checks used to query ``PharmacyAdmin`` / ``OrganizationMembership``
+on every call, often once per row of a list. ``get_permission_context(user)``
+loads everything once and memoises it on the user instance, which is the same
+object for the whole request (views, serializers, hub scope resolution), the
+same way Django's ``ModelBackend`` caches ``user._perm_cache``. Between
+requests the context is kept in the cache for ``PERMISSION_CONTEXT_TTL``
+seconds and dropped by signals whenever a membership, admin assignment,
+organisation role or pharmacy ownership changes.
+"""
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Membership, OwnerOnboarding, Pharmacy, PharmacyAdmin
+
+CACHE_PREFIX = "permission-context:v1:"
+ORG_ADMIN_ROLES = ("ORG_ADMIN",)
+ORG_SCOPED_ADMIN_ROLES = ("CHIEF_ADMIN", "REGION_ADMIN")
+
+# Bumped by every invalidation in this process, so a context memoised on a
+# user instance earlier in the same request is reloaded after a change.
+_local_epoch = 0
+
+
+@dataclass(frozen=True)
+class PermissionContext:
+    user_id: int | None = None
+    # pharmacy_id -> Membership id (active memberships only)
+    memberships: dict = field(default_factory=dict)
+    # pharmacy_id -> PharmacyAdmin.admin_level (active assignments only)
+    admin_levels: dict = field(default_factory=dict)
+    owned_pharmacy_ids: frozenset = frozenset()
+    # organization_id -> (OrganizationMembership.role, admin_level)
+    org_roles: dict = field(default_factory=dict)
+    # Pharmacies of organisations where the user holds an ORG_ADMIN role.
+    org_admin_pharmacy_ids: frozenset = frozenset()
+    # Pharmacies assigned to the user's CHIEF_ADMIN / REGION_ADMIN roles.
+    org_scoped_pharmacy_ids: frozenset = frozenset()
+
+    @classmethod
+    def load(cls, user):
+        from users.models import OrganizationMembership
+
+        memberships = dict(
+            Membership.objects.filter(user=user, is_active=True).values_list("pharmacy_id", "id")
+        )
+        admin_levels = dict(
+            PharmacyAdmin.objects.filter(user=user, is_active=True).values_list("pharmacy_id", "admin_level")
+        )
+        owned = frozenset(Pharmacy.objects.filter(owner__user_id=user.pk).values_list("id", flat=True))
+        org_rows = list(
+            OrganizationMembership.objects.filter(user=user).values_list("id", "organization_id", "role", "admin_level")
+        )
+        org_roles = {organization_id: (role, admin_level) for _, organization_id, role, admin_level in org_rows}
+
+        org_admin_org_ids = [org_id for org_id, (role, _) in org_roles.items() if role in ORG_ADMIN_ROLES]
+        org_admin_pharmacy_ids = frozenset(
+            Pharmacy.objects.filter(organization_id__in=org_admin_org_ids).values_list("id", flat=True)
+            if org_admin_org_ids
+            else ()
+        )
+        scoped_ids = [pk for pk, _, role, _ in org_rows if role in ORG_SCOPED_ADMIN_ROLES]
+        org_scoped_pharmacy_ids = frozenset(
+            OrganizationMembership.pharmacies.through.objects.filter(
+                organizationmembership_id__in=scoped_ids
+            ).values_list("pharmacy_id", flat=True)
+            if scoped_ids
+            else ()
+        )
+        return cls(
+            user_id=user.pk,
+            memberships=memberships,
+            admin_levels=admin_levels,
+            owned_pharmacy_ids=owned,
+            org_roles=org_roles,
+            org_admin_pharmacy_ids=org_admin_pharmacy_ids,
+            org_scoped_pharmacy_ids=org_scoped_pharmacy_ids,
+        )
+
+    def membership_id(self, pharmacy_id):
+        return self.memberships.get(pharmacy_id)
+
+    def is_admin_of(self, pharmacy_id) -> bool:
+        return pharmacy_id in self.admin_levels
+
+    def admin_level(self, pharmacy_id):
+        return self.admin_levels.get(pharmacy_id)
+
+    def has_admin_capability(self, pharmacy_id, capability) -> bool:
+        level = self.admin_levels.get(pharmacy_id)
+        return level is not None and capability in PharmacyAdmin.CAPABILITY_MATRIX.get(level, ())
+
+    def admin_pharmacy_ids(self, capability=None) -> frozenset:
+        return frozenset(
+            pharmacy_id
+            for pharmacy_id in self.admin_levels
+            if capability is None or self.has_admin_capability(pharmacy_id, capability)
+        )
+
+    def is_owner_of(self, pharmacy_id) -> bool:
+        return pharmacy_id in self.owned_pharmacy_ids
+
+    def org_role(self, organization_id):
+        return self.org_roles.get(organization_id, (None, None))[0]
+
+    def org_ids_with_role(self, roles) -> frozenset:
+        return frozenset(org_id for org_id, (role, _) in self.org_roles.items() if role in roles)
+
+    def org_capabilities(self, organization_id) -> set:
+        from users.org_roles import role_capabilities
+
+        role, admin_level = self.org_roles.get(organization_id, (None, None))
+        return role_capabilities(role, admin_level) if role else set()
+
+    def managed_pharmacy_ids(self) -> frozenset:
+        """Owned, org-admin, and MANAGE_ROSTER-admin pharmacies (shift and roster management)."""
+        return (
+            self.owned_pharmacy_ids
+            | self.org_admin_pharmacy_ids
+            | self.admin_pharmacy_ids(PharmacyAdmin.CAPABILITY_MANAGE_ROSTER)
+        )
+
+    def can_manage_pharmacy(self, pharmacy_id) -> bool:
+        """Shift management: the managed set plus CHIEF/REGION admins of the pharmacy."""
+        return pharmacy_id in self.managed_pharmacy_ids() or pharmacy_id in self.org_scoped_pharmacy_ids
+
+
+EMPTY_CONTEXT = PermissionContext()
+
+
+def _cache_key(user_id):
+    return f"{CACHE_PREFIX}{user_id}"
+
+
+def get_permission_context(user) -> PermissionContext:
+    if user is None or not getattr(user, "is_authenticated", False) or user.pk is None:
+        return EMPTY_CONTEXT
+    memo = getattr(user, "_permission_context", None)
+    if memo is not None and memo[0] == _local_epoch:
+        return memo[1]
+    context = cache.get(_cache_key(user.pk))
+    if context is None:
+        context = PermissionContext.load(user)
+        cache.set(_cache_key(user.pk), context, settings.PERMISSION_CONTEXT_TTL)
+    user._permission_context = (_local_epoch, context)
+    return context
+
+
+def invalidate_permission_context(user_ids):
+    global _local_epoch
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    _local_epoch += 1
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # Again after commit, in case another request re-cached the old rows meanwhile.
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def pharmacy_permission_user_ids(owner_ids=(), organization_ids=()):
+    """Users whose context depends on a pharmacy's owner or organisation."""
+    from users.models import OrganizationMembership
+
+    owner_ids = [pk for pk in owner_ids if pk]
+    organization_ids = [pk for pk in organization_ids if pk]
+    user_ids = set()
+    if owner_ids:
+        user_ids.update(OwnerOnboarding.objects.filter(pk__in=owner_ids).values_list("user_id", flat=True))
+    if organization_ids:
+        user_ids.update(
+            OrganizationMembership.objects.filter(organization_id__in=organization_ids).values_list(
+                "user_id", flat=True
+            )
+        )
+    return user_ids
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from client_profile.models import Rating, RatingAggregate
+
+# target_type -> (RatingAggregate field, Rating direction, Rating ratee field)
+RATING_TARGETS = {
+    "worker": ("worker", Rating.Direction.OWNER_TO_WORKER, "ratee_user"),
+    "pharmacy": ("pharmacy", Rating.Direction.WORKER_TO_PHARMACY, "ratee_pharmacy"),
+}
+AGGREGATE_FIELDS = ("count", "total", "average", "stars_1", "stars_2", "stars_3", "stars_4", "stars_5")
+MAX_SUMMARY_TARGETS = 200
+
+
+def empty_rating_totals():
+    return {field: 0 for field in AGGREGATE_FIELDS} | {"average": 0.0}
+
+
+def compute_rating_totals(target_type, target_ids=None):
+    """
+    Aggregate totals straight from ``Rating``, keyed by target id. Used to seed
+    missing aggregate rows, to summarise targets that have none yet, and by
+    ``reconcile_rating_aggregates``.
+    """
+    _field, direction, ratee_field = RATING_TARGETS[target_type]
+    qs = Rating.objects.filter(direction=direction)
+    if target_ids is not None:
+        qs = qs.filter(**{f"{ratee_field}_id__in": list(target_ids)})
+    rows = (
+        qs.order_by()
+        .values(f"{ratee_field}_id")
+        .annotate(
+            count=Count("id"),
+            total=Sum("stars"),
+            **{f"stars_{n}": Count("id", filter=Q(stars=n)) for n in range(1, 6)},
+        )
+    )
+    totals = {}
+    for row in rows:
+        target_id = row.pop(f"{ratee_field}_id")
+        row["average"] = row["total"] / row["count"]
+        totals[target_id] = row
+    return totals
+
+
+def _lock_aggregate(target_type, target_id):
+    field = RATING_TARGETS[target_type][0]
+    lookup = {f"{field}_id": target_id}
+    if not RatingAggregate.objects.filter(**lookup).exists():
+        # Seed from existing ratings. Every rating write holds this row's lock,
+        # so nothing can commit between the seed and the insert once it exists;
+        # a concurrent seeder simply loses the insert race.
+        seed = compute_rating_totals(target_type, [target_id]).get(target_id) or empty_rating_totals()
+        RatingAggregate.objects.bulk_create([RatingAggregate(**lookup, **seed)], ignore_conflicts=True)
+    return RatingAggregate.objects.select_for_update().get(**lookup)
+
+
+def _apply_stars(aggregate, stars, sign):
+    aggregate.count += sign
+    aggregate.total += sign * stars
+    field = f"stars_{stars}"
+    setattr(aggregate, field, getattr(aggregate, field) + sign)
+
+
+def record_rating(rater, direction, target, stars, comment=""):
+    """
+    Create or update ``rater``'s rating of ``target`` and move the target's
+    ``RatingAggregate`` by the difference in one transaction.
+    Returns ``(rating, created)``.
+    """
+    target_type = next(key for key, spec in RATING_TARGETS.items() if spec[1] == direction)
+    ratee_field = RATING_TARGETS[target_type][2]
+
+    with transaction.atomic():
+        aggregate = _lock_aggregate(target_type, target.pk)
+        rating = Rating.objects.filter(rater_user=rater, direction=direction, **{ratee_field: target}).first()
+        created = rating is None
+        if created:
+            rating = Rating.objects.create(
+                rater_user=rater, direction=direction, stars=stars, comment=comment, **{ratee_field: target}
+            )
+        else:
+            _apply_stars(aggregate, rating.stars, -1)
+            rating.stars = stars
+            rating.comment = comment
+            rating.save(update_fields=["stars", "comment", "updated_at"])
+
+        _apply_stars(aggregate, stars, 1)
+        aggregate.average = aggregate.total / aggregate.count
+        aggregate.save(update_fields=[*AGGREGATE_FIELDS, "updated_at"])
+    return rating, created
+
+
+def discount_deleted_rating(rating):
+    """
+    Take a deleted rating (e.g. removed by a cascade from its rater) out of its
+    target's aggregate. Targets without an aggregate row are read from ``Rating``
+    directly, so there is nothing to adjust for them.
+    """
+    target_type = next(key for key, spec in RATING_TARGETS.items() if spec[1] == rating.direction)
+    field, _direction, ratee_field = RATING_TARGETS[target_type]
+    target_id = getattr(rating, f"{ratee_field}_id")
+    if target_id is None:
+        return
+    with transaction.atomic():
+        aggregate = RatingAggregate.objects.select_for_update().filter(**{f"{field}_id": target_id}).first()
+        if aggregate is None or aggregate.count == 0:
+            return
+        _apply_stars(aggregate, rating.stars, -1)
+        aggregate.average = aggregate.total / aggregate.count if aggregate.count else 0.0
+        aggregate.save(update_fields=[*AGGREGATE_FIELDS, "updated_at"])
+
+
+def get_rating_summaries(target_type, target_ids):
+    """
+    Summaries for many targets in the order requested, read from
+    ``RatingAggregate`` with a single query. Targets rated before aggregates
+    existed have no row yet and fall back to ``compute_rating_totals`` (one more
+    query for all of them). Targets without ratings get zeroed entries.
+    """
+    field = RATING_TARGETS[target_type][0]
+    rows = {
+        row[f"{field}_id"]: row
+        for row in RatingAggregate.objects.filter(**{f"{field}_id__in": target_ids}).values(
+            f"{field}_id", *AGGREGATE_FIELDS
+        )
+    }
+    missing = [target_id for target_id in target_ids if target_id not in rows]
+    if missing:
+        rows.update(compute_rating_totals(target_type, missing))
+    summaries = []
+    for target_id in target_ids:
+        row = rows.get(target_id) or empty_rating_totals()
+        summaries.append({
+            "target_id": target_id,
+            "average": row["average"],
+            "count": row["count"],
+            "total": row["total"],
+            "histogram": {str(n): row[f"stars_{n}"] for n in range(1, 6)},
+        })
+    return summaries
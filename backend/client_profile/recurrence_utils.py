@@ -26,18 +26,12 @@ def expand_recurrence_dates(
 
     freq = (recurrence.get("freq") or "").upper()
     interval = int(recurrence.get("interval") or 1)
-    until_str = recurrence.get("until_date")
     byweekday = recurrence.get("byweekday") or []
 
     if interval < 1:
         interval = 1
 
-    until: Optional[date] = None
-    if until_str:
-        try:
-            until = date.fromisoformat(until_str)
-        except Exception:
-            until = None
+    until = recurrence_until(recurrence)
 
     # Start from the later of start_date or from_date
     current = start_date
@@ -108,6 +102,26 @@ def expand_recurrence_dates(
     return [d for d in results if in_range(d)]
 
 
+def recurrence_until(recurrence: Optional[dict]) -> Optional[date]:
+    until_str = (recurrence or {}).get("until_date")
+    if until_str:
+        try:
+            return date.fromisoformat(until_str)
+        except Exception:
+            return None
+    return None
+
+
+def series_end_date(start_date: date, recurrence: Optional[dict]) -> Optional[date]:
+    """
+    Last date a (possibly recurring) item can occur on: its own date when it
+    doesn't recur, the rule's until_date when it does, None when open-ended.
+    """
+    if not recurrence:
+        return start_date
+    return recurrence_until(recurrence)
+
+
 def _add_months(d: date, months: int) -> date:
     month = d.month - 1 + months
     year = d.year + month // 12
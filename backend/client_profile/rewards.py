@@ -7,6 +7,7 @@ from django.utils import timezone
 from django.utils.crypto import get_random_string
 
 from client_profile.models import (
+    PillBalance,
     PillLedgerEntry,
     PillReferralCode,
     PillReferralEvent,
@@ -57,11 +58,31 @@ def seed_default_reward_rules() -> None:
         PillRewardRule.objects.get_or_create(code=payload["code"], defaults=payload)
 
 
+def get_ledger_total(user) -> int:
+    total = PillLedgerEntry.objects.filter(user=user).aggregate(total=Sum("delta"))["total"]
+    return int(total or 0)
+
+
 def get_pill_balance(user) -> int:
     if not user or not getattr(user, "is_authenticated", False):
         return 0
-    total = PillLedgerEntry.objects.filter(user=user).aggregate(total=Sum("delta"))["total"]
-    return int(total or 0)
+    balance = PillBalance.objects.filter(user=user).values_list("balance", flat=True).first()
+    if balance is None:
+        # No ledger write since balances were introduced; fall back to the ledger once.
+        return get_ledger_total(user)
+    return balance
+
+
+def _lock_balance(user) -> PillBalance:
+    """Lock the user's balance row for this transaction, creating it from the ledger if missing."""
+    account = PillBalance.objects.select_for_update().filter(user=user).first()
+    if account is None:
+        PillBalance.objects.bulk_create(
+            [PillBalance(user=user, balance=get_ledger_total(user))],
+            ignore_conflicts=True,
+        )
+        account = PillBalance.objects.select_for_update().get(user=user)
+    return account
 
 
 def get_current_rule(code: str) -> PillRewardRule:
@@ -145,10 +166,16 @@ def _create_ledger_entry(
         return existing
 
     with transaction.atomic():
-        current_balance = get_pill_balance(user)
-        next_balance = current_balance + amount
+        # Serialises concurrent earns/spends for this user until commit.
+        account = _lock_balance(user)
+        existing = PillLedgerEntry.objects.filter(idempotency_key=idempotency_key).first()
+        if existing:
+            return existing
+        next_balance = account.balance + amount
         if next_balance < 0:
             raise RewardError("Insufficient pill balance.")
+        account.balance = next_balance
+        account.save(update_fields=["balance", "updated_at"])
         return PillLedgerEntry.objects.create(
             user=user,
             rule=rule,
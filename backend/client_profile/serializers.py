@@ -12,6 +12,8 @@ from decimal import Decimal
 from client_profile.utils import q6, send_referee_emails, clean_email, enforce_public_shift_daily_limit, build_shift_email_context, build_shift_offer_context
 from client_profile.services import expand_shift_slots
 from client_profile.admin_helpers import has_admin_capability, CAPABILITY_MANAGE_ROSTER
+from client_profile.permission_context import get_permission_context
+from client_profile.cache_versions import bump_cache_versions
 from datetime import date, timedelta, datetime, time
 from django.utils import timezone
 from django_q.tasks import async_task
@@ -172,28 +174,7 @@ def user_can_view_full_pharmacy(user, pharmacy) -> bool:
     if not user or not getattr(user, "is_authenticated", False) or pharmacy is None:
         return False
 
-    owner = getattr(pharmacy, "owner", None)
-    if owner and getattr(owner, "user", None) == user:
-        return True
-
-    if OrganizationMembership.objects.filter(
-        user=user,
-        role='ORG_ADMIN',
-        organization_id=pharmacy.organization_id,
-    ).exists():
-        return True
-
-    if OrganizationMembership.objects.filter(
-        user=user,
-        role__in=['CHIEF_ADMIN', 'REGION_ADMIN'],
-        pharmacies=pharmacy,
-    ).exists():
-        return True
-
-    if has_admin_capability(user, pharmacy, CAPABILITY_MANAGE_ROSTER):
-        return True
-
-    return False
+    return get_permission_context(user).can_manage_pharmacy(pharmacy.id)
 
 
 def anonymize_pharmacy_detail(detail: dict | None) -> dict | None:
@@ -5291,6 +5272,7 @@ class InvoiceLineItemSerializer(serializers.ModelSerializer):
             'super_applicable',
             'is_manual',
             'shift',
+            'service_date',
         ]
         read_only_fields = ['total']
 
@@ -5696,6 +5678,16 @@ class RatingSummarySerializer(serializers.Serializer):
     count = serializers.IntegerField()
 
 
+class RatingTargetSummarySerializer(RatingSummarySerializer):
+    """
+    Read-only aggregate for one of many targets, with the star histogram.
+    Used by GET /ratings/summaries?target_type=...&target_ids=...
+    """
+    target_id = serializers.IntegerField()
+    total = serializers.IntegerField()
+    histogram = serializers.DictField(child=serializers.IntegerField())
+
+
 class MyRatingSerializer(serializers.Serializer):
     """
     Read-only: current user's rating (if any) on a target.
@@ -5707,13 +5699,30 @@ class MyRatingSerializer(serializers.Serializer):
     comment = serializers.CharField(allow_blank=True, allow_null=True)
 
 
-class PendingRatingsSerializer(serializers.Serializer):
+class PendingWorkerRatingSerializer(serializers.ModelSerializer):
     """
-    Read-only: IDs the user can still rate.
-    Used by GET /ratings/pending
+    Read-only: a worker the user can still rate.
+    Used by GET /ratings/pending?target_type=worker
     """
-    workers_to_rate = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
-    pharmacies_to_rate = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
+    profile_photo_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ["id", "first_name", "last_name", "profile_photo_url"]
+
+    def get_profile_photo_url(self, obj):
+        photo = _resolve_user_profile_photo(obj)
+        return _build_absolute_media_url(self.context.get("request"), photo)
+
+
+class PendingPharmacyRatingSerializer(serializers.ModelSerializer):
+    """
+    Read-only: a pharmacy the user can still rate.
+    Used by GET /ratings/pending?target_type=pharmacy
+    """
+    class Meta:
+        model = Pharmacy
+        fields = ["id", "name", "suburb", "state"]
 
 # --- Chat Serializers --------------------------------------------------------
 class ChatMemberSerializer(serializers.ModelSerializer):
@@ -5895,7 +5904,7 @@ class ConversationListSerializer(serializers.ModelSerializer):
         if obj.pharmacy_id:
             try:
                 from client_profile.admin_helpers import has_admin_capability, CAPABILITY_MANAGE_COMMS
-                return has_admin_capability(user, obj.pharmacy, CAPABILITY_MANAGE_COMMS)
+                return has_admin_capability(user, obj.pharmacy_id, CAPABILITY_MANAGE_COMMS)
             except Exception:
                 return False
         if obj.created_by_id == user.id:
@@ -5919,7 +5928,7 @@ class ConversationListSerializer(serializers.ModelSerializer):
         if obj.pharmacy_id:
             try:
                 from client_profile.admin_helpers import has_admin_capability, CAPABILITY_MANAGE_COMMS
-                return has_admin_capability(user, obj.pharmacy, CAPABILITY_MANAGE_COMMS)
+                return has_admin_capability(user, obj.pharmacy_id, CAPABILITY_MANAGE_COMMS)
             except Exception:
                 return False
         if obj.created_by_id == user.id:
@@ -6209,11 +6218,9 @@ def _serialize_hub_author(membership, user, request):
         if top_role == "PHARMACIST":
             return "Pharmacist"
         if top_role == "OTHER_STAFF":
-            role_type = (
-                OtherStaffOnboarding.objects.filter(user=target_user)
-                .values_list("role_type", flat=True)
-                .first()
-            )
+            # Reverse accessor, so feeds that select_related the profile skip the query.
+            profile = getattr(target_user, "otherstaffonboarding", None)
+            role_type = getattr(profile, "role_type", None)
             if (role_type or "").upper() == "INTERN":
                 return "Intern"
             return "Staff"
@@ -6408,6 +6415,11 @@ class HubCommunityGroupSerializer(serializers.ModelSerializer):
                 for membership in memberships
             ]
             PharmacyCommunityGroupMembership.objects.bulk_create(bulk_links)
+        # bulk_create skips the signals that keep dependent caches current.
+        bump_cache_versions(
+            user_ids=[membership.user_id for membership in memberships],
+            pharmacy_ids=[group.pharmacy_id],
+        )
         return group
 
     def update(self, instance, validated_data):
@@ -6435,6 +6447,10 @@ class HubCommunityGroupSerializer(serializers.ModelSerializer):
                 )
             if new_links:
                 PharmacyCommunityGroupMembership.objects.bulk_create(new_links)
+                bump_cache_versions(
+                    user_ids=[link.membership.user_id for link in new_links],
+                    pharmacy_ids=[instance.pharmacy_id],
+                )
             to_remove = set(existing_links.keys()) - desired_ids
             if to_remove:
                 PharmacyCommunityGroupMembership.objects.filter(
@@ -6470,6 +6486,13 @@ class HubCommunityGroupSerializer(serializers.ModelSerializer):
         return data
 
 
+# Latest comments shown under each post and poll in the hub feed. Feed views
+# prefetch them as ``prefetched_recent_comments`` (and the viewer's own
+# reactions as ``prefetched_viewer_reactions``); the serializers fall back to
+# per-object queries when those are absent.
+HUB_RECENT_COMMENT_COUNT = 2
+
+
 class HubCommentSerializer(serializers.ModelSerializer):
     author = serializers.SerializerMethodField()
     can_edit = serializers.SerializerMethodField()
@@ -6543,6 +6566,9 @@ class HubCommentSerializer(serializers.ModelSerializer):
         return obj.deleted_at is not None
 
     def get_viewer_reaction(self, obj):
+        prefetched = getattr(obj, "prefetched_viewer_reactions", None)
+        if prefetched is not None:
+            return prefetched[0].reaction_type if prefetched else None
         membership = self.context.get("request_membership")
         request = self.context.get("request")
         request_user = getattr(request, "user", None)
@@ -6817,6 +6843,9 @@ class HubPostSerializer(serializers.ModelSerializer):
         return obj.organization_id
 
     def get_viewer_reaction(self, obj):
+        prefetched = getattr(obj, "prefetched_viewer_reactions", None)
+        if prefetched is not None:
+            return prefetched[0].reaction_type if prefetched else None
         membership = self.context.get("request_membership")
         request = self.context.get("request")
         request_user = getattr(request, "user", None)
@@ -6835,11 +6864,13 @@ class HubPostSerializer(serializers.ModelSerializer):
         return None
 
     def get_recent_comments(self, obj):
-        comments_qs = (
-            obj.comments.filter(deleted_at__isnull=True)
-            .select_related("author_membership__user", "author_user")
-            .order_by("-created_at")[:2]
-        )
+        comments_qs = getattr(obj, "prefetched_recent_comments", None)
+        if comments_qs is None:
+            comments_qs = (
+                obj.comments.filter(deleted_at__isnull=True)
+                .select_related("author_membership__user", "author_user")
+                .order_by("-created_at")[:HUB_RECENT_COMMENT_COUNT]
+            )
         serializer = HubCommentSerializer(
             comments_qs,
             many=True,
@@ -7188,6 +7219,9 @@ class HubPollSerializer(serializers.ModelSerializer):
         return bool(is_creator or has_admin or (request_user and obj.created_by_id == request_user.id))
 
     def get_viewer_reaction(self, obj):
+        prefetched = getattr(obj, "prefetched_viewer_reactions", None)
+        if prefetched is not None:
+            return prefetched[0].reaction_type if prefetched else None
         request = self.context.get("request")
         request_user = getattr(request, "user", None)
         if not request_user or not request_user.is_authenticated:
@@ -7199,11 +7233,13 @@ class HubPollSerializer(serializers.ModelSerializer):
         )
 
     def get_recent_comments(self, obj):
-        comments_qs = (
-            obj.comments.filter(deleted_at__isnull=True)
-            .select_related("author_membership__user", "author_user")
-            .order_by("-created_at")[:2]
-        )
+        comments_qs = getattr(obj, "prefetched_recent_comments", None)
+        if comments_qs is None:
+            comments_qs = (
+                obj.comments.filter(deleted_at__isnull=True)
+                .select_related("author_membership__user", "author_user")
+                .order_by("-created_at")[:HUB_RECENT_COMMENT_COUNT]
+            )
         serializer = HubPollCommentSerializer(
             comments_qs,
             many=True,
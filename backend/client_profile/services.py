@@ -1,15 +1,32 @@
+import hashlib
 import json
+from functools import lru_cache
 from datetime import datetime, timedelta, date, time
 from decimal import Decimal
 from pathlib import Path
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from client_profile.models import PharmacistOnboarding, OtherStaffOnboarding, Pharmacy, Shift, ShiftSlotAssignment, InvoiceLineItem, Invoice, Membership
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from client_profile.models import PharmacistOnboarding, OtherStaffOnboarding, Pharmacy, Shift, ShiftSlot, ShiftSlotAssignment, InvoiceLineItem, Invoice, Membership
 
-# Load static JSON data
+# Static JSON data, loaded on first use
 BASE_DIR = Path(settings.BASE_DIR)
-AWARD_RATES = json.load(open(BASE_DIR / 'client_profile/data/updated_award_rates_casual_first_level_correct_mapping.json'))
-PUBLIC_HOLIDAYS = json.load(open(BASE_DIR / 'client_profile/data/public_holidays.json'))
+
+
+@lru_cache(maxsize=None)
+def get_award_rates():
+    with open(BASE_DIR / 'client_profile/data/updated_award_rates_casual_first_level_correct_mapping.json') as fh:
+        return json.load(fh)
+
+
+@lru_cache(maxsize=None)
+def get_public_holidays():
+    with open(BASE_DIR / 'client_profile/data/public_holidays.json') as fh:
+        return json.load(fh)
+
 
 EARLY_MORNING_END = time(8, 0)
 LATE_NIGHT_START = time(19, 0)
@@ -51,7 +68,7 @@ def is_public_holiday(slot_date, state):
     state_code = _normalize_state_code(state)
     if not state_code:
         return False
-    return str(slot_date) in PUBLIC_HOLIDAYS.get(state_code, [])
+    return str(slot_date) in get_public_holidays().get(state_code, [])
 
 
 def get_day_type(slot_date, state):
@@ -180,7 +197,7 @@ def _resolve_pharmacist_rate_key(day_type, time_bucket, rate_preference):
 
 
 def _resolve_award_role_key(role_needed):
-    if role_needed == 'TECHNICIAN' and 'TECHNICIAN' not in AWARD_RATES:
+    if role_needed == 'TECHNICIAN' and 'TECHNICIAN' not in get_award_rates():
         return 'ASSISTANT'
     return role_needed
 
@@ -190,7 +207,7 @@ def _get_first_level_award_profile(role_needed):
     classification_key = FIRST_LEVEL_CLASSIFICATIONS.get(role_needed)
     if not classification_key:
         return None, None, None
-    return role_key, classification_key, AWARD_RATES.get(role_key, {}).get(classification_key, {}).get('casual')
+    return role_key, classification_key, get_award_rates().get(role_key, {}).get(classification_key, {}).get('casual')
 
 
 def _get_award_rate_for_segment(role_needed, day_type, time_bucket):
@@ -400,34 +417,47 @@ def expand_shift_slots(shift):
             })
     return entries
 
+def _assigned_slot_entries(shifts, user, period=None):
+    """
+    Yield ``(shift, entry, assignment)`` for every expanded slot occurrence of
+    ``shifts`` assigned to ``user``, with one assignment query for all shifts.
+    ``period`` optionally limits occurrences to a ``(start, end)`` date range.
+    """
+    shifts = list(shifts)
+    assignments = ShiftSlotAssignment.objects.filter(shift__in=shifts, user=user)
+    if period:
+        assignments = assignments.filter(slot_date__range=period)
+    by_occurrence = {(assn.slot_id, assn.slot_date): assn for assn in assignments}
+
+    for shift in shifts:
+        for entry in expand_shift_slots(shift):
+            if period and not (period[0] <= entry['date'] <= period[1]):
+                continue
+            assn = by_occurrence.get((entry['slot'].id, entry['date']))
+            if assn is None:
+                continue  # 🔒 Only include slots assigned to the current user
+            yield shift, entry, assn
+
+
+def _entry_total(entry, assn):
+    hours = Decimal(str(entry['hours']))
+    rate = assn.unit_rate or Decimal('0.00')
+    return hours, rate, (hours * rate).quantize(Decimal('0.01'))
+
+
 def generate_preview_invoice_lines(shift, user):
     line_items = []
-    for entry in expand_shift_slots(shift):
+    for shift, entry, assn in _assigned_slot_entries([shift], user):
         slot = entry['slot']
         slot_date = entry['date']
-        try:
-            assn = ShiftSlotAssignment.objects.get(slot=slot, slot_date=slot_date)
-        except ShiftSlotAssignment.DoesNotExist:
-            continue
-
-        if assn.user != user:
-            continue  # 🔒 Only include slots assigned to the current user
-
-        slot_date = entry['date']
-        start_time = entry['start_time']
-        end_time = entry['end_time']
-        hours = Decimal(str(entry['hours']))   # <--- ensure Decimal
-        rate = assn.unit_rate or Decimal('0.00')
-        reason = assn.rate_reason or {}
-
-        total = (hours * rate).quantize(Decimal('0.01'))
+        hours, rate, total = _entry_total(entry, assn)
 
         line_items.append({
             "id": f"{shift.id}-{slot.id}-{slot_date}",
             "shiftSlotId": slot.id,
             "date": str(slot_date),
-            "start_time": start_time.strftime('%H:%M:%S'),
-            "end_time": end_time.strftime('%H:%M:%S'),
+            "start_time": entry['start_time'].strftime('%H:%M:%S'),
+            "end_time": entry['end_time'].strftime('%H:%M:%S'),
             "category": "ProfessionalServices",
             "unit": "Hours",
             "quantity": float(hours),         # Only now convert for JSON
@@ -435,55 +465,174 @@ def generate_preview_invoice_lines(shift, user):
             "discount": 0,
             "total": float(total),
             "was_modified": False,
-            "rate_reason": reason  # Optional: frontend may use
+            "rate_reason": assn.rate_reason or {}  # Optional: frontend may use
         })
 
     return line_items
 
-def generate_invoice_from_shifts(
-    user,
-    pharmacy_id=None,
-    shift_ids=None,
-    custom_lines=None,
-    external=False,
-    billing_data=None,
-    due_date=None
-    ):
 
-    try:
-        ob = PharmacistOnboarding.objects.get(user=user)
-    except PharmacistOnboarding.DoesNotExist:
-        ob = OtherStaffOnboarding.objects.get(user=user)
+def build_shift_invoice_lines(shifts, user, period=None):
+    """
+    Unsaved ``InvoiceLineItem`` objects for the user's assigned slot occurrences,
+    skipping occurrences that already appear on one of the user's invoices.
+    """
+    shifts = list(shifts)
+    dated_lines = InvoiceLineItem.objects.filter(
+        invoice__user=user,
+        shift__in=shifts,
+        service_date__isnull=False,
+    ).values_list('invoice_id', 'shift_id', 'service_date')
+    already_invoiced = {(shift_id, service_date) for _, shift_id, service_date in dated_lines}
+    dated_invoice_shifts = {(invoice_id, shift_id) for invoice_id, shift_id, _ in dated_lines}
+    # A shift listed on an invoice without any dated line for it was billed as a
+    # whole, up to that invoice's date; later occurrences are still open.
+    whole_shift_billed_until = {}
+    for invoice_id, shift_id, invoice_date in Invoice.shifts.through.objects.filter(
+        invoice__user=user, shift__in=shifts,
+    ).values_list('invoice_id', 'shift_id', 'invoice__invoice_date'):
+        if (invoice_id, shift_id) not in dated_invoice_shifts:
+            whole_shift_billed_until[shift_id] = max(invoice_date, whole_shift_billed_until.get(shift_id, invoice_date))
+    lines = []
+    for shift, entry, assn in _assigned_slot_entries(shifts, user, period):
+        billed_until = whole_shift_billed_until.get(shift.id)
+        if (billed_until and entry['date'] <= billed_until) or (shift.id, entry['date']) in already_invoiced:
+            continue
+        hours, rate, total = _entry_total(entry, assn)
+        lines.append(InvoiceLineItem(
+            description=(
+                f"Shift {entry['date']:%d/%m/%Y} "
+                f"{entry['start_time']:%H:%M}-{entry['end_time']:%H:%M}"
+            ),
+            category_code='ProfessionalServices',
+            unit='Hours',
+            quantity=hours,
+            unit_price=rate,
+            discount=Decimal('0.00'),
+            total=total,
+            shift=shift,
+            service_date=entry['date'],
+        ))
+    return lines
 
-    gst_registered = billing_data.get('gst_registered', False)
-    if isinstance(gst_registered, str):
-        gst_registered = gst_registered.lower() in ['true', '1', 'yes']
 
-    # Parse shift_ids safely
-    shift_ids = billing_data.get('shift_ids')
-    if shift_ids:
-        if isinstance(shift_ids, str):
-            shift_ids = json.loads(shift_ids)
-    else:
-        shift_ids = []
+def _line_slot_id(ln):
+    slot_id = ln.get('shift_slot_id') or ln.get('shiftSlotId')
+    return int(slot_id) if slot_id else None
 
-    external = billing_data.get('external', False)
-    if isinstance(external, str):
-        external = external.lower() in ['true', '1', 'yes']
 
-    # Enforce ABN-only for internal invoices.
-    if not external and shift_ids:
-        if Shift.objects.filter(pk__in=shift_ids).exclude(payment_preference__iexact='ABN').exists():
-            raise ValidationError("Internal invoices are only allowed for ABN shifts.")
+def build_custom_invoice_lines(custom_lines, shift_ids=None):
+    """
+    Unsaved line items from user-supplied rows; returns ``(lines, has_super_line)``.
+    Rows that came from the shift preview carry their slot and occurrence date,
+    which are kept as ``shift``/``service_date`` when the slot belongs to one of
+    ``shift_ids``, so the occurrence counts as invoiced.
+    """
+    slot_ids = {_line_slot_id(ln) for ln in custom_lines} - {None}
+    shift_by_slot = {}
+    if slot_ids and shift_ids:
+        shift_by_slot = dict(
+            ShiftSlot.objects.filter(pk__in=slot_ids, shift_id__in=shift_ids).values_list('id', 'shift_id')
+        )
+
+    lines = []
+    super_found = False
+    for ln in custom_lines:
+        # Map category code safely
+        category_code = ln.get('category_code') or ln.get('category') or 'ProfessionalServices'
+        if category_code.lower() == 'superannuation':
+            super_found = True
+
+        qty = Decimal(str(ln.get('quantity', 0)))
+        rate = Decimal(str(ln.get('unit_price', 0)))
+        discount = Decimal(str(ln.get('discount', 0))) / Decimal('100')
+        total = (qty * rate * (1 - discount)).quantize(Decimal('0.01'))
+
+        shift_id = shift_by_slot.get(_line_slot_id(ln))
+        service_date = parse_date(str(ln.get('service_date') or ln.get('date') or '')) if shift_id else None
+
+        lines.append(InvoiceLineItem(
+            description=ln.get('description', ''),
+            category_code=category_code,
+            unit=ln.get('unit', 'Item'),
+            quantity=qty,
+            unit_price=rate,
+            discount=discount * Decimal('100'),
+            total=total,
+            gst_applicable=ln.get('gst_applicable', True),
+            super_applicable=ln.get('super_applicable', True),
+            is_manual=True,
+            was_modified=True,
+            shift_id=shift_id if service_date else None,
+            service_date=service_date,
+        ))
+    return lines, super_found
+
+
+def save_invoice_with_lines(invoice, lines, super_found=False, shift_ids=()):
+    """
+    Compute totals in memory, then write the invoice with one INSERT and all of
+    its line items (plus the superannuation line when due) with one bulk INSERT.
+    ``shift_ids`` are recorded as the shifts the invoice bills.
+    """
+    subtotal = sum((line.total for line in lines), Decimal('0.00'))
+    gst_amt = (subtotal * Decimal('0.10')).quantize(Decimal('0.01')) if invoice.gst_registered else Decimal('0.00')
+    super_amt = (subtotal * (invoice.super_rate_snapshot / Decimal('100'))).quantize(Decimal('0.01'))
 
-    invoice = Invoice.objects.create(
+    invoice.subtotal = subtotal
+    invoice.gst_amount = gst_amt
+    invoice.super_amount = super_amt
+    invoice.total = (subtotal + gst_amt + super_amt).quantize(Decimal('0.01'))
+
+    # Only add a superannuation line if it is **not already present**
+    if super_amt > 0 and not super_found:
+        lines = [*lines, InvoiceLineItem(
+            description="Superannuation",
+            category_code='Superannuation',
+            unit="Lump Sum",
+            quantity=Decimal('1.00'),
+            unit_price=super_amt,
+            discount=Decimal('0.00'),
+            total=super_amt,
+            gst_applicable=False,
+            super_applicable=False,
+            is_manual=True,
+            was_modified=False
+        )]
+
+    with transaction.atomic():
+        invoice.save()
+        for line in lines:
+            line.invoice = invoice
+        # bulk_create skips post_save, so queue the PDF render explicitly.
+        InvoiceLineItem.objects.bulk_create(lines)
+        if shift_ids:
+            invoice.shifts.add(*shift_ids)
+        from client_profile.tasks import schedule_invoice_pdf_render
+        schedule_invoice_pdf_render(invoice.pk)
+    return invoice
+
+
+def _truthy(value):
+    if isinstance(value, str):
+        return value.lower() in ['true', '1', 'yes']
+    return bool(value)
+
+
+def build_invoice_header(user, pharmacy_id, shift_ids, external, billing_data, due_date=None):
+    """Unsaved ``Invoice`` with issuer, bank/super and bill-to snapshots filled in."""
+    try:
+        ob = PharmacistOnboarding.objects.get(user=user)
+    except PharmacistOnboarding.DoesNotExist:
+        ob = OtherStaffOnboarding.objects.get(user=user)
+
+    invoice = Invoice(
         user=user,
         external=external,
         issuer_first_name=user.first_name,
         issuer_last_name=user.last_name,
         issuer_abn=ob.abn or '',
         issuer_email=user.email,
-        gst_registered=gst_registered,
+        gst_registered=_truthy(billing_data.get('gst_registered', False)),
         super_fund_name=billing_data.get('super_fund_name', ''),
         super_usi=billing_data.get('super_usi', ''),
         super_member_number=billing_data.get('super_member_number', ''),
@@ -495,8 +644,6 @@ def generate_invoice_from_shifts(
         due_date=due_date,
     )
 
-    subtotal = Decimal('0.00')
-
     # --- Set snapshot/bill-to fields ---
     if not external:
         pharmacy = Pharmacy.objects.get(pk=pharmacy_id)
@@ -512,9 +659,9 @@ def generate_invoice_from_shifts(
         ]
         invoice.pharmacy_address_snapshot = ", ".join([str(p).strip() for p in parts if p])
 
-        invoice.pharmacy_abn_snapshot = pharmacy.abn
+        invoice.pharmacy_abn_snapshot = pharmacy.abn or ''
 
-        shift = Shift.objects.get(pk=shift_ids[0])
+        shift = Shift.objects.select_related('created_by').get(pk=shift_ids[0])
         invoice.bill_to_first_name = shift.created_by.first_name
         invoice.bill_to_last_name = shift.created_by.last_name
         invoice.bill_to_email = shift.created_by.email
@@ -524,83 +671,204 @@ def generate_invoice_from_shifts(
         invoice.custom_bill_to_address = billing_data.get('custom_bill_to_address', '')
         invoice.bill_to_email = billing_data.get('bill_to_email', '')
         invoice.bill_to_abn = billing_data.get('bill_to_abn', '')
+    return invoice
 
-    invoice.save()
+
+def generate_invoice_from_shifts(
+    user,
+    pharmacy_id=None,
+    shift_ids=None,
+    custom_lines=None,
+    external=False,
+    billing_data=None,
+    due_date=None
+    ):
+
+    # Parse shift_ids safely
+    shift_ids = billing_data.get('shift_ids')
+    if shift_ids:
+        if isinstance(shift_ids, str):
+            shift_ids = json.loads(shift_ids)
+    else:
+        shift_ids = []
+
+    external = _truthy(billing_data.get('external', False))
+
+    # Enforce ABN-only for internal invoices.
+    if not external and shift_ids:
+        if Shift.objects.filter(pk__in=shift_ids).exclude(payment_preference__iexact='ABN').exists():
+            raise ValidationError("Internal invoices are only allowed for ABN shifts.")
+
+    invoice = build_invoice_header(user, pharmacy_id, shift_ids, external, billing_data, due_date)
 
     # --- USE ONLY THE PASSED LINE ITEMS ---
     # Map and save fields as provided by the user
-    super_found = False
-
+    lines, super_found = [], False
     if custom_lines:
-        for ln in custom_lines:
-            # Map category code safely
-            category_code = ln.get('category_code') or ln.get('category') or 'ProfessionalServices'
-            if category_code.lower() == 'superannuation':
-                super_found = True
-
-            qty = Decimal(str(ln.get('quantity', 0)))
-            rate = Decimal(str(ln.get('unit_price', 0)))
-            discount = Decimal(str(ln.get('discount', 0))) / Decimal('100')
-            total = (qty * rate * (1 - discount)).quantize(Decimal('0.01'))
-
-            InvoiceLineItem.objects.create(
-                invoice=invoice,
-                description=ln.get('description', ''),
-                category_code=category_code,
-                unit=ln.get('unit', 'Item'),
-                quantity=qty,
-                unit_price=rate,
-                discount=discount * Decimal('100'),
-                total=total,
-                gst_applicable=ln.get('gst_applicable', True),
-                super_applicable=ln.get('super_applicable', True),
-                is_manual=True,
-                was_modified=True
-            )
-            subtotal += total
-
+        lines, super_found = build_custom_invoice_lines(custom_lines, shift_ids)
     elif not external and shift_ids:
-        # Legacy support: auto-generate from shift slots if no custom lines
-        for shift in Shift.objects.filter(pk__in=shift_ids):
-            for entry in expand_shift_slots(shift):
-                # ... your slot expansion logic ...
-                pass
+        # No custom lines: build them from the user's locked-in slot assignments.
+        shifts = Shift.objects.filter(pk__in=shift_ids).prefetch_related('slots')
+        lines = build_shift_invoice_lines(shifts, user)
 
-    # --- GST, super, totals ---
-    gst_amt = (subtotal * Decimal('0.10')).quantize(Decimal('0.01')) if invoice.gst_registered else Decimal('0.00')
-    super_amt = (subtotal * (invoice.super_rate_snapshot / Decimal('100'))).quantize(Decimal('0.01'))
+    return save_invoice_with_lines(invoice, lines, super_found, shift_ids)
 
-    invoice.subtotal = subtotal
-    invoice.gst_amount = gst_amt
-    invoice.super_amount = super_amt
-    invoice.total = (subtotal + gst_amt + super_amt).quantize(Decimal('0.01'))
-    invoice.save()
 
-    # Only add a superannuation line if it is **not already present**
-    if super_amt > 0 and not super_found:
-        InvoiceLineItem.objects.create(
-            invoice=invoice,
-            description="Superannuation",
-            category_code='Superannuation',
-            unit="Lump Sum",
-            quantity=Decimal('1.00'),
-            unit_price=super_amt,
-            discount=Decimal('0.00'),
-            total=super_amt,
-            gst_applicable=False,
-            super_applicable=False,
-            is_manual=True,
-            was_modified=False
-        )
+def generate_pay_period_invoices(user, period_start, period_end, billing_data, due_date=None, pharmacy_ids=None):
+    """
+    Invoice every ABN slot occurrence the worker was assigned between
+    ``period_start`` and ``period_end`` (inclusive): one invoice per pharmacy,
+    all created in a single transaction. Occurrences already invoiced are skipped
+    and pharmacies with nothing left to bill get no invoice.
+    """
+    period = (period_start, period_end)
+    shift_ids_by_pharmacy = {}
+    rows = ShiftSlotAssignment.objects.filter(
+        user=user,
+        slot_date__range=period,
+        shift__payment_preference__iexact='ABN',
+        shift__pharmacy__isnull=False,
+    )
+    if pharmacy_ids:
+        rows = rows.filter(shift__pharmacy_id__in=pharmacy_ids)
+    rows = (
+        rows
+        .values_list('shift__pharmacy_id', 'shift_id')
+        .distinct()
+        .order_by('shift__pharmacy_id', 'shift_id')
+    )
+    for pharmacy_id, shift_id in rows:
+        shift_ids_by_pharmacy.setdefault(pharmacy_id, []).append(shift_id)
 
-    return invoice
+    invoices = []
+    with transaction.atomic():
+        for pharmacy_id, shift_ids in shift_ids_by_pharmacy.items():
+            shifts = Shift.objects.filter(pk__in=shift_ids).prefetch_related('slots')
+            lines = build_shift_invoice_lines(shifts, user, period)
+            if not lines:
+                continue
+            invoice = build_invoice_header(user, pharmacy_id, shift_ids, False, billing_data, due_date)
+            billed_shift_ids = sorted({line.shift_id for line in lines})
+            invoices.append(save_invoice_with_lines(invoice, lines, shift_ids=billed_shift_ids))
+    return invoices
 
 
 
-from django.template.loader import render_to_string
-from weasyprint import HTML
+from django.template.loader import get_template, render_to_string
+
+INVOICE_PDF_TEMPLATE = "invoices/invoice_pdf.html"
+INVOICE_PDF_PREFIX = "invoices/pdf"
+# Workflow state that is not printed; sending or paying an invoice keeps its PDF.
+INVOICE_PDF_IGNORED_FIELDS = {'status'}
+
+
+@lru_cache(maxsize=None)
+def _invoice_pdf_template_digest():
+    with open(get_template(INVOICE_PDF_TEMPLATE).origin.name, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def invoice_pdf_fingerprint(invoice):
+    """
+    Hash of everything the PDF is rendered from: the stored invoice row, its line
+    items and the template source. Any edit yields a new digest, so stored PDFs never
+    need to be overwritten in place.
+    """
+    # Read persisted values so the digest doesn't depend on how the instance was built.
+    invoice_fields = [
+        field.attname for field in Invoice._meta.concrete_fields
+        if field.name not in INVOICE_PDF_IGNORED_FIELDS
+    ]
+    invoice_values = [
+        str(value)
+        for value in Invoice.objects.filter(pk=invoice.pk).values_list(*invoice_fields).get()
+    ]
+    item_fields = [field.attname for field in InvoiceLineItem._meta.concrete_fields]
+    line_values = [
+        [str(value) for value in row]
+        for row in invoice.line_items.order_by('id').values_list(*item_fields)
+    ]
+    payload = json.dumps(
+        [invoice_values, line_values, _invoice_pdf_template_digest()],
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def invoice_pdf_storage_key(invoice, fingerprint=None):
+    fingerprint = fingerprint or invoice_pdf_fingerprint(invoice)
+    return f"{INVOICE_PDF_PREFIX}/{invoice.pk}/{fingerprint}.pdf"
+
+
+def cached_invoice_pdf_key(invoice, fingerprint=None):
+    """Storage key of an already rendered PDF for the invoice's current content, or None."""
+    key = invoice_pdf_storage_key(invoice, fingerprint)
+    return key if default_storage.exists(key) else None
+
+
+def store_invoice_pdf(invoice, fingerprint=None):
+    """
+    Render the invoice into default storage unless this exact content is already
+    stored, drop PDFs of older revisions, and return the storage key.
+    """
+    key = invoice_pdf_storage_key(invoice, fingerprint)
+    if not default_storage.exists(key):
+        saved = default_storage.save(key, ContentFile(render_invoice_to_pdf(invoice)))
+        if saved != key:
+            # A concurrent render stored the same content first; keep that one.
+            default_storage.delete(saved)
+
+    delete_invoice_pdfs(invoice.pk, keep=key)
+    return key
+
+
+def delete_invoice_pdfs(invoice_id, keep=None):
+    folder = f"{INVOICE_PDF_PREFIX}/{invoice_id}"
+    try:
+        _dirs, files = default_storage.listdir(folder)
+    except FileNotFoundError:
+        files = []
+    for name in files:
+        if f"{folder}/{name}" != keep:
+            default_storage.delete(f"{folder}/{name}")
+
+
+def build_invoice_email(invoice):
+    """``send_async_email`` kwargs (minus the attachment) and the PDF filename for an invoice."""
+    cc_list = []
+    if invoice.cc_emails:
+        cc_list = [e.strip() for e in invoice.cc_emails.split(",") if e.strip()]
+
+    full_bill_to_name = f"{(invoice.bill_to_first_name or '').strip()} {(invoice.bill_to_last_name or '').strip()}".strip()
+    context = {
+        "invoice": invoice,
+        "client_name": (
+            (invoice.custom_bill_to_name or "").strip()
+            or full_bill_to_name
+            or (invoice.pharmacy_name_snapshot or "").strip()
+        ),
+        "issuer_name": f"{invoice.issuer_first_name} {invoice.issuer_last_name}".strip(),
+        "subtotal": str(invoice.subtotal),
+        "gst_amount": str(invoice.gst_amount),
+        "super_amount": str(invoice.super_amount),
+        "total": str(invoice.total),
+        "invoice_date": str(invoice.invoice_date),
+        "due_date": str(invoice.due_date or ""),
+    }
+    email_kwargs = dict(
+        subject=f"Invoice #{invoice.id} from ChemistTasker",
+        recipient_list=[(invoice.bill_to_email or "").strip()],
+        template_name="emails/invoice_sent.html",
+        context=context,
+        text_template=None,               # optional plain text template; use html for now
+        cc=cc_list,
+    )
+    return f"invoice_{invoice.id}.pdf", email_kwargs
+
 
 def render_invoice_to_pdf(invoice):
+    from weasyprint import HTML  # heavy (pango/cairo); only needed when a PDF is rendered
+
     line_items = invoice.line_items.all().order_by('id')
 
     # Always use Decimal for calculations
@@ -629,6 +897,6 @@ def render_invoice_to_pdf(invoice):
         "super_amount": super_amount,
         "grand_total": grand_total,
     }
-    html_string = render_to_string("invoices/invoice_pdf.html", context)
+    html_string = render_to_string(INVOICE_PDF_TEMPLATE, context)
     pdf_bytes = HTML(string=html_string, base_url=None).write_pdf()
     return pdf_bytes
@@ -0,0 +1,113 @@
+"""
+Shift reminder emails, sent ``SHIFT_REMINDER_LEAD_HOURS`` before each assigned
+occurrence starts.
+
+Every ``ShiftSlotAssignment`` stores ``starts_at``, the UTC start of its
+occurrence, so a run reads the hour-long window on that indexed column,
+starting ``SHIFT_REMINDER_WINDOW_OVERLAP_MINUTES`` early so late runs leave no
+gap. It does not scan each pharmacy's assignments and convert timezones in
+Python.
+Due assignments are claimed in chunks by inserting ``ShiftReminderDelivery``
+rows. The unique (assignment, starts_at) constraint lets only one run claim
+each reminder, so overlapping runs cannot double-send. All of the run's emails
+are queued through one ``enqueue_email_batch`` call.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from users.tasks import enqueue_email_batch
+
+from .models import ShiftReminderDelivery, ShiftSlotAssignment
+from .utils import build_shift_email_context
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_assignment_starts(assignments):
+    """Recompute ``starts_at`` for ``assignments`` (a queryset), e.g. after a slot or timezone change."""
+    batch = []
+    for assignment in assignments.select_related("slot", "shift__pharmacy").iterator(chunk_size=500):
+        starts_at = assignment.compute_starts_at()
+        if assignment.starts_at != starts_at:
+            assignment.starts_at = starts_at
+            batch.append(assignment)
+    ShiftSlotAssignment.objects.bulk_update(batch, ["starts_at"], batch_size=500)
+    return len(batch)
+
+
+def _reminder_email(assignment):
+    shift, slot, candidate = assignment.shift, assignment.slot, assignment.user
+    slot_date = assignment.slot_date or slot.date
+    slot_time = f"{slot_date} {slot.start_time.strftime('%H:%M')}–{slot.end_time.strftime('%H:%M')}"
+    return dict(
+        subject=f"Reminder: Your upcoming shift at {shift.pharmacy.name}",
+        recipient_list=[candidate.email],
+        template_name="emails/shift_reminder.html",
+        context=build_shift_email_context(
+            shift,
+            user=candidate,
+            role=(candidate.role or "pharmacist").lower(),
+            extra={"slot_time": slot_time},
+        ),
+        text_template="emails/shift_reminder.txt",
+    )
+
+
+def _claim(chunk, run_token):
+    """Insert delivery rows for ``chunk``; returns the assignment ids this run won."""
+    ShiftReminderDelivery.objects.bulk_create(
+        [
+            ShiftReminderDelivery(assignment_id=pk, starts_at=starts_at, run_token=run_token)
+            for pk, starts_at in chunk
+        ],
+        ignore_conflicts=True,
+    )
+    return ShiftReminderDelivery.objects.filter(
+        run_token=run_token, assignment_id__in=[pk for pk, _ in chunk]
+    ).values_list("assignment_id", flat=True)
+
+
+def send_shift_reminders(now=None):
+    now = now or timezone.now()
+    lead = now + timedelta(hours=settings.SHIFT_REMINDER_LEAD_HOURS)
+    # Reach back so a run that starts late still covers what its predecessor's
+    # window ended on; the delivery claims drop anything already sent.
+    window_start = lead - timedelta(minutes=settings.SHIFT_REMINDER_WINDOW_OVERLAP_MINUTES)
+    window_end = lead + timedelta(hours=1)
+    due = list(
+        ShiftSlotAssignment.objects.filter(
+            starts_at__gte=window_start,
+            starts_at__lt=window_end,
+            shift__pharmacy__isnull=False,
+        )
+        .exclude(
+            Exists(ShiftReminderDelivery.objects.filter(assignment=OuterRef("pk"), starts_at=OuterRef("starts_at")))
+        )
+        .order_by("starts_at", "pk")
+        .values_list("pk", "starts_at")
+    )
+
+    run_token = uuid.uuid4().hex
+    size = settings.SHIFT_REMINDER_CHUNK_SIZE
+    reminders = []
+    for start in range(0, len(due), size):
+        claimed = _claim(due[start:start + size], run_token)
+        assignments = ShiftSlotAssignment.objects.filter(pk__in=list(claimed)).select_related(
+            "shift__pharmacy", "slot", "user"
+        )
+        reminders.extend(_reminder_email(assignment) for assignment in assignments)
+
+    # One batch task per EMAIL_BATCH_SIZE reminders, each over a single mail connection.
+    total_sent = enqueue_email_batch(reminders)
+    # Claims only matter while their window can still be re-read.
+    ShiftReminderDelivery.objects.filter(starts_at__lt=now - timedelta(days=1)).delete()
+    logger.info(
+        "[send_shift_reminders] %s due in %s–%s, queued %s emails.",
+        len(due), window_start.isoformat(), window_end.isoformat(), total_sent,
+    )
+    return total_sent
@@ -1,7 +1,9 @@
 # client_profile/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from client_profile.models import Message
@@ -19,7 +21,21 @@ from .models import (
     PharmacistOnboarding,
     OtherStaffOnboarding,
     ExplorerOnboarding,
+    Invoice,
+    InvoiceLineItem,
+    Organization,
+    Pharmacy,
+    PharmacyAdmin,
+    PharmacyCommunityGroup,
+    PharmacyCommunityGroupMembership,
+    Rating,
+    ShiftSlot,
+    ShiftSlotAssignment,
 )
+from .cache_versions import bump_cache_versions
+from .permission_context import invalidate_permission_context, pharmacy_permission_user_ids
+from .shift_reminders import refresh_assignment_starts
+from users.models import OrganizationMembership, User
 
 log = logging.getLogger("client_profile.signals")
 
@@ -188,3 +204,215 @@ def _award_verified_referrals_after_commit(instance):
 @receiver(post_save, sender=ExplorerOnboarding)
 def award_pill_referrals_when_onboarding_verified(sender, instance, **kwargs):
     _award_verified_referrals_after_commit(instance)
+
+
+# Checks that complete outside the verification group: AHPRA is reviewed by
+# hand, ABN by the user confirming the ABR entity, referees through their link.
+MANUAL_VERIFICATION_FIELDS = ("ahpra_verified", "abn_verified", "referee1_confirmed", "referee2_confirmed")
+
+
+def _manual_verification_fields(model):
+    concrete = {field.name for field in model._meta.concrete_fields}
+    return [name for name in MANUAL_VERIFICATION_FIELDS if name in concrete]
+
+
+@receiver(pre_save, sender=OwnerOnboarding)
+@receiver(pre_save, sender=PharmacistOnboarding)
+@receiver(pre_save, sender=OtherStaffOnboarding)
+@receiver(pre_save, sender=ExplorerOnboarding)
+def remember_manual_verification_fields(sender, instance, update_fields=None, **kwargs):
+    fields = _manual_verification_fields(sender)
+    if update_fields is not None:
+        fields = [name for name in fields if name in update_fields]
+    previous = None
+    if fields and instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    instance._manual_verification_before = previous
+
+
+@receiver(post_save, sender=OwnerOnboarding)
+@receiver(post_save, sender=PharmacistOnboarding)
+@receiver(post_save, sender=OtherStaffOnboarding)
+@receiver(post_save, sender=ExplorerOnboarding)
+def reevaluate_when_manual_check_completes(sender, instance, created, **kwargs):
+    before = getattr(instance, "_manual_verification_before", None)
+    if created or not before or not instance.submitted_for_verification:
+        return
+    if not any(getattr(instance, name) and not was for name, was in before.items()):
+        return
+    from django_q.tasks import async_task
+    model_name, object_pk = sender.__name__, instance.pk
+    transaction.on_commit(lambda: async_task("client_profile.tasks.final_evaluation", model_name, object_pk))
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=InvoiceLineItem)
+@receiver(post_delete, sender=InvoiceLineItem)
+def rerender_invoice_pdf(sender, instance, **kwargs):
+    from client_profile.services import INVOICE_PDF_IGNORED_FIELDS
+    from client_profile.tasks import schedule_invoice_pdf_render
+    update_fields = kwargs.get("update_fields")
+    if sender is Invoice and update_fields and set(update_fields) <= INVOICE_PDF_IGNORED_FIELDS:
+        return
+    invoice_id = instance.pk if sender is Invoice else instance.invoice_id
+    schedule_invoice_pdf_render(invoice_id)
+
+
+@receiver(post_delete, sender=Invoice)
+def delete_invoice_pdfs_on_delete(sender, instance, **kwargs):
+    from client_profile.services import delete_invoice_pdfs
+    invoice_id = instance.pk
+    transaction.on_commit(lambda: delete_invoice_pdfs(invoice_id))
+
+
+@receiver(post_delete, sender=Rating)
+def discount_rating_on_delete(sender, instance, **kwargs):
+    from client_profile.ratings import discount_deleted_rating
+    discount_deleted_rating(instance)
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+@receiver(post_save, sender=PharmacyAdmin)
+@receiver(post_delete, sender=PharmacyAdmin)
+@receiver(post_save, sender=OrganizationMembership)
+@receiver(post_delete, sender=OrganizationMembership)
+def invalidate_permission_context_for_user(sender, instance, **kwargs):
+    invalidate_permission_context([instance.user_id])
+
+
+@receiver(m2m_changed, sender=OrganizationMembership.pharmacies.through)
+def invalidate_permission_context_for_org_pharmacies(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, OrganizationMembership):
+        invalidate_permission_context([instance.user_id])
+    else:
+        # Changed from the pharmacy side: pk_set holds OrganizationMembership ids.
+        invalidate_permission_context(
+            OrganizationMembership.objects.filter(pk__in=pk_set or ()).values_list("user_id", flat=True)
+        )
+
+
+@receiver(pre_save, sender=Pharmacy)
+def remember_pharmacy_permission_fields(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {"owner", "organization", "timezone"} & set(update_fields):
+        previous = {
+            "owner_id": instance.owner_id,
+            "organization_id": instance.organization_id,
+            "timezone": instance.timezone,
+        }
+    elif instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values("owner_id", "organization_id", "timezone").first()
+    else:
+        previous = None
+    instance._permission_fields_before = previous or {"owner_id": None, "organization_id": None, "timezone": None}
+
+
+@receiver(post_save, sender=Pharmacy)
+@receiver(post_delete, sender=Pharmacy)
+def invalidate_access_caches_for_pharmacy(sender, instance, **kwargs):
+    before = getattr(instance, "_permission_fields_before", None)
+    if before is not None and kwargs.get("signal") is post_save and not kwargs.get("created") and (
+        before["owner_id"] == instance.owner_id and before["organization_id"] == instance.organization_id
+    ):
+        # Profile edit: ownership and organisation unchanged.
+        bump_cache_versions(pharmacy_ids=[instance.pk])
+        return
+    before = before or {}
+    organization_ids = [before.get("organization_id"), instance.organization_id]
+    user_ids = pharmacy_permission_user_ids(
+        owner_ids=[before.get("owner_id"), instance.owner_id],
+        organization_ids=organization_ids,
+    )
+    invalidate_permission_context(user_ids)
+    bump_cache_versions(user_ids=user_ids, pharmacy_ids=[instance.pk], organization_ids=organization_ids)
+
+
+@receiver(post_save, sender=Pharmacy)
+def refresh_assignment_starts_for_timezone(sender, instance, created, **kwargs):
+    before = getattr(instance, "_permission_fields_before", None)
+    if created or before is None or before["timezone"] == instance.timezone:
+        return
+    # Stored occurrence starts are UTC; upcoming ones move with the pharmacy's clock.
+    refresh_assignment_starts(
+        ShiftSlotAssignment.objects.filter(shift__pharmacy=instance, starts_at__gte=timezone.now() - timedelta(days=1))
+    )
+
+
+@receiver(post_save, sender=ShiftSlot)
+def refresh_assignment_starts_for_slot(sender, instance, created, **kwargs):
+    if not created:
+        refresh_assignment_starts(ShiftSlotAssignment.objects.filter(slot=instance))
+
+
+# Version stamps for the hub context and authenticated-user caches (see
+# client_profile.cache_versions).
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def bump_cache_versions_for_membership(sender, instance, **kwargs):
+    # Member counts of the pharmacy's organisation change too.
+    organization_id = (
+        Pharmacy.objects.filter(pk=instance.pharmacy_id).values_list("organization_id", flat=True).first()
+    )
+    bump_cache_versions(
+        user_ids=[instance.user_id],
+        pharmacy_ids=[instance.pharmacy_id],
+        organization_ids=[organization_id],
+    )
+
+
+@receiver(post_save, sender=PharmacyAdmin)
+@receiver(post_delete, sender=PharmacyAdmin)
+@receiver(post_save, sender=OtherStaffOnboarding)
+def bump_cache_versions_for_user(sender, instance, **kwargs):
+    bump_cache_versions(user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=User)
+def bump_cache_versions_for_role(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "role" in update_fields:
+        bump_cache_versions(user_ids=[instance.pk])
+
+
+@receiver(post_save, sender=OrganizationMembership)
+@receiver(post_delete, sender=OrganizationMembership)
+def bump_cache_versions_for_org_membership(sender, instance, **kwargs):
+    bump_cache_versions(user_ids=[instance.user_id], organization_ids=[instance.organization_id])
+
+
+@receiver(m2m_changed, sender=OrganizationMembership.pharmacies.through)
+def bump_cache_versions_for_org_pharmacies(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, OrganizationMembership):
+        bump_cache_versions(user_ids=[instance.user_id])
+    else:
+        bump_cache_versions(
+            user_ids=OrganizationMembership.objects.filter(pk__in=pk_set or ()).values_list("user_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def bump_cache_versions_for_organization(sender, instance, **kwargs):
+    bump_cache_versions(organization_ids=[instance.pk])
+
+
+@receiver(post_save, sender=PharmacyCommunityGroup)
+@receiver(post_delete, sender=PharmacyCommunityGroup)
+def bump_cache_versions_for_group(sender, instance, **kwargs):
+    bump_cache_versions(pharmacy_ids=[instance.pharmacy_id])
+
+
+@receiver(post_save, sender=PharmacyCommunityGroupMembership)
+@receiver(post_delete, sender=PharmacyCommunityGroupMembership)
+def bump_cache_versions_for_group_membership(sender, instance, **kwargs):
+    # Members may come from other pharmacies of the organisation, whose payload
+    # doesn't depend on the group's pharmacy yet.
+    pharmacy_id = (
+        PharmacyCommunityGroup.objects.filter(pk=instance.group_id).values_list("pharmacy_id", flat=True).first()
+    )
+    user_id = Membership.objects.filter(pk=instance.membership_id).values_list("user_id", flat=True).first()
+    bump_cache_versions(user_ids=[user_id], pharmacy_ids=[pharmacy_id])
@@ -1,28 +1,24 @@
-import sys
 import os
 import json
-import tempfile
-import shutil
+from functools import partial
 from pathlib import Path
 from datetime import timedelta, datetime
 from django_q.models import Schedule
 from urllib.parse import urlencode
 from django.apps import apps
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import Q
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.storage import default_storage
 from django_q.tasks import async_task
 import time
-import requests
 import dateutil.parser
-from bs4 import BeautifulSoup
-from scrapingbee import ScrapingBeeClient
-from users.tasks import send_async_email
+from users.tasks import enqueue_email_batch, send_async_email, send_email_batch
 from client_profile.models import ShiftSlotAssignment, OnboardingNotification, MembershipApplication, Membership, Pharmacy, PharmacyAdmin
-from client_profile.timezone_utils import get_pharmacy_timezone
+from client_profile.abn import lookup_abn
+from client_profile.ocr import ocr_document
 from django.contrib.contenttypes.models import ContentType
 from client_profile.utils import build_shift_email_context, simple_name_match,clean_email,get_candidate_role, send_referee_emails, get_frontend_dashboard_url 
 import logging
@@ -54,104 +50,11 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 logger.info(f"[SETUP] Output files will be saved to {OUTPUT_DIR}")
 
 
-def fetch_instance_with_retries(model, pk, max_retries=10, sleep_sec=0.4):
-    for i in range(max_retries):
-        try:
-            return model.objects.get(pk=pk)
-        except ObjectDoesNotExist:
-            logger.error(f"[fetch_instance_with_retries] Not found pk={pk}, try {i+1}/{max_retries}", file=sys.stderr)
-            time.sleep(sleep_sec)
-    raise model.DoesNotExist(f"Object with pk={pk} not found after {max_retries} tries")
-
-def get_local_file_or_download(filefield):
-    if not filefield:
-        logger.info("[get_local_file_or_download] filefield is empty.")
-        return None
-    try:
-        if hasattr(filefield, "path") and os.path.exists(filefield.path):
-            logger.info(f"[get_local_file_or_download] Using local path: {filefield.path}")
-            return filefield.path
-    except Exception as e:
-        logger.info(f"[get_local_file_or_download] Could not access .path: {e}")
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=Path(filefield.name).suffix)
-    with default_storage.open(filefield.name, "rb") as remote_file:
-        shutil.copyfileobj(remote_file, temp_file)
-    temp_file.close()
-    logger.info(f"[get_local_file_or_download] Downloaded to temp: {temp_file.name}")
-    return temp_file.name
-
 def save_output_file(task_name, object_pk, extension="json"):
     out_path = OUTPUT_DIR / f"{task_name}_{object_pk}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
     logger.info(f"[save_output_file] Will write output to: {out_path}")
     return str(out_path)
 
-def pdf_first_page_to_png(pdf_path):
-    """
-    Convert the first PDF page to a temporary PNG so Azure Image Analysis can OCR it.
-    Works after get_local_file_or_download(), so the source can be local media or Azure Blob.
-    """
-    import fitz  # PyMuPDF
-
-    doc = fitz.open(pdf_path)
-    try:
-        if doc.page_count < 1:
-            raise Exception("PDF has no pages.")
-        page = doc.load_page(0)
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        temp_file.close()
-        pix.save(temp_file.name)
-        logger.info(f"[pdf_first_page_to_png] Converted first PDF page to: {temp_file.name}")
-        return temp_file.name
-    finally:
-        doc.close()
-
-def is_pdf_file(local_path):
-    try:
-        with open(local_path, "rb") as f:
-            header = f.read(5)
-        if header == b"%PDF-":
-            return True
-    except Exception as e:
-        logger.info(f"[is_pdf_file] Could not inspect file header for {local_path}: {e}")
-    return str(local_path).lower().endswith(".pdf")
-
-def ocr_input_path_for_file(local_path):
-    if is_pdf_file(local_path):
-        logger.info(f"[ocr_input_path_for_file] PDF detected, converting before OCR: {local_path}")
-        converted_path = pdf_first_page_to_png(local_path)
-        return converted_path, converted_path
-    logger.info(f"[ocr_input_path_for_file] Image input detected, sending directly to OCR: {local_path}")
-    return local_path, None
-
-# --- Inline OCR with Azure (direct call, not subprocess!) ---
-def azure_ocr(file_path):
-    """Run OCR using Azure Vision, returns lines of text."""
-    from azure.ai.vision.imageanalysis import ImageAnalysisClient
-    from azure.ai.vision.imageanalysis.models import VisualFeatures
-    from azure.core.credentials import AzureKeyCredential
-    # Assumes env has already been loaded
-    endpoint = env("AZURE_OCR_ENDPOINT")
-    key = env("AZURE_OCR_KEY")
-    if not endpoint or not key:
-        raise Exception("Missing AZURE_OCR_ENDPOINT or AZURE_OCR_KEY in env")
-    client = ImageAnalysisClient(
-        endpoint=endpoint,
-        credential=AzureKeyCredential(key)
-    )
-    with open(file_path, "rb") as image_stream:
-        result = client.analyze(
-            image_data=image_stream,
-            visual_features=[VisualFeatures.READ]
-        )
-    lines = []
-    if result.read and result.read.blocks:
-        for block in result.read.blocks:
-            for line in block.lines:
-                lines.append(line.text)
-    logger.info(f"[azure_ocr] OCR done for {file_path}, found {len(lines)} lines.")
-    return {"lines": lines}
-
 def verify_filefield_task(
     model_name,
     object_pk,
@@ -165,7 +68,11 @@ def verify_filefield_task(
     logger.info(f"[VERIFY FILEFIELD TASK] model={model_name}, pk={object_pk}, field={file_field}")
     note_field = kwargs.get('note_field')
     Model = apps.get_model("client_profile", model_name)
-    obj = fetch_instance_with_retries(Model, object_pk)
+    try:
+        obj = Model.objects.get(pk=object_pk)
+    except Model.DoesNotExist:
+        logger.error(f"[verify_filefield_task] No {model_name} with pk={object_pk}.")
+        return
     first_name = first_name or getattr(obj.user, "first_name", "") or ""
     last_name  = last_name  or getattr(obj.user, "last_name", "")  or ""
     email      = email      or getattr(obj.user, "email", "")      or ""
@@ -193,143 +100,37 @@ def verify_filefield_task(
         failure_note = "No file uploaded for this verification."
         logger.info(f"[verify_filefield_task] {failure_note} Setting as not verified.")
     else:
-        local_path = get_local_file_or_download(file_obj)
-        if not local_path or not os.path.exists(local_path):
-            failure_note = f"Could not obtain file for OCR: {local_path}."
-            logger.info(f"[verify_filefield_task] {failure_note}")
-        else:
-            converted_path = None
-            try:
-                ocr_path, converted_path = ocr_input_path_for_file(local_path)
-                logger.info(f"[verify_filefield_task] Sending OCR input path to Azure: {ocr_path}")
-                ocr_data = azure_ocr(ocr_path)
+        try:
+            outcome = ocr_document(file_obj)
+            logger.info(
+                f"[verify_filefield_task] OCR {'cache hit' if outcome.cached else 'done'} "
+                f"for {file_field}: {len(outcome.lines)} lines"
+            )
+            if not outcome.cached:
                 output_json = save_output_file("ocr", object_pk, "json")
                 with open(output_json, "w", encoding="utf-8") as f:
-                    json.dump(ocr_data, f, indent=2, ensure_ascii=False)
+                    json.dump({"lines": outcome.lines}, f, indent=2, ensure_ascii=False)
 
-                lines = ocr_data.get("lines", [])
-                text = " ".join(lines)
-                is_name_match = simple_name_match(text, first_name, last_name)
+            text = " ".join(outcome.lines)
+            is_name_match = simple_name_match(text, first_name, last_name)
 
-                if is_name_match:
-                    is_verified = True
-                    logger.info(f"[verify_filefield_task] Name match result: {is_name_match} (first={first_name}, last={last_name})")
-                else:
-                    failure_note = f"Name mismatch found in your uploaded document"
-                    logger.info(f"[verify_filefield_task] {failure_note}")
-
-            except Exception as e:
-                failure_note = f"OCR processing failed: {e}."
+            if is_name_match:
+                is_verified = True
+                logger.info(f"[verify_filefield_task] Name match result: {is_name_match} (first={first_name}, last={last_name})")
+            else:
+                failure_note = f"Name mismatch found in your uploaded document"
                 logger.info(f"[verify_filefield_task] {failure_note}")
-            finally:
-                if converted_path and os.path.exists(converted_path):
-                    os.remove(converted_path)
-                if local_path and os.path.exists(local_path) and Path(local_path).parent == Path(tempfile.gettempdir()):
-                    os.remove(local_path)
+
+        except Exception as e:
+            failure_note = f"OCR processing failed: {e}."
+            logger.info(f"[verify_filefield_task] {failure_note}")
 
     setattr(obj, verification_field, is_verified)
     if note_field and hasattr(obj, note_field):
         setattr(obj, note_field, failure_note[:255])
     obj.save(update_fields=[verification_field] + ([note_field] if note_field and hasattr(obj, note_field) else []))
 
-# --- ABN lookup and verification -------------------------------------------------
-def abn_lookup(abn_number: str):
-    url = f"https://abr.business.gov.au/ABN/View?id={abn_number}"
-    logger.info(f"[abn_lookup] Fetching {url}")
-    try:
-        resp = requests.get(url, timeout=20)
-        resp.raise_for_status()
-    except Exception as e:
-        logger.info(f"[abn_lookup] Error fetching ABN: {e}")
-        return "", None
-
-    soup = BeautifulSoup(resp.text, "html.parser")
-    tag = soup.find("span", {"itemprop": "legalName"})
-    return (tag.get_text(strip=True) if tag else ""), resp.text
-
-def _parse_abn_html_fields(html_text: str) -> dict:
-    """
-    Parse ABR HTML to lift:
-      - entity_name (legalName)
-      - entity_type
-      - abn_status  (raw line e.g. 'Active from 18 Aug 2020')
-      - abn_gst_registered (bool)
-      - abn_gst_from, abn_gst_to (date or None)
-    """
-    out = {}
-    if not html_text:
-        return out
-
-    soup = BeautifulSoup(html_text, "html.parser")
-    rows = soup.select('div[itemtype="http://schema.org/LocalBusiness"] table tbody tr')
-
-    def _clean(s: str) -> str:
-        # normalise non-breaking spaces etc.
-        return (s or "").replace("\xa0", " ").strip()
-
-    for r in rows:
-        th_el = r.find('th')
-        td_el = r.find('td')
-        th = _clean(th_el.get_text(" ", strip=True) if th_el else "")
-        td = _clean(td_el.get_text(" ", strip=True) if td_el else "")
-
-        if th.startswith("Entity name:"):
-            span = td_el.find('span', {"itemprop": "legalName"}) if td_el else None
-            out["entity_name"] = _clean(span.get_text(" ", strip=True) if span else td)
-
-        elif th.startswith("Entity type:"):
-            out["entity_type"] = td
-
-        elif th.startswith("ABN status:"):
-            out["abn_status"] = td
-
-        elif th.startswith("Goods") and "GST" in th:
-            # Examples seen:
-            #   'Not currently registered for GST'
-            #   'Registered from 19 May 2025'
-            #   'Registered from 1 September 2023 to 30 June 2024'
-            txt = td
-            out["gst_text"] = txt
-
-            low = txt.lower()
-            if "not currently" in low:
-                out["abn_gst_registered"] = False
-                out["abn_gst_from"] = None
-                out["abn_gst_to"] = None
-            else:
-                out["abn_gst_registered"] = True
-
-                # allow full or abbreviated month names, and optional "to ..."
-                # normalise multiples spaces
-                import re, datetime
-                txt_norm = re.sub(r"\s+", " ", txt)
-
-                # try to capture "from <date>"
-                m_from = re.search(
-                    r"\bfrom\s+(\d{1,2}\s+[A-Za-z]+\s+\d{4})",
-                    txt_norm,
-                    flags=re.IGNORECASE,
-                )
-                # try to capture "to <date>" (rare)
-                m_to = re.search(
-                    r"\bto\s+(\d{1,2}\s+[A-Za-z]+\s+\d{4})",
-                    txt_norm,
-                    flags=re.IGNORECASE,
-                )
-
-                def _parse_date(s: str):
-                    for fmt in ("%d %b %Y", "%d %B %Y"):
-                        try:
-                            return datetime.datetime.strptime(s, fmt).date()
-                        except Exception:
-                            pass
-                    return None
-
-                out["abn_gst_from"] = _parse_date(m_from.group(1)) if m_from else None
-                out["abn_gst_to"]   = _parse_date(m_to.group(1)) if m_to else None
-
-    return out
-
+# --- ABN verification -----------------------------------------------------------
 def verify_abn_task(model_name, object_pk, abn_number, first_name, last_name, email, **kwargs):
     """
     Scrape ABR page and populate ABR fields. DOES NOT set abn_verified=True –
@@ -339,7 +140,11 @@ def verify_abn_task(model_name, object_pk, abn_number, first_name, last_name, em
     logger.info(f"[VERIFY ABN TASK] model={model_name}, pk={object_pk}, abn={abn_number}")
 
     Model = apps.get_model("client_profile", model_name)
-    obj = fetch_instance_with_retries(Model, object_pk)
+    try:
+        obj = Model.objects.get(pk=object_pk)
+    except Model.DoesNotExist:
+        logger.error(f"[VERIFY ABN TASK] No {model_name} with pk={object_pk}.")
+        return
 
     # mark as not-verified every run (user confirmation will flip it)
     obj.abn_verified = False
@@ -349,8 +154,9 @@ def verify_abn_task(model_name, object_pk, abn_number, first_name, last_name, em
     else:
         obj.save(update_fields=["abn_verified"])
 
-    legal_name, html = abn_lookup(abn_number)
-    parsed = _parse_abn_html_fields(html or "")
+    lookup = lookup_abn(abn_number)
+    legal_name, parsed, html = lookup.legal_name, lookup.fields, lookup.html
+    logger.info(f"[VERIFY ABN TASK] abn={lookup.abn} found={lookup.found} cached={lookup.cached}")
 
     obj.abn_entity_name  = parsed.get("entity_name") or legal_name or ""
     obj.abn_entity_type  = parsed.get("entity_type") or ""
@@ -381,7 +187,7 @@ def verify_abn_task(model_name, object_pk, abn_number, first_name, last_name, em
     # artifacts
     out_html = save_output_file("abn_html", object_pk, "html")
     with open(out_html, "w", encoding="utf-8") as f:
-        f.write(html if html else "No HTML captured.")
+        f.write(html if html else ("Served from the ABN lookup cache." if lookup.cached else "No HTML captured."))
     out_json = save_output_file("abn", object_pk, "json")
     with open(out_json, "w", encoding="utf-8") as f:
         json.dump({
@@ -400,6 +206,8 @@ def ahpra_lookup(ahpra_number, output_html_path, api_key=None):
     """
     Scrape AHPRA using ScrapingBee with retries and better error handling.
     """
+    from scrapingbee import ScrapingBeeClient
+
     api_key = api_key or os.environ.get("SCRAPINGBEE_API_KEY")
     assert api_key, "SCRAPINGBEE_API_KEY must be set in environment or passed in"
     client = ScrapingBeeClient(api_key=api_key)
@@ -459,6 +267,8 @@ def ahpra_lookup(ahpra_number, output_html_path, api_key=None):
             time.sleep(3 * (attempt + 1)) # Wait before retrying
 
 def parse_ahpra_html(html_file_path):
+    from bs4 import BeautifulSoup
+
     with open(html_file_path, 'r', encoding='utf-8') as f:
         soup = BeautifulSoup(f, 'html.parser')
 
@@ -503,7 +313,11 @@ def verify_ahpra_task(model_name, object_pk, ahpra_number, first_name, last_name
     # --- END OF CHANGE ---
 
     Model = apps.get_model("client_profile", model_name)
-    obj = fetch_instance_with_retries(Model, object_pk)
+    try:
+        obj = Model.objects.get(pk=object_pk)
+    except Model.DoesNotExist:
+        logger.error(f"[AHPRA TASK] No {model_name} with pk={object_pk}.")
+        return
 
     # This logic correctly compares the incoming numeric-only `ahpra_number` 
     # with the numeric-only number stored on the object, so it doesn't need to change.
@@ -586,7 +400,7 @@ def _update_ahpra_fields(model_name, object_pk, verified, note, reg_type=None, r
     note = (note or "")[:255]
     Model = apps.get_model("client_profile", model_name)
     try:
-        obj = fetch_instance_with_retries(Model, object_pk)
+        obj = Model.objects.get(pk=object_pk)
     except Model.DoesNotExist:
         logger.info(f"[AHPRA TASK] Skipping update: record {model_name} with pk={object_pk} does not exist.")
         return
@@ -606,98 +420,140 @@ def _update_ahpra_fields(model_name, object_pk, verified, note, reg_type=None, r
 
 
 # --- ORCHESTRATOR AND FINAL EVALUATOR ---
-def run_all_verifications(model_name, object_pk, is_create=False):
-    """
-    MODIFIED: This orchestrator now also sends the initial admin notification.
-    """
-    from django.apps import apps
-    from django.utils import timezone
-    from datetime import timedelta
-    from client_profile.utils import send_referee_emails, notify_superuser_on_onboarding
+def _file_check(field, verified_field, note_field):
+    return (verify_filefield_task, [field], {"verification_field": verified_field, "note_field": note_field})
 
-    Model = apps.get_model("client_profile", model_name)
-    try:
-        obj = Model.objects.get(pk=object_pk)
-    except Model.DoesNotExist:
-        logger.error(f"[ORCHESTRATOR] Cannot find {model_name} with pk={object_pk}. Aborting.")
-        return
 
-    # --- NOTIFY SUPERUSER IMMEDIATELY ON SUBMISSION ---
-    if not notification_already_sent(obj, 'admin_notify'):
-        logger.info(f"[ORCHESTRATOR] Sending admin notification for {model_name} pk={object_pk}.")
-        notify_superuser_on_onboarding(obj)
-        mark_notification_sent(obj, 'admin_notify')
-
-    user = obj.user
+def verification_checks(obj, model_name):
+    """
+    The automated checks a submitted onboarding needs, as
+    ``(task, extra_args, kwargs)`` specs for ``run_verification_group``.
+    """
     model_name_lower = model_name.lower()
+    checks = []
 
-
-    # --- 1. Trigger all automated verification tasks (ABN, AHPRA, Files) ---
     if model_name_lower == 'pharmacistonboarding':
         # NOTE: AHPRA verification is handled manually to avoid automated scraping.
-        # if obj.ahpra_number:
-        #     async_task('client_profile.tasks.verify_ahpra_task', model_name, object_pk, obj.ahpra_number, user.first_name, user.last_name, user.email, q_options={'timeout': 300})
         if obj.payment_preference == "ABN" and obj.abn:
-            async_task('client_profile.tasks.verify_abn_task', model_name, object_pk, obj.abn, user.first_name, user.last_name, user.email, note_field='abn_verification_note')
+            checks.append((verify_abn_task, [obj.abn], {"note_field": "abn_verification_note"}))
         if obj.government_id:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'government_id', user.first_name, user.last_name, user.email, 'gov_id_verified', note_field='gov_id_verification_note')
+            checks.append(_file_check('government_id', 'gov_id_verified', 'gov_id_verification_note'))
         if obj.payment_preference == "TFN" and obj.tfn_declaration:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'tfn_declaration', user.first_name, user.last_name, user.email, 'tfn_declaration_verified', note_field='tfn_declaration_verification_note')
+            checks.append(_file_check('tfn_declaration', 'tfn_declaration_verified', 'tfn_declaration_verification_note'))
         if obj.gst_registered and obj.gst_file:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'gst_file', user.first_name, user.last_name, user.email, 'gst_file_verified', note_field='gst_file_verification_note')
-
-    elif model_name_lower == 'owneronboarding':
-        # NOTE: AHPRA verification is handled manually to avoid automated scraping.
-        # if obj.role == "PHARMACIST" and obj.ahpra_number:
-        #     async_task('client_profile.tasks.verify_ahpra_task', model_name, object_pk, obj.ahpra_number, user.first_name, user.last_name, user.email, q_options={'timeout': 300})
-        pass
+            checks.append(_file_check('gst_file', 'gst_file_verified', 'gst_file_verification_note'))
 
     elif model_name_lower == 'otherstaffonboarding':
         if obj.government_id:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'government_id', user.first_name, user.last_name, user.email, 'gov_id_verified', note_field='gov_id_verification_note')
+            checks.append(_file_check('government_id', 'gov_id_verified', 'gov_id_verification_note'))
         if obj.payment_preference == 'ABN' and obj.abn:
-            async_task('client_profile.tasks.verify_abn_task', model_name, object_pk, obj.abn, user.first_name, user.last_name, user.email, note_field='abn_verification_note')
+            checks.append((verify_abn_task, [obj.abn], {"note_field": "abn_verification_note"}))
         if obj.payment_preference == 'TFN' and obj.tfn_declaration:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'tfn_declaration', user.first_name, user.last_name, user.email, 'tfn_declaration_verified', note_field='tfn_declaration_verification_note')
+            checks.append(_file_check('tfn_declaration', 'tfn_declaration_verified', 'tfn_declaration_verification_note'))
         if obj.gst_registered and obj.gst_file:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'gst_file', user.first_name, user.last_name, user.email, 'gst_file_verified', note_field='gst_file_verification_note')
+            checks.append(_file_check('gst_file', 'gst_file_verified', 'gst_file_verification_note'))
         # Role-specific files
         if obj.role_type == 'INTERN' and obj.ahpra_proof:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'ahpra_proof', user.first_name, user.last_name, user.email, 'ahpra_proof_verified', note_field='ahpra_proof_verification_note')
+            checks.append(_file_check('ahpra_proof', 'ahpra_proof_verified', 'ahpra_proof_verification_note'))
         if obj.role_type == 'INTERN' and obj.hours_proof:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'hours_proof', user.first_name, user.last_name, user.email, 'hours_proof_verified', note_field='hours_proof_verification_note')
+            checks.append(_file_check('hours_proof', 'hours_proof_verified', 'hours_proof_verification_note'))
         if obj.role_type in ['ASSISTANT', 'TECHNICIAN'] and obj.certificate:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'certificate', user.first_name, user.last_name, user.email, 'certificate_verified', note_field='certificate_verification_note')
+            checks.append(_file_check('certificate', 'certificate_verified', 'certificate_verification_note'))
         if obj.role_type == 'STUDENT' and obj.university_id:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'university_id', user.first_name, user.last_name, user.email, 'university_id_verified', note_field='university_id_verification_note')
+            checks.append(_file_check('university_id', 'university_id_verified', 'university_id_verification_note'))
         # Optional files
         if obj.cpr_certificate:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 'cpr_certificate', user.first_name, user.last_name, user.email, 'cpr_certificate_verified', note_field='cpr_certificate_verification_note')
+            checks.append(_file_check('cpr_certificate', 'cpr_certificate_verified', 'cpr_certificate_verification_note'))
         if obj.s8_certificate:
-            async_task('client_profile.tasks.verify_filefield_task', model_name, object_pk, 's8_certificate', user.first_name, user.last_name, user.email, 's8_certificate_verified', note_field='s8_certificate_verification_note')
+            checks.append(_file_check('s8_certificate', 's8_certificate_verified', 's8_certificate_verification_note'))
+
     elif model_name_lower == 'exploreronboarding':
         if obj.government_id:
-            async_task(
-                'client_profile.tasks.verify_filefield_task',
-                model_name, object_pk, 'government_id',
-                user.first_name, user.last_name, user.email,
-                'gov_id_verified',
-                note_field='gov_id_verification_note'
-            )
+            checks.append(_file_check('government_id', 'gov_id_verified', 'gov_id_verification_note'))
+
+    # owneronboarding: AHPRA is manual, nothing automated to run.
+    return checks
+
+
+def _run_verification_check(model_name, object_pk, user_args, check):
+    task, extra_args, kwargs = check
+    try:
+        task(model_name, object_pk, *extra_args, *user_args, **kwargs)
+    except Exception:
+        task_name = getattr(task, "__name__", task)
+        logger.exception(f"[VERIFICATION GROUP] {task_name}{tuple(extra_args)} failed for {model_name} pk={object_pk}")
+
 
-    # --- 2. Send initial referee emails ---
+def _run_verification_check_in_thread(*args):
+    from django.db import connection
+    try:
+        _run_verification_check(*args)
+    finally:
+        connection.close()
+
+
+def run_verification_group(model_name, object_pk, checks, user_args=("", "", "")):
+    """
+    Run the checks concurrently on a thread pool inside this one task (each
+    is network-bound: OCR or the ABN register), wait for all of them, then run
+    ``final_evaluation`` exactly once. ``VERIFICATION_WORKERS`` <= 1 runs them
+    inline.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = min(len(checks), settings.VERIFICATION_WORKERS)
+    started = time.monotonic()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify") as pool:
+            list(pool.map(
+                lambda check: _run_verification_check_in_thread(model_name, object_pk, user_args, check),
+                checks,
+            ))
+    else:
+        for check in checks:
+            _run_verification_check(model_name, object_pk, user_args, check)
+    logger.info(
+        f"[VERIFICATION GROUP] {len(checks)} checks for {model_name} pk={object_pk} "
+        f"finished in {time.monotonic() - started:.1f}s on {max(workers, 1)} workers."
+    )
+    final_evaluation(model_name, object_pk)
+
+
+def run_all_verifications(model_name, object_pk, is_create=False):
+    """
+    Orchestrator: admin notification, referee emails, then every automated
+    check in one joined group that ends with a single ``final_evaluation``.
+    """
+    from client_profile.utils import send_referee_emails, notify_superuser_on_onboarding
+
+    Model = apps.get_model("client_profile", model_name)
+    try:
+        obj = Model.objects.get(pk=object_pk)
+    except Model.DoesNotExist:
+        logger.error(f"[ORCHESTRATOR] Cannot find {model_name} with pk={object_pk}. Aborting.")
+        return
+
+    # --- NOTIFY SUPERUSER IMMEDIATELY ON SUBMISSION ---
+    if not notification_already_sent(obj, 'admin_notify'):
+        logger.info(f"[ORCHESTRATOR] Sending admin notification for {model_name} pk={object_pk}.")
+        notify_superuser_on_onboarding(obj)
+        mark_notification_sent(obj, 'admin_notify')
+
+    user = obj.user
+    model_name_lower = model_name.lower()
+
+    # --- 1. Send initial referee emails ---
     referee_models = ['pharmacistonboarding', 'otherstaffonboarding', 'exploreronboarding']
     if model_name_lower in referee_models:
         logger.info(f"[ORCHESTRATOR] Sending initial referee requests for {model_name} pk={object_pk}.")
         send_referee_emails(obj)
 
-    # --- 3. Schedule the final evaluation ---
-    logger.info(f"[ORCHESTRATOR] All tasks for {model_name} pk={object_pk} triggered. Scheduling evaluation.")
-    async_task(
-        'client_profile.tasks.final_evaluation',
-        model_name,
-        object_pk,
-        q_options={'eta': timezone.now() + timedelta(minutes=3)}
+    # --- 2. Run the automated checks (ABN, files) together, then evaluate once ---
+    checks = verification_checks(obj, model_name)
+    logger.info(f"[ORCHESTRATOR] Running {len(checks)} verification checks for {model_name} pk={object_pk}.")
+    run_verification_group(
+        model_name, object_pk, checks,
+        user_args=(user.first_name or "", user.last_name or "", user.email or ""),
     )
 
 
@@ -850,8 +706,6 @@ def final_evaluation(model_name, object_pk, retry_count=0, is_reminder=False):
 
     # Debug timing: 0.1h (~6 min). Use 48 for production.
     REMINDER_DELAY = timedelta(hours=48)
-    # Keep your quick re-check loop, but schedule it properly
-    RECHECK_DELAY = timedelta(seconds=20)
 
     if is_pending_referee:
         logger.info(f"[FINAL EVALUATION] pk={object_pk} is waiting for referee confirmation.")
@@ -877,25 +731,13 @@ def final_evaluation(model_name, object_pk, retry_count=0, is_reminder=False):
         else:
             logger.info(f"[FINAL EVALUATION] Future referee reminder already exists for pk={object_pk}; leaving it in place.")
 
-        # If other automated checks are also pending, keep the quick re-check loop alive (properly delayed)
-        if is_pending_check:
-            Schedule.objects.create(
-                func='client_profile.tasks.final_evaluation',
-                args=f"'{model_name}',{object_pk}",
-                schedule_type=Schedule.ONCE,
-                next_run=timezone.now() + RECHECK_DELAY,
-            )
         return
 
-    # Automated checks still pending (no referee pending) -> keep quick loop
+    # Checks still pending (no referee pending). No polling: the verification
+    # group runs this once its checks finish, and completing a manual check
+    # (AHPRA, ABN confirmation, a referee) queues it again from signals.py.
     if is_pending_check:
-        logger.info(f"[FINAL EVALUATION] pk={object_pk} is waiting for automated tasks. Re-checking in 20s.")
-        Schedule.objects.create(
-            func='client_profile.tasks.final_evaluation',
-            args=f"'{model_name}',{object_pk}",
-            schedule_type=Schedule.ONCE,
-            next_run=timezone.now() + RECHECK_DELAY,
-        )
+        logger.info(f"[FINAL EVALUATION] pk={object_pk} is waiting for automated or manual checks.")
         return
 
     # Success state (unchanged)
@@ -930,70 +772,9 @@ def final_evaluation(model_name, object_pk, retry_count=0, is_reminder=False):
 # ========== Shift Reminder (Scheduled) ==========
 
 def send_shift_reminders():
-    now_utc = timezone.now()
-    today_utc = now_utc.date()
-    date_window = [today_utc + timedelta(days=delta) for delta in (-1, 0, 1, 2)]
-
-    assignments = (
-        ShiftSlotAssignment.objects.select_related("shift", "shift__pharmacy", "slot", "user")
-        .filter(Q(slot_date__in=date_window) | Q(slot_date__isnull=True))
-    )
-
-    pharmacy_assignment_map = {}
-    for assignment in assignments:
-        pharmacy = assignment.shift.pharmacy
-        if pharmacy is None:
-            continue
-        pharmacy_assignment_map.setdefault(pharmacy.id, {"pharmacy": pharmacy, "assignments": []})[
-            "assignments"
-        ].append(assignment)
-
-    total_sent = 0
-    for entry in pharmacy_assignment_map.values():
-        pharmacy = entry["pharmacy"]
-        tz = get_pharmacy_timezone(pharmacy)
-        local_now = now_utc.astimezone(tz)
-        window_start = local_now + timedelta(hours=12)
-        window_end = local_now + timedelta(hours=13)
-
-        def _in_window(slot_date, start_time):
-            if window_start.date() == window_end.date():
-                return slot_date == window_start.date() and window_start.time() <= start_time < window_end.time()
-            if slot_date == window_start.date():
-                return start_time >= window_start.time()
-            if slot_date == window_end.date():
-                return start_time < window_end.time()
-            return False
-
-        for assignment in entry["assignments"]:
-            slot_date = assignment.slot_date or getattr(assignment.slot, "date", None)
-            start_time = getattr(assignment.slot, "start_time", None)
-            if not slot_date or not start_time:
-                continue
-            if not _in_window(slot_date, start_time):
-                continue
-
-            shift = assignment.shift
-            candidate = assignment.user
-            slot = assignment.slot
-            slot_time = f"{slot_date} {slot.start_time.strftime('%H:%M')}–{slot.end_time.strftime('%H:%M')}"
+    from client_profile.shift_reminders import send_shift_reminders as send
 
-            async_task(
-                'users.tasks.send_async_email',
-                subject=f"Reminder: Your upcoming shift at {shift.pharmacy.name}",
-                recipient_list=[candidate.email],
-                template_name="emails/shift_reminder.html",
-                context=build_shift_email_context(
-                    shift,
-                    user=candidate,
-                    role=getattr(candidate, "role", "pharmacist").lower() if hasattr(candidate, "role") else "pharmacist",
-                    extra={"slot_time": slot_time}
-                ),
-                text_template="emails/shift_reminder.txt"
-            )
-            total_sent += 1
-
-    logger.info(f"[send_shift_reminders] Completed sending reminders. Sent {total_sent} emails.")
+    return send()
 
 
 
@@ -1195,7 +976,11 @@ def email_membership_application_submitted(app_id: int):
         "email": app.email or "",
     }
 
-    # Send one email per recipient with a role-correct manage_url
+    # One email per recipient with a role-correct manage_url, all over one connection
+    user_ids_by_email = dict(
+        User.objects.filter(email__in=list(recipients_by_role)).values_list('email', 'id')
+    )
+    messages = []
     for email, r_role in recipients_by_role.items():
         manage_url = f"{base}{_manage_path_for_role(r_role)}"
         ctx = {**ctx_common, "manage_url": manage_url}
@@ -1205,17 +990,18 @@ def email_membership_application_submitted(app_id: int):
             "action_url": manage_url,
             "payload": {"application_id": app.id},
         }
-        user_id = User.objects.filter(email=email).values_list('id', flat=True).first()
+        user_id = user_ids_by_email.get(email)
         if user_id:
             notification_payload['user_ids'] = [user_id]
-        send_async_email(
+        messages.append(dict(
             subject=f"New membership application — {pharmacy.name}",
             recipient_list=[email],
             template_name="emails/membership_application_submitted.html",
             text_template="emails/membership_application_submitted.txt",
             context=ctx,
             notification=notification_payload,
-        )
+        ))
+    send_email_batch(messages)
 
 
 def email_membership_application_approved(app_id: int):
@@ -1275,3 +1061,296 @@ def email_membership_application_approved(app_id: int):
         context=ctx,
         notification=notification_payload,
     )
+
+
+# ========== Invoice PDFs ==========
+INVOICE_PDF_RENDER_FUNC = 'client_profile.tasks.render_invoice_pdf'
+
+
+def _enqueue_invoice_pdf_render(invoice_id: int) -> None:
+    try:
+        async_task(INVOICE_PDF_RENDER_FUNC, invoice_id)
+    except Exception:
+        # The PDF view renders on a cache miss, so a broker outage must not fail the save.
+        logger.exception("Failed to queue PDF render for invoice %s", invoice_id)
+
+
+def _flush_invoice_pdf_renders(invoice_ids: set) -> None:
+    if getattr(connection, "pending_invoice_pdf_renders", None) is invoice_ids:
+        connection.pending_invoice_pdf_renders = None
+    for invoice_id in sorted(invoice_ids):
+        _enqueue_invoice_pdf_render(invoice_id)
+    invoice_ids.clear()
+
+
+def _pending_invoice_pdf_renders() -> set:
+    """
+    The connection's registry of invoice ids awaiting a render on commit. It
+    starts empty outside a transaction, and again once a rollback has dropped
+    the flush callback that would have consumed it.
+    """
+    pending = getattr(connection, "pending_invoice_pdf_renders", None)
+    if pending is None or not connection.in_atomic_block or (
+        pending and not any(
+            getattr(func, "func", None) is _flush_invoice_pdf_renders and func.args[0] is pending
+            for _, func, _ in connection.run_on_commit
+        )
+    ):
+        pending = connection.pending_invoice_pdf_renders = set()
+    return pending
+
+
+def schedule_invoice_pdf_render(invoice_id: int) -> None:
+    """
+    Re-render an invoice's PDF in a worker once the current transaction commits.
+    Saving an invoice with N line items fires N+1 signals; the ids collect in one
+    set on the connection with a single on-commit flush, so each invoice is
+    queued once.
+    """
+    pending = _pending_invoice_pdf_renders()
+    first = not pending
+    pending.add(invoice_id)
+    if first:
+        transaction.on_commit(partial(_flush_invoice_pdf_renders, pending))
+
+
+def discard_invoice_pdf_renders(invoice_ids) -> None:
+    """Drop renders queued in the current transaction for callers that render the PDFs themselves."""
+    _pending_invoice_pdf_renders().difference_update(invoice_ids)
+
+
+def render_invoice_pdf(invoice_id: int) -> str | None:
+    from client_profile.models import Invoice
+    from client_profile.services import store_invoice_pdf
+
+    invoice = Invoice.objects.filter(pk=invoice_id).first()
+    if invoice is None:
+        return None
+    return store_invoice_pdf(invoice)
+
+
+def email_invoice_pdf(invoice_id: int, filename: str, **email_kwargs) -> bool:
+    """
+    Email the invoice with its current PDF attached. The storage key is resolved
+    (rendering if needed) right before sending, in this task, so a re-render that
+    drops an older revision cannot pull the file out from under a queued email.
+    """
+    key = render_invoice_pdf(invoice_id)
+    if key is None:
+        logger.warning("Invoice %s vanished before its PDF could be emailed.", invoice_id)
+        return False
+    return send_async_email(
+        storage_attachments=[(filename, key, "application/pdf")],
+        **email_kwargs,
+    )
+
+
+# ========== Period-end invoicing ==========
+PERIOD_INVOICING_FUNC = 'client_profile.tasks.run_period_invoicing'
+BILLING_DEFAULT_FIELDS = (
+    'gst_registered', 'super_rate_snapshot', 'super_fund_name', 'super_usi',
+    'super_member_number', 'bank_account_name', 'bsb', 'account_number',
+)
+
+
+def _period_billing_defaults(user_ids):
+    """Bank/super/GST details from each worker's latest invoice; workers who never invoiced are absent."""
+    from client_profile.models import Invoice
+
+    latest = (
+        Invoice.objects
+        .filter(user_id__in=user_ids)
+        .exclude(bank_account_name="")
+        .order_by('user_id', '-created_at')
+        .distinct('user_id')
+        .values('user_id', *BILLING_DEFAULT_FIELDS)
+    )
+    return {row.pop('user_id'): row for row in latest}
+
+
+def _uninvoiced_worker_ids(period_start, period_end, pharmacy_ids=None):
+    from django.db.models import Exists, OuterRef
+    from client_profile.models import Invoice, InvoiceLineItem
+
+    already_invoiced = InvoiceLineItem.objects.filter(
+        invoice__user_id=OuterRef('user_id'),
+        shift_id=OuterRef('shift_id'),
+        service_date=OuterRef('slot_date'),
+    )
+    # Invoices that list the shift but date none of its lines billed it as a
+    # whole, for occurrences up to the invoice date.
+    invoiced_as_whole_shift = Invoice.shifts.through.objects.filter(
+        invoice__user_id=OuterRef('user_id'),
+        shift_id=OuterRef('shift_id'),
+        invoice__invoice_date__gte=OuterRef('slot_date'),
+    ).exclude(
+        Exists(InvoiceLineItem.objects.filter(
+            invoice_id=OuterRef('invoice_id'),
+            shift_id=OuterRef('shift_id'),
+            service_date__isnull=False,
+        ))
+    )
+    rows = ShiftSlotAssignment.objects.filter(
+        slot_date__range=(period_start, period_end),
+        shift__payment_preference__iexact='ABN',
+        shift__pharmacy__isnull=False,
+    )
+    if pharmacy_ids:
+        rows = rows.filter(shift__pharmacy_id__in=pharmacy_ids)
+    return list(
+        rows.filter(~Exists(already_invoiced), ~Exists(invoiced_as_whole_shift))
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+
+
+def _render_for_batch(invoice_id):
+    try:
+        return invoice_id, render_invoice_pdf(invoice_id)
+    except Exception:
+        logger.exception("[period-invoicing] Failed to render PDF for invoice %s", invoice_id)
+        return invoice_id, None
+
+
+def _render_for_batch_in_thread(invoice_id):
+    from django.db import connection
+    try:
+        return _render_for_batch(invoice_id)
+    finally:
+        connection.close()
+
+
+def run_period_invoicing(
+    period_start,
+    period_end,
+    pharmacy_ids=None,
+    send_emails=True,
+    render_workers=4,
+    emails_per_minute=60,
+    progress=None,
+):
+    """
+    Invoice every completed, un-invoiced ABN slot occurrence in the period:
+    one invoice per worker and pharmacy, PDFs rendered by a thread pool, then
+    emails sent one at a time, over one connection, at most ``emails_per_minute``. Occurrences dated
+    today or later are not completed yet and wait for the next run.
+    Returns a summary with counts and throughput.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from django.core.mail import get_connection
+    from client_profile.models import Invoice
+    from client_profile.services import build_invoice_email, generate_pay_period_invoices
+
+    if isinstance(period_start, str):
+        period_start = datetime.fromisoformat(period_start).date()
+    if isinstance(period_end, str):
+        period_end = datetime.fromisoformat(period_end).date()
+    period_end = min(period_end, timezone.localdate() - timedelta(days=1))
+    progress = progress or (lambda stage, done, total: logger.info("[period-invoicing] %s %s/%s", stage, done, total))
+    started = time.monotonic()
+    summary = {
+        "workers": 0, "skipped_workers": [], "invoices": 0, "rendered": 0,
+        "emailed": 0, "email_failed": [], "failed": [],
+    }
+    if period_end < period_start:
+        return summary
+
+    # 1. Build invoices, one transaction per worker so a bad record only skips that worker.
+    worker_ids = _uninvoiced_worker_ids(period_start, period_end, pharmacy_ids)
+    billing_defaults = _period_billing_defaults(worker_ids)
+    workers = User.objects.in_bulk(worker_ids)
+    invoice_ids = []
+    for done, user_id in enumerate(worker_ids, start=1):
+        billing_data = billing_defaults.get(user_id)
+        if billing_data is None:
+            summary["skipped_workers"].append(user_id)
+            continue
+        try:
+            with transaction.atomic():
+                invoices = generate_pay_period_invoices(
+                    workers[user_id], period_start, period_end, billing_data, pharmacy_ids=pharmacy_ids
+                )
+                # Step 2 renders these PDFs, so the worker renders queued on save are not needed.
+                discard_invoice_pdf_renders(invoice.id for invoice in invoices)
+        except Exception:
+            logger.exception("[period-invoicing] Failed to invoice user %s", user_id)
+            summary["failed"].append(user_id)
+            continue
+        summary["workers"] += 1
+        invoice_ids.extend(invoice.id for invoice in invoices)
+        progress("invoices", done, len(worker_ids))
+    summary["invoices"] = len(invoice_ids)
+
+    # 2. Render PDFs in parallel; WeasyPrint spends most of its time outside the GIL.
+    keys = {}
+    if render_workers > 1:
+        pool = ThreadPoolExecutor(max_workers=render_workers)
+        rendered = pool.map(_render_for_batch_in_thread, invoice_ids)
+    else:
+        pool = None
+        rendered = map(_render_for_batch, invoice_ids)
+    try:
+        for done, (invoice_id, key) in enumerate(rendered, start=1):
+            keys[invoice_id] = key
+            progress("pdfs", done, len(invoice_ids))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    summary["rendered"] = sum(1 for key in keys.values() if key)
+
+    # 3. Email a throttled stream so the SMTP relay isn't flooded at period end.
+    if send_emails:
+        interval = 60.0 / emails_per_minute if emails_per_minute else 0
+        to_send = [
+            invoice for invoice in Invoice.objects.filter(pk__in=invoice_ids).order_by('pk')
+            if invoice.bill_to_email and keys.get(invoice.pk)
+        ]
+        with get_connection() as connection:
+            for done, invoice in enumerate(to_send, start=1):
+                sent_at = time.monotonic()
+                filename, email_kwargs = build_invoice_email(invoice)
+                # Re-resolve the key: the invoice may have been edited and re-rendered since step 2.
+                key = render_invoice_pdf(invoice.pk)
+                if key is None:
+                    continue
+                sent = send_async_email(
+                    storage_attachments=[(filename, key, "application/pdf")],
+                    connection=connection,
+                    **email_kwargs,
+                )
+                if sent:
+                    invoice.status = 'sent'
+                    invoice.save(update_fields=['status'])
+                    summary["emailed"] += 1
+                else:
+                    # Left unsent so it can be emailed again from the invoice page.
+                    summary["email_failed"].append(invoice.pk)
+                progress("emails", done, len(to_send))
+                if done < len(to_send):
+                    time.sleep(max(0.0, interval - (time.monotonic() - sent_at)))
+
+    elapsed = time.monotonic() - started
+    summary["seconds"] = round(elapsed, 2)
+    summary["invoices_per_second"] = round(summary["invoices"] / elapsed, 2) if elapsed else None
+    logger.info("[period-invoicing] %s to %s: %s", period_start, period_end, summary)
+    return summary
+
+
+def repair_hub_counters() -> int:
+    """
+    Periodic safety net for the incrementally maintained hub counters: recompute
+    any post, comment or poll whose counts drifted from the underlying rows.
+    """
+    from client_profile.hub.counters import repair_hub_counters as repair
+
+    repaired = repair()
+    if repaired:
+        logger.warning("[hub-counters] Repaired %s drifted counter row(s).", repaired)
+    return repaired
+
+
+def run_membership_import(job_id: int) -> None:
+    from client_profile.membership_import import run_membership_import as run
+
+    run(job_id)
@@ -1,16 +1,97 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
 
-from client_profile.models import OwnerOnboarding, PillLedgerEntry, PillReferralEvent
+from client_profile import calendar_tasks, services, tasks
+from client_profile.models import (
+    CalendarEvent,
+    DocumentOcrResult,
+    Invoice,
+    InvoiceLineItem,
+    Membership,
+    MembershipImportJob,
+    Notification,
+    Organization,
+    OtherStaffOnboarding,
+    OwnerOnboarding,
+    Participant,
+    PharmacistOnboarding,
+    Pharmacy,
+    PharmacyAdmin,
+    PharmacyCommunityGroup,
+    PharmacyCommunityGroupMembership,
+    PharmacyHubComment,
+    PharmacyHubCommentReaction,
+    PharmacyHubPoll,
+    PharmacyHubPollComment,
+    PharmacyHubPollReaction,
+    PharmacyHubPost,
+    PharmacyHubReaction,
+    PillBalance,
+    PillLedgerEntry,
+    PillReferralEvent,
+    Rating,
+    RatingAggregate,
+    Shift,
+    ShiftInterest,
+    ShiftOffer,
+    ShiftReminderDelivery,
+    ShiftSlot,
+    ShiftSlotAssignment,
+    WorkNote,
+    WorkNoteDelivery,
+)
+from client_profile import abn as abn_lookup
+from client_profile.abn import CACHE_PREFIX as ABN_CACHE_PREFIX, lookup_abn
+from client_profile.abn_stub import StubAbrServer
+from client_profile.hub.context_cache import hit_stats
+from client_profile.hub.counters import (
+    adjust_comment_count,
+    remove_reaction,
+    repair_hub_counters,
+    set_reaction,
+    soft_delete_comment,
+)
+from client_profile.admin_helpers import CAPABILITY_MANAGE_ROSTER, has_admin_capability, is_admin_of
+from client_profile.cache_versions import pharmacy_version_key, user_version_key
+from client_profile.ocr import StubOcrBackend, ocr_document, render_for_ocr, spooled_document
+from client_profile.ratings import get_rating_summaries, record_rating
 from client_profile.rewards import (
     RewardError,
+    _create_ledger_entry,
     award_verified_referrals_for_user,
     claim_referral_code,
     get_or_create_referral_code,
     get_pill_balance,
     seed_default_reward_rules,
+    spend_pills_for_shift_post,
 )
+from client_profile.permission_context import get_permission_context
 from client_profile.serializers import OwnerOnboardingV2Serializer
+from client_profile.shift_reminders import send_shift_reminders
+from client_profile.views import PublicJobBoardView
 
 
 class OwnerOnboardingV2SerializerTests(TestCase):
@@ -108,3 +189,1555 @@ class PillRewardsTests(TestCase):
             claim_referral_code(referred_user=self.referrer, code=code.code)
 
         self.assertEqual(get_pill_balance(self.referrer), 0)
+
+
+IN_MEMORY_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+@mock.patch("client_profile.services.render_invoice_to_pdf", return_value=b"%PDF-1.7 test")
+class InvoicePdfCacheTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="issuer@example.com",
+            password="password",
+            role="PHARMACIST",
+            username="issuer",
+        )
+        # Run the fixture's on-commit render hook so each test collects renders in a fresh set.
+        with mock.patch("client_profile.tasks.async_task"), self.captureOnCommitCallbacks(execute=True):
+            self.invoice = Invoice.objects.create(user=self.user, bill_to_email="billing@example.com")
+            self.item = InvoiceLineItem.objects.create(
+                invoice=self.invoice,
+                description="Locum shift",
+                quantity=8,
+                unit_price=70,
+                total=560,
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_render_is_reused_until_line_items_change(self, render):
+        first = services.store_invoice_pdf(self.invoice)
+        self.assertEqual(services.store_invoice_pdf(self.invoice), first)
+        self.assertEqual(render.call_count, 1)
+
+        self.invoice.status = "sent"
+        self.assertEqual(services.cached_invoice_pdf_key(self.invoice), first)
+
+        self.item.quantity = 9
+        self.item.save()
+        second = services.store_invoice_pdf(self.invoice)
+        self.assertNotEqual(second, first)
+        self.assertEqual(render.call_count, 2)
+        self.assertFalse(default_storage.exists(first))
+
+    def test_line_item_edits_queue_one_render_after_commit(self, render):
+        with mock.patch("client_profile.tasks.async_task") as async_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                invoice = Invoice.objects.create(user=self.user)
+                for n in range(3):
+                    InvoiceLineItem.objects.create(
+                        invoice=invoice, description=f"Extra {n}", quantity=1, unit_price=10, total=10
+                    )
+                invoice.save()
+        async_task.assert_called_once_with("client_profile.tasks.render_invoice_pdf", invoice.pk)
+
+    def test_pdf_view_serves_stored_pdf_with_etag(self, render):
+        url = f"/api/client-profile/invoices/{self.invoice.pk}/pdf/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-1.7 test")
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        self.client.get(url)
+        self.assertEqual(render.call_count, 1)
+
+    def test_rolled_back_schedule_does_not_swallow_the_next_render(self, render):
+        with mock.patch("client_profile.tasks.async_task") as async_task:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                tasks.schedule_invoice_pdf_render(self.invoice.pk)
+                raise RuntimeError("roll back")
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks.schedule_invoice_pdf_render(self.invoice.pk)
+                tasks.schedule_invoice_pdf_render(self.invoice.pk)
+        async_task.assert_called_once_with("client_profile.tasks.render_invoice_pdf", self.invoice.pk)
+
+    def test_email_task_attaches_the_key_current_at_send_time(self, render):
+        with mock.patch("client_profile.views.async_task") as async_task:
+            response = self.client.post(f"/api/client-profile/invoices/{self.invoice.pk}/send/")
+        self.assertEqual(response.status_code, 200)
+        args, kwargs = async_task.call_args
+        self.assertEqual(args, ("client_profile.tasks.email_invoice_pdf", self.invoice.pk, f"invoice_{self.invoice.pk}.pdf"))
+        self.assertNotIn("attachments", kwargs)
+
+        # An edit re-renders (dropping the old revision) before the queued email runs.
+        stale = services.store_invoice_pdf(self.invoice)
+        self.item.quantity = 9
+        self.item.save()
+        current = services.store_invoice_pdf(self.invoice)
+        with mock.patch("client_profile.tasks.send_async_email", return_value=True) as send:
+            tasks.email_invoice_pdf(*args[1:], **kwargs)
+        attachments = send.call_args.kwargs["storage_attachments"]
+        self.assertEqual(attachments, [(f"invoice_{self.invoice.pk}.pdf", current, "application/pdf")])
+        self.assertNotEqual(current, stale)
+
+
+class NameOcrBackend(StubOcrBackend):
+    instances = []
+
+    def __init__(self):
+        super().__init__(lines=["COMMONWEALTH OF AUSTRALIA", "JANE CITIZEN"])
+        NameOcrBackend.instances.append(self)
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES, OCR_BACKEND="client_profile.tests.NameOcrBackend")
+class DocumentOcrTests(TestCase):
+    def setUp(self):
+        NameOcrBackend.instances = []
+
+    def _onboarding(self, email):
+        user = get_user_model().objects.create_user(
+            email=email, password="password", role="PHARMACIST", first_name="Jane", last_name="Citizen"
+        )
+        onboarding = PharmacistOnboarding.objects.create(user=user)
+        onboarding.government_id.save("licence.png", ContentFile(b"\x89PNG same scan"), save=True)
+        return onboarding
+
+    def test_identical_documents_are_sent_to_ocr_once(self):
+        first, second = self._onboarding("jane1@example.com"), self._onboarding("jane2@example.com")
+
+        with tempfile.TemporaryDirectory() as output_dir, mock.patch.object(tasks, "OUTPUT_DIR", Path(output_dir)):
+            for onboarding in (first, second):
+                tasks.verify_filefield_task(
+                    "PharmacistOnboarding", onboarding.pk, "government_id",
+                    verification_field="gov_id_verified", note_field="gov_id_verification_note",
+                )
+                onboarding.refresh_from_db()
+                self.assertTrue(onboarding.gov_id_verified)
+
+        self.assertEqual(sum(backend.calls for backend in NameOcrBackend.instances), 1)
+        self.assertEqual(DocumentOcrResult.objects.count(), 1)
+
+    def test_empty_results_are_not_cached(self):
+        document = self._onboarding("jane4@example.com").government_id
+        blank, readable = StubOcrBackend(), StubOcrBackend(lines=["JANE CITIZEN"])
+
+        empty = ocr_document(document, backend=blank)
+        self.assertEqual(empty.lines, [])
+        self.assertFalse(DocumentOcrResult.objects.exists())
+        # A row cached before empty results were skipped is treated as a miss and replaced.
+        DocumentOcrResult.objects.create(content_hash=empty.content_hash, backend="stub", lines=[])
+        outcome = ocr_document(document, backend=readable)
+
+        self.assertEqual((outcome.lines, outcome.cached, readable.calls), (["JANE CITIZEN"], False, 1))
+        self.assertEqual(DocumentOcrResult.objects.get().lines, ["JANE CITIZEN"])
+
+    @override_settings(OCR_PDF_DPI=300, OCR_MAX_IMAGE_SIDE=600)
+    def test_pdf_first_page_is_rendered_no_larger_than_needed(self):
+        import fitz
+
+        with tempfile.TemporaryDirectory() as workdir:
+            pdf_path = os.path.join(workdir, "scan.pdf")
+            with fitz.open() as doc:
+                doc.new_page(width=595, height=842)
+                doc.save(pdf_path)
+            png = render_for_ocr(pdf_path)
+
+        width, height = int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")
+        self.assertEqual(png[:4], b"\x89PNG")
+        self.assertLessEqual(max(width, height), 600)
+
+    def test_streamed_copy_is_removed_even_when_ocr_fails(self):
+        document = self._onboarding("jane3@example.com").government_id
+        with self.assertRaises(RuntimeError):
+            with spooled_document(document) as (local_path, content_hash):
+                self.assertTrue(os.path.exists(local_path))
+                raise RuntimeError("backend down")
+        self.assertFalse(os.path.exists(local_path))
+        self.assertEqual(len(content_hash), 64)
+
+
+class VerificationGroupTests(TestCase):
+    @override_settings(VERIFICATION_WORKERS=2)
+    @mock.patch("client_profile.tasks.final_evaluation")
+    def test_checks_run_concurrently_and_evaluation_runs_once_after(self, final_evaluation):
+        # Each check waits for the other, so this only passes if they overlap.
+        barrier = threading.Barrier(2, timeout=5)
+        finished = []
+
+        def check(*args, **kwargs):
+            barrier.wait()
+            finished.append(args[2])
+
+        with mock.patch("client_profile.tasks.verify_filefield_task", side_effect=check):
+            checks = [
+                tasks._file_check("government_id", "gov_id_verified", "gov_id_verification_note"),
+                tasks._file_check("gst_file", "gst_file_verified", "gst_file_verification_note"),
+            ]
+            tasks.run_verification_group("PharmacistOnboarding", 1, checks)
+
+        self.assertCountEqual(finished, ["government_id", "gst_file"])
+        final_evaluation.assert_called_once_with("PharmacistOnboarding", 1)
+
+    @override_settings(VERIFICATION_WORKERS=1)
+    @mock.patch("client_profile.tasks.async_task")
+    @mock.patch("client_profile.tasks.final_evaluation")
+    @mock.patch("client_profile.tasks.verify_abn_task")
+    @mock.patch("client_profile.tasks.verify_filefield_task")
+    @mock.patch("client_profile.utils.send_referee_emails")
+    @mock.patch("client_profile.utils.notify_superuser_on_onboarding")
+    def test_orchestrator_joins_checks_without_scheduling(
+        self, _notify, _referees, verify_file, verify_abn, final_evaluation, async_task
+    ):
+        user = get_user_model().objects.create_user(
+            email="fanout@example.com", password="password", role="PHARMACIST", first_name="Jane", last_name="Citizen"
+        )
+        onboarding = PharmacistOnboarding.objects.create(
+            user=user, payment_preference="ABN", abn="51824753556", government_id="gov_ids/licence.png"
+        )
+
+        tasks.run_all_verifications("PharmacistOnboarding", onboarding.pk)
+
+        verify_abn.assert_called_once_with(
+            "PharmacistOnboarding", onboarding.pk, "51824753556", "Jane", "Citizen", "fanout@example.com",
+            note_field="abn_verification_note",
+        )
+        verify_file.assert_called_once()
+        final_evaluation.assert_called_once_with("PharmacistOnboarding", onboarding.pk)
+        async_task.assert_not_called()
+
+    @mock.patch("django_q.tasks.async_task")
+    def test_completing_a_manual_check_queues_final_evaluation(self, async_task):
+        user = get_user_model().objects.create_user(email="manual@example.com", password="password", role="PHARMACIST")
+        onboarding = PharmacistOnboarding.objects.create(
+            user=user, submitted_for_verification=True, referee1_confirmed=True, referee2_confirmed=True
+        )
+        evaluation = mock.call("client_profile.tasks.final_evaluation", "PharmacistOnboarding", onboarding.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            onboarding.gov_id_verified = True
+            onboarding.save(update_fields=["gov_id_verified"])
+        self.assertNotIn(evaluation, async_task.call_args_list)
+
+        # AHPRA is only ever verified by hand, after the group's evaluation has run.
+        with self.captureOnCommitCallbacks(execute=True):
+            onboarding.ahpra_verified = True
+            onboarding.save()
+        self.assertEqual(async_task.call_args_list.count(evaluation), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            onboarding.save()
+        self.assertEqual(async_task.call_args_list.count(evaluation), 1)
+
+
+class AbnLookupCacheTests(TestCase):
+    ABN = "51824753556"
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookup_is_parsed_once_and_then_served_from_cache(self):
+        with StubAbrServer({self.ABN: "JANE CITIZEN"}) as stub, override_settings(ABN_LOOKUP_URL=stub.url_template):
+            first = lookup_abn("51 824 753 556")
+            second = lookup_abn(self.ABN)
+
+        self.assertEqual((first.legal_name, first.found, first.cached), ("JANE CITIZEN", True, False))
+        self.assertEqual(first.fields["abn_gst_from"], date(2025, 5, 19))
+        self.assertTrue(second.cached)
+        self.assertEqual(second.fields, first.fields)
+        self.assertEqual(stub.requests, 1)
+
+    def test_unknown_abns_are_negatively_cached_and_bad_checksums_never_fetched(self):
+        with StubAbrServer() as stub, override_settings(ABN_LOOKUP_URL=stub.url_template):
+            self.assertFalse(lookup_abn("33051775556").found)
+            self.assertTrue(lookup_abn("33051775556").cached)
+            self.assertFalse(lookup_abn("12345678901").found)
+
+        self.assertEqual(stub.requests, 1)
+
+    def test_unreachable_register_is_not_cached(self):
+        with StubAbrServer() as stub:
+            url = stub.url_template
+        with override_settings(ABN_LOOKUP_URL=url, ABN_LOOKUP_TIMEOUT=2):
+            self.assertFalse(lookup_abn(self.ABN).found)
+        self.assertIsNone(cache.get(ABN_CACHE_PREFIX + self.ABN))
+
+    def test_local_locks_do_not_grow_with_each_abn(self):
+        locks = {id(abn_lookup._local_lock(f"{n:011d}")) for n in range(5000)}
+        self.assertLessEqual(len(locks), abn_lookup.LOCAL_LOCK_STRIPES)
+        self.assertIs(abn_lookup._local_lock(self.ABN), abn_lookup._local_lock(self.ABN))
+
+    def test_concurrent_lookups_of_one_abn_share_a_request(self):
+        with StubAbrServer({self.ABN: "JANE CITIZEN"}, latency_ms=200) as stub, \
+                override_settings(ABN_LOOKUP_URL=stub.url_template):
+            barrier = threading.Barrier(6)
+            results = []
+
+            def lookup():
+                barrier.wait()
+                results.append(lookup_abn(self.ABN))
+
+            threads = [threading.Thread(target=lookup) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(stub.requests, 1)
+        self.assertTrue(all(result.legal_name == "JANE CITIZEN" for result in results))
+
+    def test_reverification_reuses_the_cached_lookup(self):
+        user = get_user_model().objects.create_user(
+            email="abn-worker@example.com", password="password", role="PHARMACIST",
+            first_name="Jane", last_name="Citizen",
+        )
+        onboarding = PharmacistOnboarding.objects.create(user=user, payment_preference="ABN", abn=self.ABN)
+
+        with StubAbrServer({self.ABN: "JANE CITIZEN"}) as stub, override_settings(ABN_LOOKUP_URL=stub.url_template), \
+                tempfile.TemporaryDirectory() as output_dir, mock.patch.object(tasks, "OUTPUT_DIR", Path(output_dir)):
+            for _ in range(2):
+                tasks.verify_abn_task(
+                    "PharmacistOnboarding", onboarding.pk, self.ABN, "Jane", "Citizen", user.email,
+                    note_field="abn_verification_note",
+                )
+
+        onboarding.refresh_from_db()
+        self.assertEqual(onboarding.abn_entity_name, "JANE CITIZEN")
+        self.assertTrue(onboarding.abn_gst_registered)
+        self.assertEqual(stub.requests, 1)
+
+
+class WorkerShiftInvoiceFixture:
+    BILLING = {
+        "super_rate_snapshot": "11.5",
+        "bank_account_name": "Worker",
+        "bsb": "123456",
+        "account_number": "12345678",
+    }
+
+    def setUp(self):
+        User = get_user_model()
+        self.worker = User.objects.create_user(
+            email="worker@example.com", password="password", role="PHARMACIST", username="worker"
+        )
+        PharmacistOnboarding.objects.create(user=self.worker, abn="51824753556")
+        owner = User.objects.create_user(
+            email="owner-billing@example.com", password="password", role="OWNER", username="ownerbilling"
+        )
+        self.pharmacy = Pharmacy.objects.create(name="Builder Pharmacy")
+        self.shift = Shift.objects.create(
+            pharmacy=self.pharmacy,
+            created_by=owner,
+            role_needed="PHARMACIST",
+            employment_type="LOCUM",
+            payment_preference="ABN",
+        )
+        monday = date(2026, 3, 2)
+        slot = ShiftSlot.objects.create(
+            shift=self.shift,
+            date=monday,
+            start_time=time(9, 0),
+            end_time=time(17, 0),
+            is_recurring=True,
+            recurring_days=[1],
+            recurring_end_date=monday + timedelta(days=7),
+        )
+        for slot_date in (monday, monday + timedelta(days=7)):
+            ShiftSlotAssignment.objects.create(
+                shift=self.shift, slot=slot, slot_date=slot_date, user=self.worker, unit_rate=Decimal("80.00")
+            )
+        self.monday = monday
+
+
+class InvoiceBuilderTests(WorkerShiftInvoiceFixture, TestCase):
+    def test_custom_lines_are_inserted_in_one_statement(self):
+        lines = [{"description": f"Line {n}", "quantity": "1", "unit_price": "10"} for n in range(100)]
+        billing = {**self.BILLING, "external": True, "custom_bill_to_name": "Client"}
+
+        with self.assertNumQueries(5):
+            invoice = services.generate_invoice_from_shifts(
+                user=self.worker, custom_lines=lines, billing_data=billing
+            )
+
+        self.assertEqual(invoice.subtotal, Decimal("1000.00"))
+        self.assertEqual(invoice.super_amount, Decimal("115.00"))
+        self.assertEqual(invoice.line_items.count(), 101)
+        self.assertTrue(invoice.line_items.filter(category_code="Superannuation").exists())
+
+    def test_pay_period_invoices_each_occurrence_once(self):
+        first_week = (self.monday, self.monday + timedelta(days=6))
+        [invoice] = services.generate_pay_period_invoices(self.worker, *first_week, self.BILLING)
+        shift_lines = invoice.line_items.exclude(category_code="Superannuation")
+        self.assertEqual(list(shift_lines.values_list("service_date", flat=True)), [self.monday])
+        self.assertEqual(invoice.subtotal, Decimal("640.00"))
+
+        self.assertEqual(services.generate_pay_period_invoices(self.worker, *first_week, self.BILLING), [])
+
+        whole_month = (self.monday, self.monday + timedelta(days=27))
+        [second] = services.generate_pay_period_invoices(self.worker, *whole_month, self.BILLING)
+        self.assertEqual(
+            list(second.line_items.exclude(category_code="Superannuation").values_list("service_date", flat=True)),
+            [self.monday + timedelta(days=7)],
+        )
+
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+@mock.patch("client_profile.services.render_invoice_to_pdf", return_value=b"%PDF-1.7 test")
+@mock.patch("client_profile.tasks.send_async_email")
+class PeriodInvoicingTests(WorkerShiftInvoiceFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.period = (self.monday, self.monday + timedelta(days=13))
+
+    def test_invoices_renders_and_emails_each_worker_once(self, send_email, render):
+        Invoice.objects.create(user=self.worker, bank_account_name="Worker", bsb="123456", account_number="1")
+
+        summary = tasks.run_period_invoicing(*self.period, render_workers=1, emails_per_minute=0)
+
+        self.assertEqual((summary["invoices"], summary["rendered"], summary["emailed"]), (1, 1, 1))
+        invoice = Invoice.objects.get(pharmacy=self.pharmacy)
+        self.assertEqual(invoice.status, "sent")
+        self.assertEqual(invoice.line_items.filter(service_date__isnull=False).count(), 2)
+        [(filename, key, _mimetype)] = send_email.call_args.kwargs["storage_attachments"]
+        self.assertTrue(default_storage.exists(key))
+
+        rerun = tasks.run_period_invoicing(*self.period, emails_per_minute=0)
+        self.assertEqual((rerun["invoices"], rerun["emailed"]), (0, 0))
+
+    def test_failed_sends_leave_the_invoice_unsent(self, send_email, render):
+        Invoice.objects.create(user=self.worker, bank_account_name="Worker", bsb="123456", account_number="1")
+        send_email.return_value = False
+
+        summary = tasks.run_period_invoicing(*self.period, render_workers=1, emails_per_minute=0)
+
+        invoice = Invoice.objects.get(pharmacy=self.pharmacy)
+        self.assertEqual(invoice.status, "draft")
+        self.assertEqual((summary["emailed"], summary["email_failed"]), (0, [invoice.pk]))
+
+    def test_period_renders_each_pdf_once(self, send_email, render):
+        Invoice.objects.create(user=self.worker, bank_account_name="Worker", bsb="123456", account_number="1")
+
+        with mock.patch("client_profile.tasks.async_task") as async_task, \
+                self.captureOnCommitCallbacks(execute=True):
+            tasks.run_period_invoicing(*self.period, render_workers=1, emails_per_minute=0)
+
+        self.assertEqual(render.call_count, 1)
+        async_task.assert_not_called()
+
+    def _invoice_through_ui(self, line_items):
+        client = APIClient()
+        client.force_authenticate(self.worker)
+        response = client.post("/api/client-profile/invoices/generate/", {
+            **self.BILLING,
+            "issuer_abn": "51824753556",
+            "gst_registered": "false",
+            "bill_to_email": "owner-billing@example.com",
+            "cc_emails": "",
+            "pharmacy": self.pharmacy.pk,
+            "shift_ids": json.dumps([self.shift.pk]),
+            "line_items": json.dumps(line_items),
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        return Invoice.objects.get(pk=response.data["id"])
+
+    def test_shifts_invoiced_in_the_ui_are_not_billed_again(self, send_email, render):
+        client = APIClient()
+        client.force_authenticate(self.worker)
+        preview = client.get(f"/api/client-profile/invoices/preview/{self.shift.pk}/").data
+        # Submitted the way the invoice form sends them.
+        invoice = self._invoice_through_ui([
+            {
+                "description": f"{row['date']} {row['start_time'][:5]}-{row['end_time'][:5]}",
+                "category_code": row["category"],
+                "unit": row["unit"],
+                "quantity": row["quantity"],
+                "unit_price": row["unit_price"],
+                "discount": row["discount"],
+                "shift_slot_id": row["shiftSlotId"],
+                "service_date": row["date"],
+            }
+            for row in preview
+        ])
+        self.assertEqual(
+            sorted(invoice.line_items.exclude(service_date=None).values_list("shift_id", "service_date")),
+            [(self.shift.pk, self.monday), (self.shift.pk, self.monday + timedelta(days=7))],
+        )
+
+        summary = tasks.run_period_invoicing(*self.period, emails_per_minute=0)
+
+        self.assertEqual(summary["invoices"], 0)
+        self.assertEqual(Invoice.objects.filter(user=self.worker).count(), 1)
+
+    def test_undated_ui_lines_still_mark_their_shifts_invoiced(self, send_email, render):
+        self._invoice_through_ui([{"description": "Locum days", "quantity": "16", "unit_price": "80"}])
+
+        summary = tasks.run_period_invoicing(*self.period, emails_per_minute=0)
+
+        self.assertEqual(summary["invoices"], 0)
+
+    def test_undated_ui_lines_leave_later_occurrences_billable(self, send_email, render):
+        invoice = self._invoice_through_ui([{"description": "Locum day", "quantity": "8", "unit_price": "80"}])
+        Invoice.objects.filter(pk=invoice.pk).update(invoice_date=self.monday)
+
+        summary = tasks.run_period_invoicing(*self.period, emails_per_minute=0)
+
+        self.assertEqual(summary["invoices"], 1)
+        new_invoice = Invoice.objects.exclude(pk=invoice.pk).get()
+        self.assertEqual(
+            list(new_invoice.line_items.exclude(service_date=None).values_list("service_date", flat=True)),
+            [self.monday + timedelta(days=7)],
+        )
+
+    def test_backfilled_legacy_lines_are_not_billed_again(self, send_email, render):
+        legacy = Invoice.objects.create(
+            user=self.worker, pharmacy=self.pharmacy, bank_account_name="Worker", bsb="123456", account_number="1"
+        )
+        InvoiceLineItem.objects.create(
+            invoice=legacy, description=f"{self.monday} 09:00–17:00", quantity=8, unit_price=80, total=640
+        )
+
+        call_command("backfill_invoice_service_dates", stdout=StringIO())
+        summary = tasks.run_period_invoicing(*self.period, emails_per_minute=0)
+
+        self.assertEqual(summary["invoices"], 1)
+        new_invoice = Invoice.objects.exclude(pk=legacy.pk).get()
+        self.assertEqual(
+            list(new_invoice.line_items.exclude(service_date=None).values_list("service_date", flat=True)),
+            [self.monday + timedelta(days=7)],
+        )
+
+    def test_workers_without_bank_details_are_skipped(self, send_email, render):
+        summary = tasks.run_period_invoicing(*self.period, emails_per_minute=0)
+
+        self.assertEqual(summary["skipped_workers"], [self.worker.pk])
+        self.assertFalse(Invoice.objects.exists())
+        send_email.assert_not_called()
+
+
+def _grant_pills(user, amount, key):
+    return _create_ledger_entry(
+        user=user,
+        rule=None,
+        entry_type=PillLedgerEntry.EntryType.ADJUSTMENT,
+        source=PillLedgerEntry.Source.MANUAL,
+        amount=amount,
+        idempotency_key=key,
+    )
+
+
+class PillBalanceTests(TestCase):
+    def setUp(self):
+        seed_default_reward_rules()
+        self.owner = get_user_model().objects.create_user(
+            email="pill-owner@example.com", password="password", role="OWNER"
+        )
+        self.shift = Shift.objects.create(
+            pharmacy=Pharmacy.objects.create(name="Pill Pharmacy"),
+            role_needed="PHARMACIST",
+            employment_type="LOCUM",
+        )
+
+    def test_balance_row_tracks_ledger_and_reads_in_one_query(self):
+        _grant_pills(self.owner, 500, "grant:1")
+        entry = spend_pills_for_shift_post(user=self.owner, shift=self.shift)
+        spend_pills_for_shift_post(user=self.owner, shift=self.shift)
+
+        self.assertEqual(entry.balance_after, 300)
+        self.assertEqual(PillBalance.objects.get(user=self.owner).balance, 300)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_pill_balance(self.owner), 300)
+
+    def test_existing_ledger_is_carried_into_new_balance_row(self):
+        PillLedgerEntry.objects.create(
+            user=self.owner, entry_type="EARN", source="MANUAL", delta=250,
+            balance_after=250, idempotency_key="legacy:1",
+        )
+        self.assertEqual(get_pill_balance(self.owner), 250)
+
+        _grant_pills(self.owner, 50, "grant:2")
+        self.assertEqual(PillBalance.objects.get(user=self.owner).balance, 300)
+
+    def test_reconcile_command_reports_and_fixes_drift(self):
+        _grant_pills(self.owner, 120, "grant:3")
+        PillBalance.objects.filter(user=self.owner).update(balance=999)
+
+        with self.assertRaises(CommandError):
+            call_command("reconcile_pill_balances", stdout=StringIO())
+        call_command("reconcile_pill_balances", "--fix", stdout=StringIO())
+
+        self.assertEqual(get_pill_balance(self.owner), 120)
+
+
+@skipUnless(connection.vendor == "postgresql", "Row locks are exercised against PostgreSQL.")
+class PillBalanceConcurrencyTests(TransactionTestCase):
+    def test_concurrent_spends_cannot_overdraw(self):
+        seed_default_reward_rules()
+        owner = get_user_model().objects.create_user(
+            email="race-owner@example.com", password="password", role="OWNER"
+        )
+        pharmacy = Pharmacy.objects.create(name="Race Pharmacy")
+        shifts = [
+            Shift.objects.create(pharmacy=pharmacy, role_needed="PHARMACIST", employment_type="LOCUM")
+            for _ in range(4)
+        ]
+        _grant_pills(owner, 300, "grant:race")
+        barrier = threading.Barrier(len(shifts))
+        outcomes = []
+
+        def spend(shift):
+            try:
+                barrier.wait()
+                spend_pills_for_shift_post(user=owner, shift=shift)
+                outcomes.append("paid")
+            except RewardError:
+                outcomes.append("insufficient")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=spend, args=(shift,)) for shift in shifts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ["insufficient", "insufficient", "insufficient", "paid"])
+        self.assertEqual(get_pill_balance(owner), 100)
+        self.assertEqual(sum(PillLedgerEntry.objects.filter(user=owner).values_list("delta", flat=True)), 100)
+
+
+class RatingAggregateTests(WorkerShiftInvoiceFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.worker)
+
+    def _rate_pharmacy(self, stars):
+        return self.client.post(
+            "/api/client-profile/ratings/",
+            {"direction": "WORKER_TO_PHARMACY", "ratee_pharmacy": self.pharmacy.pk, "stars": stars},
+            format="json",
+        )
+
+    def test_create_and_edit_move_the_aggregate(self):
+        # A rating written before aggregates existed is folded in on first use.
+        legacy_rater = get_user_model().objects.create_user(
+            email="legacy-rater@example.com", password="password", role="PHARMACIST"
+        )
+        Rating.objects.create(
+            rater_user=legacy_rater, ratee_pharmacy=self.pharmacy,
+            direction=Rating.Direction.WORKER_TO_PHARMACY, stars=2,
+        )
+
+        self.assertEqual(self._rate_pharmacy(5).status_code, 201)
+        self.assertEqual(self._rate_pharmacy(3).status_code, 200)
+
+        aggregate = RatingAggregate.objects.get(pharmacy=self.pharmacy)
+        self.assertEqual((aggregate.count, aggregate.total, aggregate.average), (2, 5, 2.5))
+        self.assertEqual(aggregate.histogram, {1: 0, 2: 1, 3: 1, 4: 0, 5: 0})
+
+        summary = self.client.get(
+            "/api/client-profile/ratings/summary/", {"target_type": "pharmacy", "target_id": self.pharmacy.pk}
+        ).json()
+        self.assertEqual(summary, {"average": 2.5, "count": 2})
+
+    def test_bulk_summaries_use_one_query_and_keep_request_order(self):
+        self._rate_pharmacy(4)
+        other = Pharmacy.objects.create(name="Unrated Pharmacy")
+
+        with self.assertNumQueries(1):
+            get_rating_summaries("pharmacy", [self.pharmacy.pk])
+        # Targets without an aggregate row cost one more query between them.
+        with self.assertNumQueries(2):
+            summaries = get_rating_summaries("pharmacy", [other.pk, self.pharmacy.pk])
+        self.assertEqual([(row["target_id"], row["count"]) for row in summaries], [(other.pk, 0), (self.pharmacy.pk, 1)])
+
+        response = self.client.get(
+            "/api/client-profile/ratings/summaries/",
+            {"target_type": "pharmacy", "target_ids": f"{self.pharmacy.pk},{other.pk}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["histogram"], {"1": 0, "2": 0, "3": 0, "4": 1, "5": 0})
+        self.assertEqual(
+            self.client.get("/api/client-profile/ratings/summaries/", {"target_type": "pharmacy"}).status_code,
+            400,
+        )
+
+    def test_summaries_fall_back_to_ratings_without_an_aggregate(self):
+        Rating.objects.create(
+            rater_user=self.worker, ratee_pharmacy=self.pharmacy,
+            direction=Rating.Direction.WORKER_TO_PHARMACY, stars=4,
+        )
+
+        [summary] = get_rating_summaries("pharmacy", [self.pharmacy.pk])
+
+        self.assertEqual((summary["count"], summary["average"]), (1, 4))
+        self.assertEqual(summary["histogram"]["4"], 1)
+        self.assertFalse(RatingAggregate.objects.exists())
+
+    def test_cascade_deleted_ratings_leave_the_aggregate(self):
+        leaving = get_user_model().objects.create_user(
+            email="leaving-rater@example.com", password="password", role="PHARMACIST"
+        )
+        record_rating(leaving, Rating.Direction.WORKER_TO_PHARMACY, self.pharmacy, 1)
+        self._rate_pharmacy(5)
+
+        leaving.delete()
+
+        aggregate = RatingAggregate.objects.get(pharmacy=self.pharmacy)
+        self.assertEqual((aggregate.count, aggregate.total, aggregate.average), (1, 5, 5.0))
+        self.assertEqual(aggregate.histogram[1], 0)
+
+    def test_reconcile_command_backfills_missing_rows(self):
+        Rating.objects.create(
+            rater_user=self.worker, ratee_pharmacy=self.pharmacy,
+            direction=Rating.Direction.WORKER_TO_PHARMACY, stars=4,
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("reconcile_rating_aggregates", stdout=StringIO())
+        call_command("reconcile_rating_aggregates", "--fix", stdout=StringIO())
+        call_command("reconcile_rating_aggregates", stdout=StringIO())
+
+        self.assertEqual(RatingAggregate.objects.get(pharmacy=self.pharmacy).total, 4)
+
+
+class PendingRatingsTests(WorkerShiftInvoiceFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = get_user_model().objects.create_user(
+            email="pending-owner@example.com", password="password", role="OWNER"
+        )
+        self.pharmacy.owner = OwnerOnboarding.objects.create(
+            user=self.owner,
+            phone_number="0400000000",
+            role=OwnerOnboarding.ROLE_CHOICES[0][0],
+            chain_pharmacy=False,
+        )
+        self.pharmacy.save()
+        self.client = APIClient()
+
+    def _pending(self, user, target_type):
+        self.client.force_authenticate(user)
+        response = self.client.get("/api/client-profile/ratings/pending/", {"target_type": target_type})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_owner_sees_unrated_workers_with_display_data(self):
+        pending = self._pending(self.owner, "worker")
+        self.assertEqual(pending["count"], 1)
+        self.assertEqual(pending["results"][0]["id"], self.worker.pk)
+        self.assertIn("profile_photo_url", pending["results"][0])
+
+        Rating.objects.create(
+            rater_user=self.owner, ratee_user=self.worker,
+            direction=Rating.Direction.OWNER_TO_WORKER, stars=5,
+        )
+        self.assertEqual(self._pending(self.owner, "worker")["count"], 0)
+
+    def test_worker_sees_unrated_pharmacies_in_bounded_queries(self):
+        self.client.force_authenticate(self.worker)
+        # One COUNT and one page query, however long the history.
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/client-profile/ratings/pending/", {"target_type": "pharmacy"})
+        self.assertEqual(
+            response.json()["results"],
+            [{"id": self.pharmacy.pk, "name": "Builder Pharmacy", "suburb": None, "state": None}],
+        )
+        self.assertEqual(self._pending(self.owner, "pharmacy")["count"], 0)
+        self.assertEqual(
+            self.client.get("/api/client-profile/ratings/pending/").status_code, 400
+        )
+
+
+class ShiftInternalSaveTests(TestCase):
+    def setUp(self):
+        self.pharmacy = Pharmacy.objects.create(name="Fast Path Pharmacy")
+        self.shift = Shift.objects.create(
+            pharmacy=self.pharmacy,
+            role_needed="ASSISTANT",
+            employment_type="LOCUM",
+        )
+
+    def test_api_saves_still_validate(self):
+        self.shift.workload_tags = "not-a-list"
+        with self.assertRaises(ValidationError):
+            self.shift.save()
+
+    def test_payment_status_transition_skips_full_clean(self):
+        with mock.patch.object(Shift, "full_clean") as full_clean:
+            self.assertTrue(self.shift.set_payment_status("PENDING"))
+            self.assertFalse(self.shift.set_payment_status("PENDING"))
+        full_clean.assert_not_called()
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.payment_status, "PENDING")
+
+    def test_save_internal_only_writes_given_columns(self):
+        Shift.objects.filter(pk=self.shift.pk).update(description="edited elsewhere")
+        self.shift.visibility = "LOCUM_CASUAL"
+        self.shift.escalation_level = 1
+        self.shift.save_internal("visibility", "escalation_level")
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.visibility, "LOCUM_CASUAL")
+        self.assertEqual(self.shift.description, "edited elsewhere")
+
+    def test_increment_reveal_count_is_a_single_update(self):
+        Shift.objects.filter(pk=self.shift.pk).update(reveal_count=2)
+        with self.assertNumQueries(2):
+            self.shift.increment_reveal_count()
+        self.assertEqual(self.shift.reveal_count, 3)
+
+
+@skipUnless(connection.vendor == "postgresql", "Query plans are asserted against PostgreSQL.")
+class ShiftQueryPlanTests(TestCase):
+    """
+    Seeds a realistic volume of shifts and checks that the hot job-board,
+    escalation and dashboard queries are served by indexes.
+    """
+
+    PHARMACY_COUNT = 10
+    SHIFTS_PER_PHARMACY = 500
+    INTERESTED_WORKERS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.owner_user = User.objects.create_user(
+            email="plan-owner@example.com",
+            password="password",
+            role="OWNER",
+        )
+        cls.workers = User.objects.bulk_create(
+            User(email=f"plan-worker-{idx}@example.com", username=f"plan-worker-{idx}", role="PHARMACIST")
+            for idx in range(cls.INTERESTED_WORKERS)
+        )
+        cls.worker = cls.workers[0]
+        owner = OwnerOnboarding.objects.create(
+            user=cls.owner_user,
+            phone_number="0400000000",
+            role=OwnerOnboarding.ROLE_CHOICES[0][0],
+            chain_pharmacy=True,
+        )
+        pharmacies = Pharmacy.objects.bulk_create(
+            Pharmacy(name=f"Plan Pharmacy {idx}", owner=owner if idx == 0 else None)
+            for idx in range(cls.PHARMACY_COUNT)
+        )
+        cls.pharmacy = pharmacies[0]
+
+        now = timezone.now()
+        today = timezone.localdate()
+        visibilities = ["FULL_PART_TIME", "LOCUM_CASUAL", "OWNER_CHAIN", "ORG_CHAIN", "PLATFORM"]
+        shifts = []
+        for pharmacy in pharmacies:
+            for idx in range(cls.SHIFTS_PER_PHARMACY):
+                # Most history is old and settled; a thin slice is live.
+                live = idx % 25 == 0
+                shifts.append(Shift(
+                    pharmacy=pharmacy,
+                    role_needed="ASSISTANT",
+                    employment_type="LOCUM",
+                    visibility=visibilities[idx % 5],
+                    payment_status="PENDING" if live else "PAID",
+                    escalate_to_platform=now - timedelta(days=idx) if live else None,
+                ))
+        Shift.objects.bulk_create(shifts)
+        ShiftSlot.objects.bulk_create(
+            ShiftSlot(
+                shift=shift,
+                date=today + timedelta(days=1) if idx % 25 == 0 else today - timedelta(days=idx % 365 + 1),
+                start_time=time(9, 0),
+                end_time=time(17, 0),
+            )
+            for idx, shift in enumerate(shifts)
+        )
+        ShiftInterest.objects.bulk_create(
+            ShiftInterest(shift=shift, user=worker)
+            for shift in shifts[::5]
+            for worker in cls.workers
+        )
+        with connection.cursor() as cursor:
+            for model in (Pharmacy, Shift, ShiftSlot, ShiftInterest, ShiftOffer):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+    def assertUsesIndex(self, queryset, index_name, table):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn(f"Seq Scan on {table} ", plan)
+
+    def test_public_job_board_uses_partial_index(self):
+        request = RequestFactory().get("/client-profile/public-job-board/")
+        view = PublicJobBoardView()
+        view.setup(request)
+        view.request = Request(request)
+        view.format_kwarg = None
+        self.assertUsesIndex(view.get_queryset(), "shift_public_board_idx", Shift._meta.db_table)
+
+    def test_auto_escalation_candidates_skip_public_shifts(self):
+        now = timezone.now()
+        candidates = Shift.objects.exclude(visibility="PLATFORM").filter(
+            interests__isnull=True
+        ).filter(
+            Q(escalate_to_locum_casual__lte=now)
+            | Q(escalate_to_owner_chain__lte=now)
+            | Q(escalate_to_org_chain__lte=now)
+            | Q(escalate_to_platform__lte=now)
+        )
+        self.assertUsesIndex(candidates, "shift_esc_platform_idx", Shift._meta.db_table)
+
+    def test_dashboard_upcoming_slots_use_date_index(self):
+        today = timezone.localdate()
+        upcoming = ShiftSlot.objects.filter(date__gte=today, date__lte=today + timedelta(days=6))
+        self.assertUsesIndex(upcoming, "shiftslot_date_end_idx", ShiftSlot._meta.db_table)
+
+    def test_interest_lookup_by_shift_and_user(self):
+        shift = Shift.objects.filter(interests__user=self.worker).first()
+        lookup = ShiftInterest.objects.filter(shift=shift, user=self.worker)
+        self.assertUsesIndex(lookup, "shiftinterest_shift_user_idx", ShiftInterest._meta.db_table)
+
+
+class HubFeedQueryTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.viewer = User.objects.create_user(
+            email="hub-viewer@example.com", password="password", role="PHARMACIST"
+        )
+        self.other = User.objects.create_user(
+            email="hub-other@example.com", password="password", role="PHARMACIST"
+        )
+        self.pharmacy = Pharmacy.objects.create(name="Hub Pharmacy")
+        self.membership = Membership.objects.create(user=self.viewer, pharmacy=self.pharmacy)
+        self.other_membership = Membership.objects.create(user=self.other, pharmacy=self.pharmacy)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        self.params = {"scope": "pharmacy", "pharmacy_id": self.pharmacy.id}
+
+    def _add_posts(self, count, comments_each=5):
+        posts = []
+        for n in range(count):
+            post = PharmacyHubPost.objects.create(
+                pharmacy=self.pharmacy, author_membership=self.other_membership, body=f"Post {n}"
+            )
+            for c in range(comments_each):
+                PharmacyHubComment.objects.create(
+                    post=post, author_membership=self.other_membership, body=f"Comment {n}.{c}"
+                )
+            posts.append(post)
+        return posts
+
+    def _count_feed_queries(self, url):
+        from django.test.utils import CaptureQueriesContext
+
+        # Load the (cached) permission context first; only the feed is measured.
+        get_permission_context(self.viewer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, self.params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_post_feed_batches_recent_comments_and_viewer_reactions(self):
+        first = self._add_posts(1)[0]
+        deleted = PharmacyHubComment.objects.create(
+            post=first, author_membership=self.other_membership, body="gone"
+        )
+        deleted.soft_delete()
+        PharmacyHubReaction.objects.create(post=first, member=self.membership, reaction_type="LIKE")
+        PharmacyHubReaction.objects.create(post=first, member=self.other_membership, reaction_type="LIKE")
+        latest = first.comments.filter(deleted_at__isnull=True).order_by("-created_at").first()
+        PharmacyHubCommentReaction.objects.create(comment=latest, member=self.membership, reaction_type="LIKE")
+
+        url = "/api/client-profile/hub/posts/"
+        baseline, data = self._count_feed_queries(url)
+        self._add_posts(5)
+        queries, data = self._count_feed_queries(url)
+
+        self.assertEqual(queries, baseline)
+        posts = data["results"] if isinstance(data, dict) else data
+        post = next(p for p in posts if p["id"] == first.id)
+        self.assertEqual(post["viewer_reaction"], "LIKE")
+        self.assertEqual([c["body"] for c in post["recent_comments"]], ["Comment 0.3", "Comment 0.4"])
+        self.assertEqual(post["recent_comments"][-1]["viewer_reaction"], "LIKE")
+        self.assertIsNone(post["recent_comments"][0]["viewer_reaction"])
+        self.assertTrue(all(p["viewer_reaction"] is None for p in posts if p["id"] != first.id))
+
+    def test_poll_feed_batches_recent_comments_and_viewer_reactions(self):
+        def add_polls(count):
+            polls = []
+            for n in range(count):
+                poll = PharmacyHubPoll.objects.create(
+                    pharmacy=self.pharmacy, question=f"Poll {n}?", created_by=self.other
+                )
+                for c in range(4):
+                    PharmacyHubPollComment.objects.create(
+                        poll=poll, author_user=self.other, body=f"Poll comment {n}.{c}"
+                    )
+                polls.append(poll)
+            return polls
+
+        first = add_polls(1)[0]
+        PharmacyHubPollReaction.objects.create(poll=first, user=self.viewer, reaction_type="LIKE")
+
+        url = "/api/client-profile/hub/polls/"
+        baseline, _ = self._count_feed_queries(url)
+        add_polls(5)
+        queries, data = self._count_feed_queries(url)
+
+        self.assertEqual(queries, baseline)
+        polls = data["results"] if isinstance(data, dict) else data
+        poll = next(p for p in polls if p["id"] == first.id)
+        self.assertEqual(poll["viewer_reaction"], "LIKE")
+        self.assertEqual([c["body"] for c in poll["recent_comments"]], ["Poll comment 0.2", "Poll comment 0.3"])
+
+
+class HubCounterConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.pharmacy = Pharmacy.objects.create(name="Counter Pharmacy")
+        self.members = [
+            Membership.objects.create(
+                user=User.objects.create_user(email=f"reactor{n}@example.com", password="password", role="PHARMACIST"),
+                pharmacy=self.pharmacy,
+            )
+            for n in range(8)
+        ]
+        self.post = PharmacyHubPost.objects.create(
+            pharmacy=self.pharmacy, author_membership=self.members[0], body="Busy post"
+        )
+
+    def _in_parallel(self, work, items):
+        barrier = threading.Barrier(len(items))
+
+        def run(item):
+            try:
+                barrier.wait()
+                work(item)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(item,)) for item in items]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _react(self, member, reaction_type):
+        post = PharmacyHubPost.objects.get(pk=self.post.pk)
+        set_reaction(PharmacyHubReaction, post, {"post": post, "member": member}, reaction_type)
+
+    def test_parallel_reactions_keep_summary_exact(self):
+        self._in_parallel(lambda member: self._react(member, "LIKE"), self.members)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reaction_summary, {"LIKE": 8})
+
+        # Half switch to LOVE while the other half (and a duplicate) take theirs back.
+        def churn(job):
+            member, action = job
+            post = PharmacyHubPost.objects.get(pk=self.post.pk)
+            if action == "love":
+                self._react(member, "LOVE")
+            else:
+                remove_reaction(PharmacyHubReaction, post, {"post": post, "member": member})
+
+        jobs = [(m, "love") for m in self.members[:4]] + [(m, "remove") for m in self.members[4:]]
+        jobs.append((self.members[7], "remove"))
+        self._in_parallel(churn, jobs)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.reaction_summary, {"LOVE": 4})
+        self.assertEqual(repair_hub_counters(), 0)
+
+    def test_comment_count_survives_racing_adds_and_deletes(self):
+        def comment(member):
+            post = PharmacyHubPost.objects.get(pk=self.post.pk)
+            with transaction.atomic():
+                PharmacyHubComment.objects.create(post=post, author_membership=member, body="hi")
+                adjust_comment_count(post, 1)
+
+        self._in_parallel(comment, self.members)
+        victim = PharmacyHubComment.objects.filter(post=self.post).first()
+        self._in_parallel(
+            lambda _: soft_delete_comment(PharmacyHubComment.objects.get(pk=victim.pk), self.post), range(4)
+        )
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 7)
+
+    def test_repair_recomputes_drifted_counters(self):
+        self._react(self.members[1], "LIKE")
+        PharmacyHubReaction.objects.filter(post=self.post).delete()  # e.g. a cascade
+        PharmacyHubPost.objects.filter(pk=self.post.pk).update(comment_count=5)
+
+        self.assertEqual(repair_hub_counters(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.reaction_summary, self.post.comment_count), ({}, 0))
+
+
+class PermissionContextTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner_user = User.objects.create_user(email="ctx-owner@example.com", password="password", role="OWNER")
+        self.owner = OwnerOnboarding.objects.create(
+            user=self.owner_user,
+            phone_number="0400000000",
+            role=OwnerOnboarding.ROLE_CHOICES[0][0],
+        )
+        self.pharmacies = [Pharmacy.objects.create(name=f"Context Pharmacy {n}") for n in range(5)]
+        self.admin = User.objects.create_user(email="ctx-admin@example.com", password="password", role="PHARMACIST")
+        for pharmacy in self.pharmacies:
+            Membership.objects.create(user=self.admin, pharmacy=pharmacy)
+            PharmacyAdmin.objects.create(
+                user=self.admin, pharmacy=pharmacy, admin_level=PharmacyAdmin.AdminLevel.ROSTER_MANAGER
+            )
+
+    def test_checks_share_one_load_per_request(self):
+        with self.assertNumQueries(4):
+            ctx = get_permission_context(self.admin)
+        self.assertEqual(set(ctx.memberships), {p.id for p in self.pharmacies})
+
+        with self.assertNumQueries(0):
+            for pharmacy in self.pharmacies:
+                self.assertTrue(has_admin_capability(self.admin, pharmacy, CAPABILITY_MANAGE_ROSTER))
+                self.assertTrue(is_admin_of(self.admin, pharmacy.id))
+
+        # A fresh user instance (the next request) is served from the cache.
+        with self.assertNumQueries(1):
+            other_request_user = get_user_model().objects.get(pk=self.admin.pk)
+            self.assertTrue(get_permission_context(other_request_user).is_admin_of(self.pharmacies[0].id))
+
+    def test_changes_invalidate_the_context(self):
+        pharmacy = self.pharmacies[0]
+        self.assertTrue(is_admin_of(self.admin, pharmacy.id))
+
+        PharmacyAdmin.objects.filter(user=self.admin, pharmacy=pharmacy).get().delete()
+        self.assertFalse(is_admin_of(self.admin, pharmacy.id))
+        self.assertFalse(is_admin_of(get_user_model().objects.get(pk=self.admin.pk), pharmacy.id))
+
+        self.assertFalse(get_permission_context(self.owner_user).is_owner_of(pharmacy.id))
+        pharmacy.owner = self.owner
+        pharmacy.save()
+        self.assertTrue(get_permission_context(self.owner_user).can_manage_pharmacy(pharmacy.id))
+
+        # Profile edits that keep the owner don't drop anyone's context.
+        get_permission_context(self.owner_user)
+        with self.assertNumQueries(2):
+            pharmacy.name = "Renamed"
+            pharmacy.save()
+
+
+class HubContextCacheTests(TestCase):
+    url = "/api/client-profile/hub/context/"
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.viewer = User.objects.create_user(email="ctx-viewer@example.com", password="password", role="PHARMACIST")
+        self.organization = Organization.objects.create(name="Context Group")
+        self.pharmacy = Pharmacy.objects.create(name="Context Hub Pharmacy", organization=self.organization)
+        self.membership = Membership.objects.create(user=self.viewer, pharmacy=self.pharmacy)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def _get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeat_opens_are_served_from_the_cache(self):
+        first = self._get()
+        with self.assertNumQueries(0):
+            second = self._get()
+        self.assertEqual(first, second)
+        self.assertEqual(hit_stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+    def test_relevant_changes_invalidate_the_payload(self):
+        self.assertEqual([p["name"] for p in self._get()["pharmacies"]], ["Context Hub Pharmacy"])
+
+        self.pharmacy.name = "Renamed Hub Pharmacy"
+        self.pharmacy.save()
+        self.assertEqual([p["name"] for p in self._get()["pharmacies"]], ["Renamed Hub Pharmacy"])
+
+        PharmacyAdmin.objects.create(user=self.viewer, pharmacy=self.pharmacy)
+        self.assertTrue(self._get()["pharmacies"][0]["can_manage_profile"])
+
+        # A group in another pharmacy of the organisation appears once the viewer is added to it.
+        other_pharmacy = Pharmacy.objects.create(name="Other Hub Pharmacy", organization=self.organization)
+        group = PharmacyCommunityGroup.objects.create(pharmacy=other_pharmacy, name="Night shift")
+        self.assertEqual(self._get()["community_groups"], [])
+        PharmacyCommunityGroupMembership.objects.create(group=group, membership=self.membership)
+        self.assertEqual([g["name"] for g in self._get()["community_groups"]], ["Night shift"])
+
+        # Unrelated pharmacies don't disturb the cached payload.
+        Pharmacy.objects.create(name="Unrelated Pharmacy")
+        with self.assertNumQueries(0):
+            self._get()
+
+    def test_evicted_versions_do_not_revalidate_old_entries(self):
+        version_keys = [user_version_key(self.viewer.pk), pharmacy_version_key(self.pharmacy.pk)]
+        cache.delete_many(version_keys)
+        self._get()  # Built while no versions were stored.
+        self.pharmacy.name = "Renamed Hub Pharmacy"
+        self.pharmacy.save()
+
+        # Losing the bumped stamps (e.g. Redis eviction) must not make the older entry current again.
+        cache.delete_many(version_keys)
+        self.assertEqual([p["name"] for p in self._get()["pharmacies"]], ["Renamed Hub Pharmacy"])
+
+
+class MembershipImportTests(TestCase):
+    url = "/api/client-profile/memberships/bulk_import/"
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner_user = User.objects.create_user(email="import-owner@example.com", password="password", role="OWNER")
+        owner = OwnerOnboarding.objects.create(
+            user=self.owner_user,
+            phone_number="0400000000",
+            role=OwnerOnboarding.ROLE_CHOICES[0][0],
+        )
+        self.pharmacy = Pharmacy.objects.create(name="Import Pharmacy", owner=owner)
+        self.foreign_pharmacy = Pharmacy.objects.create(name="Someone Else's Pharmacy")
+        self.existing = User.objects.create_user(email="existing@example.com", password="password", role="OTHER_STAFF")
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner_user)
+
+    def _csv(self, rows):
+        lines = ["email,pharmacy,role,employment_type,invited_name"] + [",".join(map(str, row)) for row in rows]
+        return SimpleUploadedFile("staff.csv", "\n".join(lines).encode(), content_type="text/csv")
+
+    def _import(self, rows):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.url, {"file": self._csv(rows)}, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        return response.json()["job_id"]
+
+    def test_csv_rows_are_imported_with_per_row_errors(self):
+        p = self.pharmacy.pk
+        job_id = self._import([
+            ("New.Assistant@Example.com", p, "ASSISTANT", "CASUAL", "Ann"),
+            ("existing@example.com", p, "TECHNICIAN", "PART_TIME", ""),
+            ("new.assistant@example.com", p, "ASSISTANT", "CASUAL", "Ann again"),
+            ("existing@example.com", self.foreign_pharmacy.pk, "TECHNICIAN", "CASUAL", ""),
+            ("existing2@example.com", 999999, "TECHNICIAN", "CASUAL", ""),
+            ("pharmacist@example.com", p, "", "CASUAL", ""),
+        ])
+        with mock.patch("client_profile.membership_import.enqueue_email_batch") as enqueue:
+            tasks.run_membership_import(job_id)
+
+        job = self.client.get(f"{self.url}{job_id}/").json()
+        self.assertEqual(job["status"], "COMPLETED")
+        self.assertEqual((job["processed_rows"], job["created_count"]), (6, 2))
+        self.assertEqual(
+            [(error["line"], error["error"]) for error in job["errors"]],
+            [
+                (3, "User is already a member of this pharmacy."),
+                (4, "Not permitted to invite into this pharmacy."),
+                (5, "Pharmacy not found."),
+                (6, "email, pharmacy, and role are required."),
+            ],
+        )
+
+        new_user = get_user_model().objects.get(email="new.assistant@example.com")
+        self.assertEqual(new_user.role, "OTHER_STAFF")
+        self.assertFalse(new_user.has_usable_password())
+        self.assertEqual(
+            set(Membership.objects.filter(pharmacy=self.pharmacy).values_list("user__email", "invited_by")),
+            {("new.assistant@example.com", self.owner_user.pk), ("existing@example.com", self.owner_user.pk)},
+        )
+        # The community chat membership the post_save signal would have added.
+        self.assertEqual(Participant.objects.filter(conversation__pharmacy=self.pharmacy).count(), 2)
+
+        enqueue.assert_called_once()
+        (messages,) = enqueue.call_args.args
+        self.assertEqual(
+            [(m["recipient_list"], m["template_name"]) for m in messages],
+            [
+                (["new.assistant@example.com"], "emails/pharmacy_invite_new_user.html"),
+                (["existing@example.com"], "emails/pharmacy_invite_existing_user.html"),
+            ],
+        )
+
+    @override_settings(MEMBERSHIP_IMPORT_CHUNK_SIZE=1000)
+    def test_query_count_does_not_grow_with_rows(self):
+        def run(count, prefix):
+            job_id = self._import(
+                [(f"{prefix}{n}@example.com", self.pharmacy.pk, "ASSISTANT", "CASUAL", "") for n in range(count)]
+            )
+            with mock.patch("client_profile.membership_import.enqueue_email_batch"):
+                with CaptureQueriesContext(connection) as queries:
+                    tasks.run_membership_import(job_id)
+            return len(queries)
+
+        run(1, "first")  # creates the pharmacy's community chat
+        self.assertEqual(run(5, "small"), run(40, "large"))
+        self.assertEqual(Membership.objects.filter(pharmacy=self.pharmacy).count(), 46)
+
+    def test_progress_is_only_visible_to_the_importer(self):
+        job_id = self._import([("someone@example.com", self.pharmacy.pk, "ASSISTANT", "CASUAL", "")])
+        self.assertEqual(self.client.get(f"{self.url}{job_id}/").json()["status"], "PENDING")
+
+        self.client.force_authenticate(self.existing)
+        self.assertEqual(self.client.get(f"{self.url}{job_id}/").status_code, 404)
+
+    @override_settings(MEMBERSHIP_IMPORT_MAX_ROWS=2)
+    def test_oversized_imports_are_rejected(self):
+        response = self.client.post(
+            self.url, {"invitations": [{"email": f"x{n}@example.com"} for n in range(3)]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MembershipImportJob.objects.exists())
+
+
+class ShiftReminderTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.worker = User.objects.create_user(email="reminder-worker@example.com", password="password", role="PHARMACIST")
+        owner = User.objects.create_user(email="reminder-owner@example.com", password="password", role="OWNER")
+        self.pharmacy = Pharmacy.objects.create(name="Perth Pharmacy", timezone="Australia/Perth")
+        self.shift = Shift.objects.create(
+            pharmacy=self.pharmacy,
+            created_by=owner,
+            role_needed="PHARMACIST",
+            employment_type="LOCUM",
+        )
+        self.slot = ShiftSlot.objects.create(
+            shift=self.shift, date=date(2027, 3, 2), start_time=time(9, 0), end_time=time(17, 0)
+        )
+        self.assignment = ShiftSlotAssignment.objects.create(
+            shift=self.shift, slot=self.slot, slot_date=self.slot.date, user=self.worker
+        )
+        self.starts_at = datetime(2027, 3, 2, 1, 0, tzinfo=dt_timezone.utc)  # 09:00 AWST
+
+    def _run(self, now):
+        with mock.patch("client_profile.shift_reminders.enqueue_email_batch", side_effect=len) as enqueue:
+            send_shift_reminders(now)
+        enqueue.assert_called_once()
+        return enqueue.call_args.args[0]
+
+    def test_starts_at_follows_the_slot_and_pharmacy_clock(self):
+        self.assertEqual(self.assignment.starts_at, self.starts_at)
+
+        self.slot.start_time = time(10, 30)
+        self.slot.save()
+        self.assignment.refresh_from_db()
+        self.assertEqual(self.assignment.starts_at, self.starts_at + timedelta(hours=1, minutes=30))
+
+        self.pharmacy.timezone = "Australia/Sydney"  # AEDT, UTC+11 in March
+        self.pharmacy.save()
+        self.assignment.refresh_from_db()
+        self.assertEqual(self.assignment.starts_at, datetime(2027, 3, 1, 23, 30, tzinfo=dt_timezone.utc))
+
+    def test_each_reminder_is_sent_once(self):
+        now = self.starts_at - timedelta(hours=12, minutes=30)
+        self.assertEqual(self._run(self.starts_at - timedelta(hours=14)), [])
+
+        (message,) = self._run(now)
+        self.assertEqual(message["recipient_list"], ["reminder-worker@example.com"])
+        self.assertIn("2027-03-02 09:00", message["context"]["slot_time"])
+        # An overlapping run finds the claim and sends nothing.
+        with self.assertNumQueries(2):
+            self.assertEqual(self._run(now + timedelta(minutes=5)), [])
+
+        # Moving the slot makes a new occurrence, which gets its own reminder.
+        self.slot.start_time = time(9, 15)
+        self.slot.save()
+        self.assertEqual(len(self._run(now + timedelta(minutes=15))), 1)
+        self.assertEqual(ShiftReminderDelivery.objects.filter(assignment=self.assignment).count(), 2)
+
+    def test_late_run_covers_the_end_of_the_previous_window(self):
+        # The previous hourly run read up to starts_at; this one started five minutes late.
+        self.assertEqual(self._run(self.starts_at - timedelta(hours=13)), [])
+        (message,) = self._run(self.starts_at - timedelta(hours=11, minutes=55))
+        self.assertEqual(message["recipient_list"], ["reminder-worker@example.com"])
+
+
+class WorkNoteNotificationTests(TestCase):
+    # 09:10 in Perth (UTC+8), 12:10 in Sydney (UTC+11), on Wednesday 3 March 2027.
+    now = datetime(2027, 3, 3, 1, 10, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        User = get_user_model()
+        owner = User.objects.create_user(email="notes-owner@example.com", password="password", role="OWNER")
+        self.worker = User.objects.create_user(email="notes-worker@example.com", password="password", role="PHARMACIST")
+        self.colleague = User.objects.create_user(email="notes-colleague@example.com", password="password", role="PHARMACIST")
+        self.perth = Pharmacy.objects.create(name="Perth Notes Pharmacy", timezone="Australia/Perth")
+        self.sydney = Pharmacy.objects.create(name="Sydney Notes Pharmacy", timezone="Australia/Sydney")
+        for user in (self.worker, self.colleague):
+            Membership.objects.create(user=user, pharmacy=self.perth)
+        Membership.objects.create(user=self.colleague, pharmacy=self.sydney)
+
+        shift = Shift.objects.create(
+            pharmacy=self.perth, created_by=owner, role_needed="PHARMACIST", employment_type="LOCUM"
+        )
+        slot = ShiftSlot.objects.create(shift=shift, date=date(2027, 3, 3), start_time=time(9, 0), end_time=time(17, 0))
+        ShiftSlotAssignment.objects.create(shift=shift, slot=slot, slot_date=slot.date, user=self.worker)
+
+        weekly = {"freq": "WEEKLY", "interval": 1, "byweekday": [2]}
+        self.recurring = WorkNote.objects.create(
+            pharmacy=self.perth, date=date(2027, 2, 24), title="Fridge temps", recurrence=weekly,
+            notify_on_shift_start=True, is_general=True,
+        )
+        WorkNote.objects.create(
+            pharmacy=self.perth, date=date(2027, 2, 25), title="Thursday delivery",
+            recurrence={**weekly, "byweekday": [3]}, notify_on_shift_start=True, is_general=True,
+        )
+        WorkNote.objects.create(
+            pharmacy=self.sydney, date=date(2027, 3, 3), title="Sydney stocktake",
+            notify_on_shift_start=True, is_general=True,
+        )
+
+    def _notified(self):
+        return sorted(
+            Notification.objects.filter(type=Notification.Type.WORK_NOTE).values_list("user__email", "title")
+        )
+
+    def test_shift_start_and_fallback_notify_each_occurrence_once(self):
+        with mock.patch("django.utils.timezone.now", return_value=self.now):
+            self.assertEqual(calendar_tasks.send_shift_start_work_note_notifications(), 1)
+            self.assertEqual(calendar_tasks.send_shift_start_work_note_notifications(), 0)
+            self.assertEqual(self._notified(), [("notes-worker@example.com", "Work Note: Fridge temps")])
+
+            # 9 AM in Perth only: the colleague is caught up, the worker isn't notified twice,
+            # and the Sydney note waits for Sydney's 9 AM.
+            self.assertEqual(calendar_tasks.send_9am_work_note_fallback(), 1)
+            self.assertEqual(calendar_tasks.send_9am_work_note_fallback(), 0)
+
+        self.assertEqual(
+            self._notified(),
+            [
+                ("notes-colleague@example.com", "Work Note: Fridge temps"),
+                ("notes-worker@example.com", "Work Note: Fridge temps"),
+            ],
+        )
+        self.assertEqual(
+            set(WorkNoteDelivery.objects.values_list("work_note", "occurrence_date")),
+            {(self.recurring.pk, date(2027, 3, 3))},
+        )
+
+        # Next week's occurrence is a new delivery.
+        with mock.patch("django.utils.timezone.now", return_value=self.now + timedelta(days=7)):
+            self.assertEqual(calendar_tasks.send_9am_work_note_fallback(), 2)
+
+
+class BirthdayEventTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.pharmacy = Pharmacy.objects.create(name="Birthday Pharmacy")
+        self.members = {}
+        for name, dob, onboarding in (
+            ("pharmacist", date(1990, 1, 5), PharmacistOnboarding),
+            ("assistant", date(1985, 12, 24), OtherStaffOnboarding),
+            ("leapling", date(2000, 2, 29), OtherStaffOnboarding),
+            ("later", date(1992, 6, 1), PharmacistOnboarding),
+        ):
+            user = User.objects.create_user(
+                email=f"{name}@example.com", password="password", first_name=name.title(), last_name="Staff"
+            )
+            onboarding.objects.create(user=user, date_of_birth=dob)
+            self.members[name] = Membership.objects.create(user=user, pharmacy=self.pharmacy)
+
+    def _events(self):
+        return sorted(
+            CalendarEvent.objects.filter(source=CalendarEvent.Source.BIRTHDAY).values_list("title", "date")
+        )
+
+    def test_generation_is_one_pass_and_idempotent(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(calendar_tasks.generate_birthday_events(date(2026, 12, 20)), 2)
+        # The January birthday falls in next year's part of the window.
+        self.assertEqual(
+            self._events(),
+            [("Birthday: Assistant Staff", date(2026, 12, 24)), ("Birthday: Pharmacist Staff", date(2027, 1, 5))],
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(calendar_tasks.generate_birthday_events(date(2026, 12, 21)), 0)
+
+    def test_leap_day_birthdays_and_inactive_members(self):
+        self.members["later"].is_active = False
+        self.members["later"].save()
+        self.assertEqual(calendar_tasks.generate_birthday_events(date(2027, 2, 10)), 1)
+        self.assertEqual(calendar_tasks.generate_birthday_events(date(2027, 5, 20)), 0)
+        self.assertEqual(self._events(), [("Birthday: Leapling Staff", date(2027, 2, 28))])
+
+
+class CalendarFeedTests(TestCase):
+    url = "/api/client-profile/calendar-feed/"
+
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.owner_user = User.objects.create_user(email="feed-owner@example.com", password="password", role="OWNER")
+        owner = OwnerOnboarding.objects.create(
+            user=self.owner_user, phone_number="0400000000", role=OwnerOnboarding.ROLE_CHOICES[0][0]
+        )
+        self.pharmacy = Pharmacy.objects.create(name="Feed Pharmacy", owner=owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner_user)
+
+        CalendarEvent.objects.create(pharmacy=self.pharmacy, title="Inspection", date=date(2027, 3, 10))
+        CalendarEvent.objects.create(
+            pharmacy=self.pharmacy, title="Weekly huddle", date=date(2027, 2, 1),
+            recurrence={"freq": "WEEKLY", "byweekday": [0], "until_date": "2027-03-20"},
+        )
+        CalendarEvent.objects.create(
+            pharmacy=self.pharmacy, title="Finished series", date=date(2027, 1, 1),
+            recurrence={"freq": "DAILY", "until_date": "2027-02-15"},
+        )
+        self.note = WorkNote.objects.create(
+            pharmacy=self.pharmacy, title="Open up", date=date(2027, 3, 1), recurrence={"freq": "MONTHLY"},
+        )
+
+    def _feed(self, **params):
+        response = self.client.get(self.url, {"date_from": "2027-03-01", "date_to": "2027-03-31", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_series_end_is_derived_from_the_rule(self):
+        self.assertEqual(
+            dict(CalendarEvent.objects.values_list("title", "series_end")),
+            {"Inspection": date(2027, 3, 10), "Weekly huddle": date(2027, 3, 20), "Finished series": date(2027, 2, 15)},
+        )
+        self.assertIsNone(self.note.series_end)
+
+    def test_full_and_compact_payloads(self):
+        full = self._feed()
+        self.assertEqual(
+            [(event["title"], event["date"]) for event in full["events"]],
+            [
+                ("Weekly huddle", "2027-03-01"),
+                ("Weekly huddle", "2027-03-08"),
+                ("Weekly huddle", "2027-03-15"),
+                ("Inspection", "2027-03-10"),
+            ],
+        )
+        self.assertEqual([note["id"] for note in full["work_notes"]], [f"{self.note.pk}-2027-03-01"])
+
+        compact = self._feed(compact="1")
+        self.assertEqual(
+            {event["title"]: event.get("occurrence_dates") for event in compact["events"]},
+            {"Weekly huddle": ["2027-03-01", "2027-03-08", "2027-03-15"], "Inspection": None},
+        )
+        (note,) = compact["work_notes"]
+        self.assertEqual(note["occurrence_dates"], ["2027-03-01"])
+        self.assertEqual(note["occurrence_state"], {"2027-03-01": {"completed_by": []}})
+
+    def test_query_count_does_not_grow_with_series(self):
+        self._feed()
+        with CaptureQueriesContext(connection) as few:
+            self._feed()
+        for n in range(5):
+            CalendarEvent.objects.create(
+                pharmacy=self.pharmacy, title=f"Daily {n}", date=date(2027, 2, 1), recurrence={"freq": "DAILY"}
+            )
+            WorkNote.objects.create(
+                pharmacy=self.pharmacy, title=f"Note {n}", date=date(2027, 3, 2), recurrence={"freq": "WEEKLY"}
+            )
+        with CaptureQueriesContext(connection) as many:
+            feed = self._feed()
+        self.assertEqual(len(feed["events"]), 4 + 5 * 31)
+        self.assertEqual(len(few), len(many))
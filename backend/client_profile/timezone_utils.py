@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone as dt_timezone
 from zoneinfo import ZoneInfo
 
 from django.utils import timezone
@@ -16,3 +17,8 @@ def get_pharmacy_timezone(pharmacy) -> ZoneInfo:
         except Exception:
             pass
     return timezone.get_default_timezone()
+
+
+def local_to_utc(local_date, local_time, tz) -> datetime:
+    """Aware UTC datetime for a wall-clock date and time in ``tz``."""
+    return datetime.combine(local_date, local_time, tzinfo=tz).astimezone(dt_timezone.utc)
@@ -4,6 +4,7 @@ from datetime import datetime, date, time
 from decimal import Decimal
 from django.contrib.auth import get_user_model
 from django_q.tasks import async_task
+from users.tasks import enqueue_email_batch
 import difflib
 from django.utils import timezone
 from django.core.signing import TimestampSigner
@@ -382,6 +383,42 @@ def build_roster_email_link(user, pharmacy):
 
     return with_pharmacy(f"{base}/explorer/roster")
 
+def build_membership_invite_email(*, user, pharmacy, inviter, role, user_created):
+    """
+    ``send_async_email`` kwargs for a pharmacy staff invite: a password-setup
+    link for a newly created user, a login link for an existing one.
+    """
+    from django.contrib.auth.tokens import default_token_generator
+    from django.utils.encoding import force_bytes
+    from django.utils.http import urlsafe_base64_encode
+
+    base = (getattr(settings, "FRONTEND_BASE_URL", "") or "").rstrip("/")
+    context = {
+        "pharmacy_name": pharmacy.name,
+        "inviter": inviter.get_full_name() or inviter.email or "A pharmacy admin",
+        "role": role.title() if role else "",
+        "is_admin": False,
+        "admin_landing_url": f"{base}/dashboard/owner/manage-pharmacies/my-pharmacies",
+    }
+    if user_created:
+        uid = urlsafe_base64_encode(force_bytes(user.pk))
+        token = default_token_generator.make_token(user)
+        context["magic_link"] = f"{base}/reset-password/{uid}/{token}/"
+        subject = "You’re invited to join a pharmacy on ChemistTasker"
+        template = "pharmacy_invite_new_user"
+    else:
+        context["frontend_dashboard_link"] = f"{base}/login"
+        subject = "You have been added to a pharmacy on ChemistTasker"
+        template = "pharmacy_invite_existing_user"
+    return {
+        "subject": subject,
+        "recipient_list": [user.email],
+        "template_name": f"emails/{template}.html",
+        "context": context,
+        "text_template": f"emails/{template}.txt",
+    }
+
+
 def clean_email(email):
     """Remove hidden unicode chars and spaces from email."""
     if not email:
@@ -477,6 +514,7 @@ def send_referee_emails(obj, is_reminder=False):
     signer = TimestampSigner()
 
     update_fields = []
+    messages = []
     for idx in [1, 2]:
         email_raw = getattr(obj, f'referee{idx}_email', None)
         confirmed = getattr(obj, f'referee{idx}_confirmed', None)
@@ -507,8 +545,7 @@ def send_referee_emails(obj, is_reminder=False):
 
             reject_url = f"{settings.FRONTEND_BASE_URL}/onboarding/referee-reject/{token}"
 
-            async_task(
-                'users.tasks.send_async_email',
+            messages.append(dict(
                 subject=subject,
                 recipient_list=[email],
                 template_name=template_name,
@@ -525,7 +562,7 @@ def send_referee_emails(obj, is_reminder=False):
                     "position_applied_for": get_candidate_role(obj),
                 },
                 text_template=text_template
-            )
+            ))
             setattr(obj, f'referee{idx}_last_sent', timezone.now())
             update_fields.append(f'referee{idx}_last_sent')
 
@@ -536,6 +573,10 @@ def send_referee_emails(obj, is_reminder=False):
             except Exception:
                 pass
 
+    # Both referees go out in one task over one mail connection.
+    if messages:
+        enqueue_email_batch(messages)
+
     if update_fields:
         obj.save(update_fields=list(set(update_fields)))
 
@@ -22,6 +22,8 @@ from .admin_helpers import (
     is_any_admin,
     is_admin_of,
 )
+from .permission_context import get_permission_context
+from .membership_import import ImportRowsError, import_job_payload, read_import_rows, start_membership_import
 from users.permissions import *
 from users.serializers import (
     UserProfileSerializer,
@@ -31,11 +33,12 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 import json
 from django.db.models import Q, Count, F, Avg, Exists, OuterRef, Max, Sum
 from django.utils import timezone
-from client_profile.services import get_locked_rate_for_slot, expand_shift_slots, generate_invoice_from_shifts, render_invoice_to_pdf, generate_preview_invoice_lines
+from client_profile.services import get_locked_rate_for_slot, expand_shift_slots, generate_invoice_from_shifts, generate_preview_invoice_lines, invoice_pdf_fingerprint, cached_invoice_pdf_key, store_invoice_pdf, build_invoice_email
 from client_profile.utils import (
     build_shift_email_context,
     clean_email,
     build_roster_email_link,
+    build_membership_invite_email,
     get_frontend_dashboard_url,
     sanitize_chat_text,
     enforce_public_shift_daily_limit,
@@ -75,6 +78,7 @@ from client_profile.rewards import (
     spend_pills_for_shift_post,
     user_is_referral_reward_eligible,
 )
+from client_profile.ratings import MAX_SUMMARY_TARGETS, RATING_TARGETS, get_rating_summaries, record_rating
 from django.db import transaction, IntegrityError
 from django.db.models.deletion import ProtectedError
 from datetime import timedelta                   # used in TimestampSigner max_age
@@ -91,6 +95,7 @@ from users.org_roles import (
     membership_visible_pharmacy_ids,
 )
 from client_profile.serializers import ShiftContactSerializer, DeviceTokenSerializer
+from core.db_router import ReplicaReadMixin
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 import mimetypes
@@ -1164,7 +1169,7 @@ def _dashboard_payload_extras(*, shifts_qs, confirmed_qs, community_qs=None, inv
     }
 
 
-class OrganizationDashboardView(APIView):
+class OrganizationDashboardView(ReplicaReadMixin, APIView):
     """
     Any org-level member may view this dashboard.
     """
@@ -1472,7 +1477,7 @@ class PharmacyClaimViewSet(mixins.ListModelMixin,
             pharmacy.save(update_fields=['organization'])
         return [claim.id]
 
-class OwnerDashboard(APIView):
+class OwnerDashboard(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -1601,7 +1606,7 @@ class OwnerDashboard(APIView):
         }
         return Response(data)
 
-class PharmacistDashboard(APIView):
+class PharmacistDashboard(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated, IsPharmacist]
 
     def get(self, request):
@@ -1715,7 +1720,7 @@ class PharmacistDashboard(APIView):
         }
         return Response(data)
 
-class OtherStaffDashboard(APIView):
+class OtherStaffDashboard(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated, IsOtherstaff]
 
     def get(self, request):
@@ -1824,7 +1829,7 @@ class OtherStaffDashboard(APIView):
         }
         return Response(data)
 
-class ExplorerDashboard(APIView):
+class ExplorerDashboard(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated, IsExplorer]
 
     def get(self, request):
@@ -2256,62 +2261,14 @@ class MembershipViewSet(viewsets.ModelViewSet):
 
             # Prepare and send email
             try:
-                base = (getattr(settings, "FRONTEND_BASE_URL", "") or "").rstrip("/")
-                admin_landing_url = f"{base}/dashboard/owner/manage-pharmacies/my-pharmacies"
-                login_url = f"{base}/login"
-
-                is_admin_role = False
-
-                context = {
-                    "pharmacy_name": pharmacy.name,
-                    "inviter": inviter.get_full_name() or inviter.email or "A pharmacy admin",
-                    "role": role.title() if role else "",
-                    "is_admin": is_admin_role,                    # <-- NEW
-                    "admin_landing_url": admin_landing_url,       # <-- NEW
-                }
-
-                recipient_list = [user.email]
-
-
-                if user_created:
-                    uid = urlsafe_base64_encode(force_bytes(user.pk))
-                    token = default_token_generator.make_token(user)
-                    context["magic_link"] = f"{base}/reset-password/{uid}/{token}/"
-
-                    subject = (
-                        f"You’ve been invited as Pharmacy Admin at {pharmacy.name}"
-                        if is_admin_role
-                        else "You’re invited to join a pharmacy on ChemistTasker"
-                    )
-
-                    transaction.on_commit(lambda: async_task(
-                        'users.tasks.send_async_email',
-                        subject=subject,
-                        recipient_list=recipient_list,
-                        template_name="emails/pharmacy_invite_new_user.html",
-                        context=context,
-                        text_template="emails/pharmacy_invite_new_user.txt",
-                    ))
-
-                else:
-                    # For admins, send them straight to admin dashboard; others go to login
-                    context["frontend_dashboard_link"] = admin_landing_url if is_admin_role else login_url
-
-                    subject = (
-                        f"You’ve been added as Pharmacy Admin at {pharmacy.name}"
-                        if is_admin_role
-                        else "You have been added to a pharmacy on ChemistTasker"
-                    )
-
-                    transaction.on_commit(lambda: async_task(
-                        'users.tasks.send_async_email',
-                        subject=subject,
-                        recipient_list=recipient_list,
-                        template_name="emails/pharmacy_invite_existing_user.html",
-                        context=context,
-                        text_template="emails/pharmacy_invite_existing_user.txt",
-                    ))
-
+                message = build_membership_invite_email(
+                    user=user,
+                    pharmacy=pharmacy,
+                    inviter=inviter,
+                    role=role,
+                    user_created=user_created,
+                )
+                transaction.on_commit(lambda: async_task('users.tasks.send_async_email', **message))
 
             except Exception as e:
                 import traceback
@@ -2419,6 +2376,28 @@ class MembershipViewSet(viewsets.ModelViewSet):
 
         return Response(response, status=status.HTTP_201_CREATED)
 
+    # --- Bulk Import (background job for large CSV/JSON staff lists) ---
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk_import',
+        parser_classes=[MultiPartParser, FormParser, JSONParser],
+    )
+    def bulk_import(self, request):
+        try:
+            rows = read_import_rows(request)
+        except ImportRowsError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        job = start_membership_import(request.user, rows)
+        return Response(import_job_payload(job), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'bulk_import/(?P<job_id>\d+)')
+    def bulk_import_status(self, request, job_id=None):
+        job = get_object_or_404(
+            MembershipImportJob.objects.defer('rows'), pk=job_id, created_by=request.user
+        )
+        return Response(import_job_payload(job))
+
 
 class MembershipInviteLinkViewSet(viewsets.ModelViewSet):
     """
@@ -3023,27 +3002,7 @@ class BaseShiftViewSet(viewsets.ModelViewSet):
 
     @staticmethod
     def _user_can_manage_pharmacy(user, pharmacy):
-        if pharmacy.owner and getattr(pharmacy.owner, 'user', None) == user:
-            return True
-
-        if OrganizationMembership.objects.filter(
-            user=user,
-            role='ORG_ADMIN',
-            organization_id=pharmacy.organization_id
-        ).exists():
-            return True
-
-        if OrganizationMembership.objects.filter(
-            user=user,
-            role__in=['CHIEF_ADMIN', 'REGION_ADMIN'],
-            pharmacies=pharmacy,
-        ).exists():
-            return True
-
-        if has_admin_capability(user, pharmacy, CAPABILITY_MANAGE_ROSTER):
-            return True
-
-        return False
+        return get_permission_context(user).can_manage_pharmacy(pharmacy.id)
 
     @staticmethod
     def _managed_pharmacies(user):
@@ -3053,32 +3012,7 @@ class BaseShiftViewSet(viewsets.ModelViewSet):
         """
         if not user or not getattr(user, "is_authenticated", False):
             return Pharmacy.objects.none()
-
-        pharmacies = Pharmacy.objects.none()
-
-        if hasattr(user, "owneronboarding"):
-            pharmacies |= Pharmacy.objects.filter(owner=user.owneronboarding)
-
-        org_ids = list(
-            OrganizationMembership.objects.filter(user=user, role="ORG_ADMIN").values_list(
-                "organization_id", flat=True
-            )
-        )
-        if org_ids:
-            pharmacies |= Pharmacy.objects.filter(
-                organization_id__in=org_ids
-            )
-
-        if user:
-            managed_admin_pharmacies = [
-                pharm.id
-                for pharm in pharmacies_user_admins(user)
-                if has_admin_capability(user, pharm, CAPABILITY_MANAGE_ROSTER)
-            ]
-            if managed_admin_pharmacies:
-                pharmacies |= Pharmacy.objects.filter(id__in=managed_admin_pharmacies)
-
-        return pharmacies.distinct()
+        return Pharmacy.objects.filter(id__in=get_permission_context(user).managed_pharmacy_ids())
 
     def get_queryset(self):
         now = timezone.now()
@@ -3097,7 +3031,10 @@ class BaseShiftViewSet(viewsets.ModelViewSet):
         if not date_filter:
             return
 
-        candidates = Shift.objects.filter(
+        # PLATFORM is the last tier, so public shifts never need another pass.
+        candidates = Shift.objects.exclude(
+            visibility=PUBLIC_LEVEL
+        ).filter(
             interests__isnull=True
         ).filter(date_filter).select_related('pharmacy', 'pharmacy__owner', 'created_by')
 
@@ -3155,8 +3092,7 @@ class BaseShiftViewSet(viewsets.ModelViewSet):
                     setattr(shift, field, stamp_time)
                     update_fields.append(field)
 
-        # Remove duplicates while preserving order
-        shift.save(update_fields=list(dict.fromkeys(update_fields)))
+        shift.save_internal(*update_fields)
         return target_visibility
 
     def _build_member_status_response(self, request, shift):
@@ -3527,8 +3463,7 @@ class BaseShiftViewSet(viewsets.ModelViewSet):
 
         if not already_revealed_user:
             shift.revealed_users.add(candidate)
-            shift.reveal_count += 1
-            shift.save()
+            shift.increment_reveal_count()
 
         if not already_revealed_interest:
             interest.revealed = True
@@ -3994,13 +3929,9 @@ class BaseShiftViewSet(viewsets.ModelViewSet):
                 for shift_offer in created_offers:
                     shift_offer.status = ShiftOffer.Status.ACCEPTED_AWAITING_PAYMENT
                     shift_offer.save(update_fields=["status", "updated_at"])
-                if shift.payment_status != 'PENDING':
-                    shift.payment_status = 'PENDING'
-                    shift.save(update_fields=['payment_status'])
+                shift.set_payment_status('PENDING')
             else:
-                if shift.payment_status != 'PAID':
-                    shift.payment_status = 'PAID'
-                    shift.save(update_fields=['payment_status'])
+                shift.set_payment_status('PAID')
                 for shift_offer in created_offers:
                     ids, _rates = finalize_shift_offer(shift_offer)
                     assignment_ids.extend(ids)
@@ -5324,13 +5255,9 @@ class ShiftOfferViewSet(viewsets.ModelViewSet):
             if requires_payment:
                 offer.status = ShiftOffer.Status.ACCEPTED_AWAITING_PAYMENT
                 offer.save(update_fields=['status', 'updated_at'])
-                if shift.payment_status != 'PENDING':
-                    shift.payment_status = 'PENDING'
-                    shift.save(update_fields=['payment_status'])
+                shift.set_payment_status('PENDING')
             else:
-                if shift.payment_status != 'PAID':
-                    shift.payment_status = 'PAID'
-                    shift.save(update_fields=['payment_status'])
+                shift.set_payment_status('PAID')
                 assignment_ids, assignment_rates = finalize_shift_offer(offer)
 
         pharmacy_display = shift.pharmacy.name
@@ -5625,7 +5552,7 @@ class ShiftDetailViewSet(BaseShiftViewSet):
 
         return qs.filter(combined_filter).distinct()
 
-class PublicJobBoardView(generics.ListAPIView):
+class PublicJobBoardView(ReplicaReadMixin, generics.ListAPIView):
     """ Lists all available shifts with PLATFORM visibility for the public job board. """
     serializer_class = SharedShiftSerializer
     permission_classes = [permissions.AllowAny]
@@ -5875,27 +5802,11 @@ class RosterOwnerViewSet(viewsets.ModelViewSet):
         pharmacy_id = request.query_params.get('pharmacy_id')
         target_role = request.query_params.get('role')
 
-        controlled_pharmacies_query = Pharmacy.objects.none()
-        if hasattr(user, 'owneronboarding'):
-            controlled_pharmacies_query |= Pharmacy.objects.filter(owner=user.owneronboarding)
-
-        org_ids = list(
-            OrganizationMembership.objects.filter(user=user, role='ORG_ADMIN').values_list('organization', flat=True)
-        )
-        if org_ids:
-            controlled_pharmacies_query |= Pharmacy.objects.filter(organization_id__in=org_ids)
-        if is_any_admin(user):
-            scoped_admin_ids = [
-                pharm.id
-                for pharm in pharmacies_user_admins(user)
-                if has_admin_capability(user, pharm, CAPABILITY_MANAGE_ROSTER)
-            ]
-            if scoped_admin_ids:
-                controlled_pharmacies_query |= Pharmacy.objects.filter(id__in=scoped_admin_ids)
+        controlled_pharmacy_ids = get_permission_context(user).managed_pharmacy_ids()
 
         qs = Membership.objects.filter(
             is_active=True,
-            pharmacy__in=controlled_pharmacies_query
+            pharmacy_id__in=controlled_pharmacy_ids
         )
 
         if pharmacy_id:
@@ -7027,6 +6938,12 @@ class MyHistoryShiftsViewSet(BaseShiftViewSet):
 # -----------------------------------------------------------------------------
 # Rating 
 # -----------------------------------------------------------------------------
+class PendingRatingsPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
 class RatingViewSet(viewsets.GenericViewSet):
     """
     Relationship-level ratings (NOT per shift/slot):
@@ -7120,16 +7037,7 @@ class RatingViewSet(viewsets.GenericViewSet):
                     {"detail": "You can only rate workers who completed an assignment at your pharmacy."},
                     status=status.HTTP_403_FORBIDDEN,
                 )
-            obj, created = Rating.objects.get_or_create(
-                rater_user=user,
-                ratee_user=worker,
-                direction=direction,
-                defaults={"stars": stars, "comment": comment},
-            )
-            if not created:
-                obj.stars = stars
-                obj.comment = comment
-                obj.save(update_fields=["stars", "comment", "updated_at"])
+            obj, created = record_rating(user, direction, worker, stars, comment)
             return Response(RatingReadSerializer(obj).data, status=201 if created else 200)
 
         elif direction == Rating.Direction.WORKER_TO_PHARMACY:
@@ -7140,16 +7048,7 @@ class RatingViewSet(viewsets.GenericViewSet):
                     {"detail": "You can only rate pharmacies where you completed an assignment."},
                     status=status.HTTP_403_FORBIDDEN,
                 )
-            obj, created = Rating.objects.get_or_create(
-                rater_user=user,
-                ratee_pharmacy=pharm,
-                direction=direction,
-                defaults={"stars": stars, "comment": comment},
-            )
-            if not created:
-                obj.stars = stars
-                obj.comment = comment
-                obj.save(update_fields=["stars", "comment", "updated_at"])
+            obj, created = record_rating(user, direction, pharm, stars, comment)
             return Response(RatingReadSerializer(obj).data, status=201 if created else 200)
 
         return Response({"detail": "Invalid direction."}, status=400)
@@ -7190,20 +7089,44 @@ class RatingViewSet(viewsets.GenericViewSet):
         if not ttype or not tid:
             return Response({"detail": "Provide target_type and target_id."}, status=400)
 
-        if ttype == "worker":
-            qs = Rating.objects.filter(direction=Rating.Direction.OWNER_TO_WORKER, ratee_user_id=tid)
-        elif ttype == "pharmacy":
-            qs = Rating.objects.filter(direction=Rating.Direction.WORKER_TO_PHARMACY, ratee_pharmacy_id=tid)
-        else:
+        if ttype not in RATING_TARGETS:
             return Response({"detail": "Invalid target_type."}, status=400)
+        try:
+            tid = int(tid)
+        except ValueError:
+            return Response({"detail": "target_id must be an integer."}, status=400)
 
-        agg = qs.aggregate(average=Avg("stars"), count=Count("id"))
-        data = {
-            "average": float(agg["average"] or 0.0),
-            "count": int(agg["count"] or 0),
-        }
+        [data] = get_rating_summaries(ttype, [tid])
         return Response(RatingSummarySerializer(data).data)
 
+    @action(detail=False, methods=["get"], url_path="summaries")
+    def summaries(self, request):
+        """
+        Aggregates for many targets in one query, in the order requested:
+          - ?target_type=worker&target_ids=1,2,3
+          - ?target_type=pharmacy&target_ids=4&target_ids=5
+        """
+        ttype = request.query_params.get("target_type")
+        raw_ids = [
+            part
+            for value in request.query_params.getlist("target_ids")
+            for part in value.split(",")
+            if part.strip()
+        ]
+        if ttype not in RATING_TARGETS or not raw_ids:
+            return Response({"detail": "Provide target_type=worker|pharmacy and target_ids."}, status=400)
+        try:
+            tids = list(dict.fromkeys(int(part) for part in raw_ids))
+        except ValueError:
+            return Response({"detail": "target_ids must be integers."}, status=400)
+        if len(tids) > MAX_SUMMARY_TARGETS:
+            return Response(
+                {"detail": f"At most {MAX_SUMMARY_TARGETS} target_ids per request."},
+                status=400,
+            )
+
+        return Response(RatingTargetSummarySerializer(get_rating_summaries(ttype, tids), many=True).data)
+
     # ---------- my rating ----------
     @action(detail=False, methods=["get"], url_path="mine")
     def mine(self, request):
@@ -7247,48 +7170,57 @@ class RatingViewSet(viewsets.GenericViewSet):
     @action(detail=False, methods=["get"], url_path="pending")
     def pending(self, request):
         """
-        Lists relationships where the current user is eligible to rate but hasn't yet.
-        - workers_to_rate: as an owner/org-admin/pharmacy-admin
-        - pharmacies_to_rate: as a worker
+        Paginated relationships the current user is eligible to rate but hasn't yet:
+          - ?target_type=worker: workers with a past assignment at a pharmacy the user
+            controls (owner/org-admin/pharmacy-admin)
+          - ?target_type=pharmacy: pharmacies where the user has a past assignment
+        Both are NOT EXISTS anti-joins, so the cost follows the page size rather
+        than the length of the assignment history.
         """
         user = request.user
-        today = timezone.localdate()
-
-        # Pharmacies the user controls
-        pharm_control = Pharmacy.objects.filter(
-            Q(owner__user=user)
-            | Q(organization__organization_memberships__user=user, organization__organization_memberships__role="ORG_ADMIN")
-            | Q(admin_assignments__user=user, admin_assignments__is_active=True)
-        ).distinct()
-
-        # Workers eligible to rate
-        worker_ids = ShiftSlotAssignment.objects.filter(
-            shift__pharmacy__in=pharm_control,
-            slot_date__lt=today,
-        ).values_list("user_id", flat=True).distinct()
-
-        already_rated_worker_ids = Rating.objects.filter(
-            direction=Rating.Direction.OWNER_TO_WORKER,
-            rater_user=user,
-        ).values_list("ratee_user_id", flat=True)
-        workers_to_rate_ids = set(worker_ids) - set(already_rated_worker_ids)
-
-        # Pharmacies eligible to rate by this worker
-        pharm_ids = ShiftSlotAssignment.objects.filter(
-            user=user,
-            slot_date__lt=today,
-        ).values_list("shift__pharmacy_id", flat=True).distinct()
+        ttype = request.query_params.get("target_type")
+        past_assignments = ShiftSlotAssignment.objects.filter(slot_date__lt=timezone.localdate())
 
-        already_rated_pharm_ids = Rating.objects.filter(
-            direction=Rating.Direction.WORKER_TO_PHARMACY,
-            rater_user=user,
-        ).values_list("ratee_pharmacy_id", flat=True)
-        pharmacies_to_rate_ids = set(pharm_ids) - set(already_rated_pharm_ids)
+        if ttype == "worker":
+            # Pharmacies the user controls, as id subqueries rather than OR-ed joins.
+            controlled_pharmacy_ids = Pharmacy.objects.filter(
+                Q(owner__user=user)
+                | Q(organization_id__in=OrganizationMembership.objects.filter(
+                    user=user, role="ORG_ADMIN"
+                ).values("organization_id"))
+                | Q(id__in=PharmacyAdmin.objects.filter(user=user, is_active=True).values("pharmacy_id"))
+            ).values("id")
+            qs = (
+                User.objects.filter(
+                    Exists(past_assignments.filter(
+                        user_id=OuterRef("pk"), shift__pharmacy_id__in=controlled_pharmacy_ids
+                    )),
+                    ~Exists(Rating.objects.filter(
+                        direction=Rating.Direction.OWNER_TO_WORKER, rater_user=user, ratee_user_id=OuterRef("pk")
+                    )),
+                )
+                .select_related(
+                    "pharmacistonboarding", "otherstaffonboarding", "exploreronboarding", "owneronboarding"
+                )
+                .order_by("first_name", "last_name", "id")
+            )
+            serializer_class = PendingWorkerRatingSerializer
+        elif ttype == "pharmacy":
+            qs = Pharmacy.objects.filter(
+                Exists(past_assignments.filter(user=user, shift__pharmacy_id=OuterRef("pk"))),
+                ~Exists(Rating.objects.filter(
+                    direction=Rating.Direction.WORKER_TO_PHARMACY, rater_user=user, ratee_pharmacy_id=OuterRef("pk")
+                )),
+            ).order_by("name", "id")
+            serializer_class = PendingPharmacyRatingSerializer
+        else:
+            return Response({"detail": "Provide target_type=worker|pharmacy."}, status=400)
 
-        return Response(PendingRatingsSerializer({
-            "workers_to_rate": list(workers_to_rate_ids),
-            "pharmacies_to_rate": list(pharmacies_to_rate_ids),
-        }).data)
+        paginator = PendingRatingsPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        return paginator.get_paginated_response(
+            serializer_class(page, many=True, context=self.get_serializer_context()).data
+        )
 
 # -----------------------------------------------------------------------------
 # Explorer 
@@ -7627,8 +7559,7 @@ class PillRewardsViewSet(viewsets.GenericViewSet):
                 shift=shift,
                 status=ShiftOffer.Status.ACCEPTED_AWAITING_PAYMENT,
             ).exists()
-            shift.payment_status = "PENDING" if has_pending_payment else "PAID"
-            shift.save(update_fields=["payment_status"])
+            shift.set_payment_status("PENDING" if has_pending_payment else "PAID")
         return Response({
             "detail": "Shift paid with pills.",
             "balance": get_pill_balance(request.user),
@@ -7741,7 +7672,9 @@ def preview_invoice_lines(request, shift_id):
     return Response(line_items)
 
 
-from django.http import HttpResponse, Http404
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, Http404, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def invoice_pdf_view(request, invoice_id):
@@ -7777,9 +7710,20 @@ def invoice_pdf_view(request, invoice_id):
     if not can_access:
         raise Http404("Invoice not found")
 
-    pdf_bytes = render_invoice_to_pdf(invoice)
-    response = HttpResponse(pdf_bytes, content_type="application/pdf")
-    response['Content-Disposition'] = f'inline; filename="invoice_{invoice.id}.pdf"'
+    # PDFs are rendered by a worker whenever the invoice changes and stored under a
+    # content hash, which doubles as the ETag.
+    fingerprint = invoice_pdf_fingerprint(invoice)
+    etag = quote_etag(fingerprint)
+    client_etags = [tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))]
+    if etag in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        # Cold cache (e.g. invoices from before PDFs were stored): render once here.
+        key = cached_invoice_pdf_key(invoice, fingerprint) or store_invoice_pdf(invoice, fingerprint)
+        response = FileResponse(default_storage.open(key, "rb"), content_type="application/pdf")
+        response['Content-Disposition'] = f'inline; filename="invoice_{invoice.id}.pdf"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
     return response
 
 
@@ -7797,44 +7741,9 @@ def send_invoice_email(request, invoice_id):
     if not to_email:
         return Response({"detail": "Missing bill_to_email on invoice."}, status=400)
 
-    # CC parsing from stored `cc_emails`
-    cc_list = []
-    if invoice.cc_emails:
-        cc_list = [e.strip() for e in invoice.cc_emails.split(",") if e.strip()]
-
-    # Render PDF into memory
-    pdf_bytes = render_invoice_to_pdf(invoice)  # you already use this in invoice_pdf_view
-    filename = f"invoice_{invoice.id}.pdf"
-    full_bill_to_name = f"{(invoice.bill_to_first_name or '').strip()} {(invoice.bill_to_last_name or '').strip()}".strip()
-
-    # Build email context (match your brand look & tone)
-    context = {
-        "invoice": invoice,
-        "client_name": (
-            (invoice.custom_bill_to_name or "").strip()
-            or full_bill_to_name
-            or (invoice.pharmacy_name_snapshot or "").strip()
-        ),
-        "issuer_name": f"{invoice.issuer_first_name} {invoice.issuer_last_name}".strip(),
-        "subtotal": str(invoice.subtotal),
-        "gst_amount": str(invoice.gst_amount),
-        "super_amount": str(invoice.super_amount),
-        "total": str(invoice.total),
-        "invoice_date": str(invoice.invoice_date),
-        "due_date": str(invoice.due_date or ""),
-    }
-
-    # Kick off async email with PDF attached (backward compatible task)
-    async_task(
-        'users.tasks.send_async_email',
-        subject=f"Invoice #{invoice.id} from ChemistTasker",
-        recipient_list=[to_email],
-        template_name="emails/invoice_sent.html",
-        context=context,
-        text_template=None,               # optional plain text template; use html for now
-        cc=cc_list,                       # NEW
-        attachments=[(filename, pdf_bytes, "application/pdf")]  # NEW
-    )
+    filename, email_kwargs = build_invoice_email(invoice)
+    # The worker looks up the current PDF when it sends, so no bytes (or stale keys) are queued.
+    async_task('client_profile.tasks.email_invoice_pdf', invoice.id, filename, **email_kwargs)
 
     # Mark as sent (see §3 below)
     invoice.status = 'sent'
@@ -0,0 +1,62 @@
+"""
+Sizing for Django's built-in psycopg 3 connection pool.
+
+Each OS process owns its own pool, so sizes are picked per process type:
+daphne/gunicorn serve many concurrent requests from one process, while each
+django-q worker process runs one task at a time.
+"""
+import os
+import sys
+
+POOL_SIZES = {
+    "web": {"min_size": 2, "max_size": 10},
+    "worker": {"min_size": 1, "max_size": 2},
+    "command": {"min_size": 1, "max_size": 4},
+}
+
+
+def detect_process_role(argv=None):
+    argv = sys.argv if argv is None else argv
+    joined = " ".join(argv)
+    if "qcluster" in argv:
+        return "worker"
+    if "daphne" in joined or "gunicorn" in joined or "runserver" in argv:
+        return "web"
+    return "command"
+
+
+def pool_options(role, *, min_size=None, max_size=None):
+    sizes = dict(POOL_SIZES.get(role, POOL_SIZES["command"]))
+    if min_size is not None:
+        sizes["min_size"] = min_size
+    if max_size is not None:
+        sizes["max_size"] = max_size
+    sizes["max_size"] = max(sizes["max_size"], sizes["min_size"])
+    return {
+        **sizes,
+        "name": f"chemisttasker-{role}-{os.getpid()}",
+        # Seconds a request waits for a free connection before failing.
+        "timeout": 10,
+        # Shrink back towards min_size after idling, and recycle long-lived connections.
+        "max_idle": 300,
+        "max_lifetime": 1800,
+    }
+
+
+def configure_pool(database, role, *, min_size=None, max_size=None):
+    """
+    Enable pooling on a Postgres DATABASES entry in place. Pooling replaces
+    persistent connections, so CONN_MAX_AGE must be 0. With a pool, Django skips
+    its own per-request health check and instead passes
+    ``check=ConnectionPool.check_connection`` to the pool when
+    CONN_HEALTH_CHECKS is on, so each connection is pinged as it leaves the pool.
+    Django always passes ``check`` itself, so it cannot go in the pool OPTIONS.
+    """
+    if not database.get("ENGINE", "").endswith("postgresql"):
+        return database
+    database["CONN_MAX_AGE"] = 0
+    database["CONN_HEALTH_CHECKS"] = True
+    database.setdefault("OPTIONS", {})["pool"] = pool_options(
+        role, min_size=min_size, max_size=max_size
+    )
+    return database
@@ -0,0 +1,105 @@
+"""
+Read-replica routing.
+
+Reads go to the ``replica`` alias only inside views that opt in with
+``ReplicaReadMixin`` / ``replica_reads`` and only for safe methods. Writes
+always go to ``default``. After a client writes, ``ReplicaPinMiddleware`` sets
+a short-lived cookie that keeps its reads on the primary so it sees its own
+changes while the replica catches up.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def _pin_cookie_name():
+    return getattr(settings, "REPLICA_PIN_COOKIE", "ct_db_pin")
+
+
+def is_pinned_to_primary(request):
+    return bool(request.COOKIES.get(_pin_cookie_name()))
+
+
+@contextmanager
+def use_replica(enabled=True):
+    token = _replica_reads.set(bool(enabled) and replica_configured())
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def _should_use_replica(request):
+    return request.method in SAFE_METHODS and not is_pinned_to_primary(request)
+
+
+def replica_reads(view_func):
+    """Decorator for function views whose safe requests may read from the replica."""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        with use_replica(_should_use_replica(request)):
+            return view_func(request, *args, **kwargs)
+    return _wrapped
+
+
+class ReplicaReadMixin:
+    """Class-based view opt-in: safe requests read from the replica."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with use_replica(_should_use_replica(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        # Inside a transaction on the primary, reads must see its uncommitted rows.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinMiddleware:
+    """Pin a client's reads to the primary for a few seconds after it writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replica_configured() and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                _pin_cookie_name(),
+                "1",
+                max_age=getattr(settings, "REPLICA_PIN_SECONDS", 5),
+                httponly=True,
+                # Same cross-site rules as the JWT cookies so the web client sends it back.
+                secure=getattr(settings, "JWT_COOKIE_SECURE", False),
+                samesite=getattr(settings, "JWT_COOKIE_SAMESITE", "Lax"),
+            )
+        return response
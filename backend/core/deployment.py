@@ -75,6 +75,7 @@ MIDDLEWARE = [
     'axes.middleware.AxesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db_router.ReplicaPinMiddleware',
 ]
 
 DATABASES = {
@@ -86,6 +87,18 @@ DATABASES = {
     )
 }
 
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        REPLICA_DATABASE_URL,
+        conn_max_age=600,
+        conn_health_checks=True,
+        ssl_require=True,
+    )
+
+if DB_POOL_ENABLED:
+    for _database in DATABASES.values():
+        configure_pool(_database, DB_PROCESS_ROLE, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE)
+
 
 TIME_ZONE = 'Australia/Sydney'
 
@@ -8,6 +8,7 @@ from datetime import timedelta
 import dj_database_url
 import sys
 import urllib.parse
+from core.db_pool import configure_pool, detect_process_role
 
 
 
@@ -175,18 +176,25 @@ _redis_options = {
     'db': int(_redis_url.path.strip('/')) if _redis_url.path and _redis_url.path != '/' else 0,
     'password': _redis_url.password,
 }
-if _redis_is_ssl:
-    _redis_options.update({
-        'ssl': True,
+
+
+def _redis_ssl_options():
+    """TLS options for redis-py clients connecting over rediss://."""
+    options = {
         'ssl_cert_reqs': {
             "none": ssl.CERT_NONE,
             "optional": ssl.CERT_OPTIONAL,
             "required": ssl.CERT_REQUIRED,
         }.get(env("REDIS_SSL_CERT_REQS", default="required").strip().lower(), ssl.CERT_REQUIRED),
-    })
+    }
     redis_ssl_ca_certs = env("REDIS_SSL_CA_CERTS", default="").strip()
     if redis_ssl_ca_certs:
-        _redis_options['ssl_ca_certs'] = redis_ssl_ca_certs
+        options['ssl_ca_certs'] = redis_ssl_ca_certs
+    return options
+
+
+if _redis_is_ssl:
+    _redis_options.update({'ssl': True, **_redis_ssl_options()})
 
 Q_CLUSTER = {
     'name': 'DjangoQ',
@@ -216,6 +224,7 @@ MIDDLEWARE = [
     'axes.middleware.AxesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db_router.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -321,6 +330,33 @@ else:
         }
     }
 
+# Optional read replica for read-heavy endpoints that opt in via
+# core.db_router.ReplicaReadMixin / replica_reads. Any dj_database_url URL
+# works, e.g. a second local Postgres database or sqlite:///replica.sqlite3.
+REPLICA_DATABASE_URL = env("REPLICA_DATABASE_URL", default="")
+if REPLICA_DATABASE_URL:
+    DATABASES["replica"] = dj_database_url.parse(
+        REPLICA_DATABASE_URL,
+        conn_max_age=600,
+        ssl_require=env.bool("REPLICA_DATABASE_SSL", default=False),
+    )
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+# Seconds a client's reads stay on the primary after it writes (read-your-writes).
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+REPLICA_PIN_COOKIE = env("REPLICA_PIN_COOKIE", default="ct_db_pin")
+
+# Django's native psycopg pool instead of persistent per-thread connections.
+# Sized per process type (web = daphne/gunicorn, worker = qcluster); see core/db_pool.py.
+DB_POOL_ENABLED = env.bool("DB_POOL_ENABLED", default=True)
+DB_PROCESS_ROLE = env("DB_PROCESS_ROLE", default=detect_process_role())
+DB_POOL_MIN_SIZE = env.int("DB_POOL_MIN_SIZE", default=None)
+DB_POOL_MAX_SIZE = env.int("DB_POOL_MAX_SIZE", default=None)
+if DB_POOL_ENABLED:
+    for _database in DATABASES.values():
+        configure_pool(_database, DB_PROCESS_ROLE, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -494,8 +530,21 @@ RECAPTCHA_SECRET_KEY = env('RECAPTCHA_SECRET_KEY')
 AZURE_OCR_ENDPOINT=env('AZURE_OCR_ENDPOINT')
 AZURE_OCR_KEY=env('AZURE_OCR_KEY')
 
+# Document OCR: pluggable backend and the PDF render size it needs.
+OCR_BACKEND = env("OCR_BACKEND", default="client_profile.ocr.AzureOcrBackend")
+OCR_PDF_DPI = env.int("OCR_PDF_DPI", default=150)
+OCR_MAX_IMAGE_SIDE = env.int("OCR_MAX_IMAGE_SIDE", default=2000)
+# Threads per onboarding verification group (OCR/ABN checks run concurrently).
+VERIFICATION_WORKERS = env.int("VERIFICATION_WORKERS", default=4)
+
 SCRAPINGBEE_API_KEY=env('SCRAPINGBEE_API_KEY')
 
+# ABN register lookups: cached per ABN, invalid/unknown ABNs for a shorter time.
+ABN_LOOKUP_URL = env("ABN_LOOKUP_URL", default="https://abr.business.gov.au/ABN/View?id={abn}")
+ABN_LOOKUP_TIMEOUT = env.int("ABN_LOOKUP_TIMEOUT", default=20)
+ABN_CACHE_TTL = env.int("ABN_CACHE_TTL", default=24 * 3600)
+ABN_NEGATIVE_CACHE_TTL = env.int("ABN_NEGATIVE_CACHE_TTL", default=3600)
+
 
 # MobileMessage SMS Settings
 MOBILEMESSAGE_USERNAME = env('MOBILEMESSAGE_USERNAME')
@@ -546,3 +595,51 @@ if not USE_REDIS_CHANNEL_LAYER:
             "BACKEND": "channels.layers.InMemoryChannelLayer",
         }
     }
+
+# ---------------------------------------------------------------------
+# Cache (shared by web and django-q workers)
+# ---------------------------------------------------------------------
+# Same defaults as the channel layer: Redis in production, per-process
+# memory when DEBUG=True.
+USE_REDIS_CACHE = env.bool("USE_REDIS_CACHE", default=not DEBUG)
+if USE_REDIS_CACHE:
+    CACHE_REDIS_URL = env("CACHE_REDIS_URL", default=REDIS_URL)
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_PREFIX": "ct",
+            # Same certificate checks as the django-q broker when the cache is on TLS.
+            "OPTIONS": _redis_ssl_options() if CACHE_REDIS_URL.startswith("rediss://") else {},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a user's permission context (memberships, admin assignments, owned
+# and org-managed pharmacies) is reused across requests; signals drop it on change.
+PERMISSION_CONTEXT_TTL = env.int("PERMISSION_CONTEXT_TTL", default=60)
+
+# Seconds a built hub context (HubContextView) is served from the cache. Signals
+# invalidate it sooner when memberships, groups or pharmacy profiles change.
+HUB_CONTEXT_CACHE_TTL = env.int("HUB_CONTEXT_CACHE_TTL", default=600)
+
+# Seconds the membership part of the login / refresh / me user payload is
+# cached; membership, role and pharmacy changes invalidate it sooner.
+AUTH_USER_PAYLOAD_TTL = env.int("AUTH_USER_PAYLOAD_TTL", default=300)
+
+# Bulk membership imports (MembershipViewSet.bulk_import): rows validated and
+# inserted per transaction, and the most rows one upload may contain.
+MEMBERSHIP_IMPORT_CHUNK_SIZE = env.int("MEMBERSHIP_IMPORT_CHUNK_SIZE", default=100)
+MEMBERSHIP_IMPORT_MAX_ROWS = env.int("MEMBERSHIP_IMPORT_MAX_ROWS", default=5000)
+
+# Shift reminders go out this many hours before an assigned slot starts; each
+# run claims and renders due reminders this many at a time, and its window
+# starts this many minutes early to overlap the previous run's.
+SHIFT_REMINDER_LEAD_HOURS = env.int("SHIFT_REMINDER_LEAD_HOURS", default=12)
+SHIFT_REMINDER_CHUNK_SIZE = env.int("SHIFT_REMINDER_CHUNK_SIZE", default=200)
+SHIFT_REMINDER_WINDOW_OVERLAP_MINUTES = env.int("SHIFT_REMINDER_WINDOW_OVERLAP_MINUTES", default=15)
@@ -8,6 +8,7 @@ from django.http import HttpResponse
 from django.views.decorators.cache import cache_page
 
 from client_profile.models import Shift
+from core.db_router import replica_reads
 
 
 def _build_urlset(urls):
@@ -73,6 +74,7 @@ def _build_static_urls(base_url):
 
 
 @cache_page(60 * 60)
+@replica_reads
 def sitemap_web(request):
     base_url = getattr(settings, "FRONTEND_BASE_URL", "")
     urls = _build_static_urls(base_url)
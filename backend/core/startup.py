@@ -0,0 +1,99 @@
+"""
+Import-time budget for process start-up.
+
+Every daphne/gunicorn worker and every django-q worker spawn pays for what
+``django.setup()`` and URLconf loading import. Heavy optional SDKs (PDF
+rendering, payments, OCR, scraping) are imported lazily inside the functions
+that use them; ``measure_boot_imports`` runs a fresh interpreter under
+``python -X importtime`` so tests and the ``startup_report`` command can check
+that they stay out of the boot path.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+BOOT_SNIPPET = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+# Top-level packages that must only be imported on first use.
+HEAVY_MODULES = (
+    "weasyprint",
+    "stripe",
+    "twilio",
+    "azure.ai",
+    "azure.storage",
+    "fitz",
+    "bs4",
+    "scrapingbee",
+)
+
+DEFAULT_BUDGET_MS = 3000
+
+
+def import_budget_ms():
+    return int(os.getenv("STARTUP_IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS))
+
+
+def parse_importtime(output):
+    """
+    Parse ``-X importtime`` stderr into ``(module, self_us, cumulative_us, depth)``
+    tuples in import order. Depth 0 means imported directly by the snippet.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        rows.append((stripped.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+class BootImportReport:
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def modules(self):
+        return {name for name, *_ in self.rows}
+
+    @property
+    def total_ms(self):
+        return sum(row[1] for row in self.rows) / 1000
+
+    def heavy_modules_loaded(self):
+        return sorted(
+            heavy for heavy in HEAVY_MODULES
+            if any(name == heavy or name.startswith(f"{heavy}.") for name in self.modules)
+        )
+
+    def slowest(self, limit=15):
+        """Largest cumulative import times for each top-level package."""
+        packages = {}
+        for name, _self_us, cumulative_us, _depth in self.rows:
+            if "." not in name:
+                packages[name] = max(packages.get(name, 0), cumulative_us)
+        return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def measure_boot_imports(settings_module=None):
+    env = dict(os.environ)
+    if settings_module:
+        env["DJANGO_SETTINGS_MODULE"] = settings_module
+    env.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", BOOT_SNIPPET],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Boot import measurement failed:\n{result.stderr[-2000:]}")
+    return BootImportReport(parse_importtime(result.stderr))
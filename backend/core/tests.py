@@ -0,0 +1,109 @@
+import copy
+import os
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from client_profile.models import Shift
+from core.db_pool import configure_pool, detect_process_role
+from core.db_router import (
+    ReplicaPinMiddleware,
+    ReplicaRouter,
+    replica_reads,
+    use_replica,
+)
+from core.startup import import_budget_ms, measure_boot_imports
+
+
+@mock.patch("core.db_router.replica_configured", return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_stay_on_primary_without_opt_in(self, _configured):
+        self.assertIsNone(self.router.db_for_read(Shift))
+
+    def test_opted_in_reads_use_replica_and_writes_use_primary(self, _configured):
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Shift), "replica")
+            self.assertEqual(self.router.db_for_write(Shift), "default")
+
+    def test_decorator_only_routes_safe_unpinned_requests(self, _configured):
+        seen = []
+
+        @replica_reads
+        def view(request):
+            seen.append(self.router.db_for_read(Shift))
+            return HttpResponse()
+
+        view(self.factory.get("/"))
+        view(self.factory.post("/"))
+        pinned = self.factory.get("/")
+        pinned.COOKIES["ct_db_pin"] = "1"
+        view(pinned)
+
+        self.assertEqual(seen, ["replica", None, None])
+
+    def test_write_pins_client_to_primary(self, _configured):
+        middleware = ReplicaPinMiddleware(lambda request: HttpResponse())
+
+        write_response = middleware(self.factory.post("/"))
+        read_response = middleware(self.factory.get("/"))
+
+        self.assertIn("ct_db_pin", write_response.cookies)
+        self.assertNotIn("ct_db_pin", read_response.cookies)
+
+    def test_only_primary_is_migrated(self, _configured):
+        self.assertTrue(self.router.allow_migrate("default", "client_profile"))
+        self.assertFalse(self.router.allow_migrate("replica", "client_profile"))
+
+
+class DatabasePoolConfigTests(SimpleTestCase):
+    def test_process_role_detection(self):
+        self.assertEqual(detect_process_role(["manage.py", "qcluster"]), "worker")
+        self.assertEqual(detect_process_role(["/venv/bin/daphne", "core.asgi:application"]), "web")
+        self.assertEqual(detect_process_role(["manage.py", "migrate"]), "command")
+
+    def test_pool_replaces_persistent_connections_for_postgres_only(self):
+        postgres = configure_pool(
+            {"ENGINE": "django.db.backends.postgresql", "CONN_MAX_AGE": 600},
+            "worker",
+            max_size=3,
+        )
+        sqlite = configure_pool({"ENGINE": "django.db.backends.sqlite3", "CONN_MAX_AGE": 600}, "web")
+
+        self.assertEqual(postgres["CONN_MAX_AGE"], 0)
+        self.assertTrue(postgres["CONN_HEALTH_CHECKS"])
+        self.assertEqual(postgres["OPTIONS"]["pool"]["max_size"], 3)
+        self.assertNotIn("OPTIONS", sqlite)
+
+    @skipUnless(connection.vendor == "postgresql", "Pooling is PostgreSQL-only.")
+    def test_pool_checks_connections_before_handing_them_out(self):
+        from django.db.backends.postgresql.base import DatabaseWrapper
+        from psycopg_pool import ConnectionPool
+
+        settings_dict = configure_pool(copy.deepcopy(connection.settings_dict), "web")
+        wrapper = DatabaseWrapper(settings_dict, alias="pool-check-test")
+        try:
+            self.assertIs(wrapper.pool._check, ConnectionPool.check_connection)
+        finally:
+            wrapper.close_pool()
+
+
+class StartupImportBudgetTests(SimpleTestCase):
+    def test_boot_skips_heavy_modules(self):
+        self.assertEqual(measure_boot_imports().heavy_modules_loaded(), [])
+
+    # Wall-clock timing depends on the machine; CI opts in by setting the budget.
+    @skipUnless(os.getenv("STARTUP_IMPORT_BUDGET_MS"), "STARTUP_IMPORT_BUDGET_MS is not set")
+    def test_boot_stays_within_import_budget(self):
+        report = measure_boot_imports()
+
+        self.assertLessEqual(
+            report.total_ms,
+            import_budget_ms(),
+            f"Slowest boot imports: {report.slowest(5)}",
+        )
@@ -0,0 +1,100 @@
+"""
+The ``user`` payload returned by login, token refresh and ``/me``.
+
+Its membership part (organisation roles with their pharmacies, pharmacy
+memberships, owned pharmacies, admin assignments) is built in a fixed number
+of queries and cached per user for ``AUTH_USER_PAYLOAD_TTL`` seconds, keyed to
+the version stamps in ``client_profile.cache_versions`` so membership, role and
+pharmacy/organisation name changes invalidate it. Fields read straight off the
+user and the date-dependent billing flags are added per request.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+from client_profile.admin_helpers import admin_assignments_for
+from client_profile.cache_versions import current_versions, dependency_keys, is_current, user_version_key
+from client_profile.models import Membership, Pharmacy
+
+from .models import OrganizationMembership
+from .serializers import serialize_org_memberships
+
+CACHE_PREFIX = "auth-user-payload:v1:"
+
+
+def build_membership_payload(user):
+    """Memberships and admin assignments, plus the pharmacy/org ids they name."""
+    org_payload = serialize_org_memberships(OrganizationMembership.objects.filter(user=user))
+
+    pharmacy_map = {
+        pm.pharmacy_id: {
+            "pharmacy_id": pm.pharmacy_id,
+            "pharmacy_name": pm.pharmacy.name if pm.pharmacy else None,
+            "role": pm.role,
+        }
+        for pm in Membership.objects.filter(user=user, is_active=True).select_related("pharmacy")
+    }
+    for pharmacy_id, name in Pharmacy.objects.filter(owner__user=user).values_list("id", "name"):
+        pharmacy_map[pharmacy_id] = {"pharmacy_id": pharmacy_id, "pharmacy_name": name, "role": "OWNER"}
+
+    admin_payload = [
+        {
+            "id": assignment.id,
+            "pharmacy_id": assignment.pharmacy_id,
+            "pharmacy_name": assignment.pharmacy.name if assignment.pharmacy else None,
+            "admin_level": assignment.admin_level,
+            "capabilities": sorted(list(assignment.capabilities)),
+            "staff_role": assignment.staff_role,
+            "job_title": assignment.job_title,
+            "is_active": assignment.is_active,
+        }
+        for assignment in admin_assignments_for(user).select_related("pharmacy")
+    ]
+
+    pharmacy_ids = set(pharmacy_map) | {entry["pharmacy_id"] for entry in admin_payload}
+    for entry in org_payload:
+        pharmacy_ids.update(pharmacy["id"] for pharmacy in entry["pharmacies"])
+    organization_ids = {entry["organization_id"] for entry in org_payload}
+
+    payload = {
+        "memberships": org_payload + list(pharmacy_map.values()),
+        "admin_assignments": admin_payload,
+        "is_pharmacy_admin": bool(admin_payload),
+    }
+    return payload, pharmacy_ids, organization_ids
+
+
+def cached_membership_payload(user):
+    key = f"{CACHE_PREFIX}{user.pk}"
+    entry = cache.get(key)
+    if entry is not None and is_current(entry["versions"]):
+        return entry["payload"]
+    # Read the user's version first so a change made mid-build isn't cached as current.
+    versions = current_versions([user_version_key(user.pk)])
+    payload, pharmacy_ids, organization_ids = build_membership_payload(user)
+    versions.update(current_versions(dependency_keys(pharmacy_ids, organization_ids)))
+    cache.set(key, {"versions": versions, "payload": payload}, settings.AUTH_USER_PAYLOAD_TTL)
+    return payload
+
+
+def authenticated_user_payload(user):
+    from billing.utils import is_billing_active, is_in_free_trial
+
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "role": user.role,
+        **cached_membership_payload(user),
+        "is_mobile_verified": bool(getattr(user, "is_mobile_verified", False)),
+        "billing_active": is_billing_active(),
+        "in_free_trial": is_in_free_trial(user),
+    }
+
+
+def payload_etag(payload):
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return quote_etag(digest[:32])
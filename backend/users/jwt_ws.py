@@ -1,6 +1,5 @@
 from urllib.parse import parse_qs
 from django.contrib.auth.models import AnonymousUser
-from django.db import close_old_connections
 from django.conf import settings
 from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
@@ -40,7 +39,6 @@ class JWTAuthMiddleware:
         token = self._get_token_from_scope(scope, query)
         if token:
             try:
-                close_old_connections()
                 validated = await sync_to_async(self.jwt_auth.get_validated_token, thread_sensitive=True)(token)
                 user = await database_sync_to_async(self.jwt_auth.get_user)(validated)
                 scope["user"] = user
@@ -51,7 +49,6 @@ class JWTAuthMiddleware:
 
     @database_sync_to_async
     def _get_user_from_ticket(self, ticket_str):
-        close_old_connections()
         try:
             ticket_obj = WebSocketTicket.objects.select_related('user').get(ticket=ticket_str)
             user = ticket_obj.user
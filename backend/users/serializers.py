@@ -14,7 +14,6 @@ from .models import OrganizationMembership, ContactMessage
 import secrets
 from django.utils import timezone
 from client_profile.models import Pharmacy, Membership as PharmacyMembership, Shift
-from client_profile.admin_helpers import admin_assignments_for
 from .org_roles import (
     ADMIN_LEVEL_DEFINITIONS,
     ROLE_DEFINITIONS,
@@ -306,70 +305,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             from rest_framework.exceptions import AuthenticationFailed
             raise AuthenticationFailed("Please verify your email address (check your inbox for your OTP code).")
 
-        # 1) Organization memberships
-        org_memberships = OrganizationMembership.objects.filter(user=self.user)
-        org_payload = serialize_org_memberships(org_memberships)
-
-        # 2) Pharmacy memberships
-        pharm_memberships = PharmacyMembership.objects.filter(
-            user=self.user,
-            is_active=True,
-        ).select_related('pharmacy')
-
-        pharm_payload = [
-            {
-                'pharmacy_id':   pm.pharmacy_id,
-                'pharmacy_name': pm.pharmacy.name if pm.pharmacy else None,
-                'role':          pm.role,
-            }
-            for pm in pharm_memberships
-        ]
-
-        owned_pharmacies = Pharmacy.objects.filter(owner__user=self.user)
-        owned_payload = [
-            {
-                'pharmacy_id':   pharmacy.id,
-                'pharmacy_name': pharmacy.name,
-                'role':          'OWNER',
-            }
-            for pharmacy in owned_pharmacies
-        ]
-
-        pharmacy_map = {entry['pharmacy_id']: entry for entry in pharm_payload}
-        for entry in owned_payload:
-            pharmacy_map[entry['pharmacy_id']] = entry
-
-        combined_pharm_payload = list(pharmacy_map.values())
-
-        admin_assignments = admin_assignments_for(self.user).select_related("pharmacy")
-        admin_payload = [
-            {
-                'id': assignment.id,
-                'pharmacy_id': assignment.pharmacy_id,
-                'pharmacy_name': assignment.pharmacy.name if assignment.pharmacy else None,
-                'admin_level': assignment.admin_level,
-                'capabilities': sorted(list(assignment.capabilities)),
-                'staff_role': assignment.staff_role,
-                'job_title': assignment.job_title,
-                'is_active': assignment.is_active,
-            }
-            for assignment in admin_assignments
-        ]
-
-        # 3) Combined user payload (+ is_mobile_verified added)
-        from billing.utils import is_billing_active, is_in_free_trial
-        data['user'] = {
-            'id':       self.user.id,
-            'username': self.user.username,
-            'email':    self.user.email,
-            'role':     self.user.role,
-            'memberships': org_payload + combined_pharm_payload,
-            'admin_assignments': admin_payload,
-            'is_pharmacy_admin': bool(admin_payload),
-            'is_mobile_verified': bool(getattr(self.user, 'is_mobile_verified', False)),
-            'billing_active': is_billing_active(),
-            'in_free_trial': is_in_free_trial(self.user),
-        }
+        from .auth_payload import authenticated_user_payload
+        data['user'] = authenticated_user_payload(self.user)
         return data
 
 class CustomTokenRefreshSerializer(TokenRefreshSerializer):
@@ -386,67 +323,8 @@ class CustomTokenRefreshSerializer(TokenRefreshSerializer):
         data = super().validate(attrs)
 
         try:
-            org_memberships = OrganizationMembership.objects.filter(user=user)
-            org_payload = serialize_org_memberships(org_memberships)
-
-            pharm_memberships = PharmacyMembership.objects.filter(
-                user=user,
-                is_active=True,
-            ).select_related('pharmacy')
-
-            pharm_payload = [
-                {
-                    'pharmacy_id':   pm.pharmacy_id,
-                    'pharmacy_name': pm.pharmacy.name if pm.pharmacy else None,
-                    'role':          pm.role,
-                }
-                for pm in pharm_memberships
-            ]
-
-            owned_pharmacies = Pharmacy.objects.filter(owner__user=user)
-            owned_payload = [
-                {
-                    'pharmacy_id':   pharmacy.id,
-                    'pharmacy_name': pharmacy.name,
-                    'role':          'OWNER',
-                }
-                for pharmacy in owned_pharmacies
-            ]
-
-            pharmacy_map = {entry['pharmacy_id']: entry for entry in pharm_payload}
-            for entry in owned_payload:
-                pharmacy_map[entry['pharmacy_id']] = entry
-
-            combined_pharm_payload = list(pharmacy_map.values())
-
-            admin_assignments = admin_assignments_for(user).select_related("pharmacy")
-            admin_payload = [
-                {
-                    'id': assignment.id,
-                    'pharmacy_id': assignment.pharmacy_id,
-                    'pharmacy_name': assignment.pharmacy.name if assignment.pharmacy else None,
-                    'admin_level': assignment.admin_level,
-                    'capabilities': sorted(list(assignment.capabilities)),
-                    'staff_role': assignment.staff_role,
-                    'job_title': assignment.job_title,
-                    'is_active': assignment.is_active,
-                }
-                for assignment in admin_assignments
-            ]
-
-            from billing.utils import is_billing_active, is_in_free_trial
-            data['user'] = {
-                'id':       user.id,
-                'username': user.username,
-                'email':    user.email,
-                'role':     user.role,
-                'memberships': org_payload + combined_pharm_payload,
-                'admin_assignments': admin_payload,
-                'is_pharmacy_admin': bool(admin_payload),
-                'is_mobile_verified': bool(getattr(user, 'is_mobile_verified', False)),
-                'billing_active': is_billing_active(),
-                'in_free_trial': is_in_free_trial(user),
-            }
+            from .auth_payload import authenticated_user_payload
+            data['user'] = authenticated_user_payload(user)
         except Exception:
             # Keep refresh successful even if ancillary user payload construction fails.
             pass
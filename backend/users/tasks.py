@@ -2,6 +2,8 @@ from django.conf import settings
 import traceback
 import logging
 from email.mime.image import MIMEImage
+from smtplib import SMTPServerDisconnected
+from functools import lru_cache
 logger = logging.getLogger(__name__)
 
 from django.contrib.auth import get_user_model
@@ -9,6 +11,134 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+EMAIL_BATCH_SIZE = 50
+EMAIL_BATCH_FUNC = "users.tasks.send_email_batch"
+LOGO_CONTENT_ID = "<chemisttasker-logo-banner>"
+
+
+@lru_cache(maxsize=1)
+def _logo_mime_part():
+    """
+    The inline logo, read and base64-encoded once per worker process and shared
+    by every message it sends. ``None`` when the file is missing.
+    """
+    logo_filename = "clipsnap-edit-6-1-2026.png"
+    logo_path = settings.BASE_DIR / "templates" / "emails" / logo_filename
+    if not logo_path.exists():
+        logo_filename = "logo.png"
+        logo_path = settings.BASE_DIR / "templates" / "emails" / logo_filename
+    if not logo_path.exists():
+        logger.warning("Email logo file not found: %s", logo_path)
+        return None
+    with logo_path.open("rb") as logo_file:
+        logo = MIMEImage(logo_file.read())
+    logo.add_header("Content-ID", LOGO_CONTENT_ID)
+    logo.add_header("Content-Disposition", "inline", filename=logo_filename)
+    return logo
+
+
+def _redact_sensitive_values(data):
+    if isinstance(data, dict):
+        redacted = {}
+        for key, value in data.items():
+            if isinstance(key, str) and any(token in key.lower() for token in ["otp", "code", "token", "password"]):
+                redacted[key] = "[REDACTED]"
+            else:
+                redacted[key] = _redact_sensitive_values(value)
+        return redacted
+    if isinstance(data, list):
+        return [_redact_sensitive_values(item) for item in data]
+    return data
+
+
+def _clean_recipients(recipient_list):
+    # Defensive clean for email addresses
+    return [e.strip().replace('\u200f','').replace('\u200e','') for e in recipient_list]
+
+
+def build_email_message(subject,
+                        recipient_list,
+                        template_name,
+                        context,
+                        from_email=None,
+                        text_template=None,
+                        cc=None,
+                        attachments=None,
+                        storage_attachments=None,
+                        connection=None,
+                        ):
+    """
+    Render one templated email with the inline logo and any attachments.
+    Templates come from Django's cached loader, so each is compiled once per
+    process.
+    """
+    from django.core.mail import EmailMultiAlternatives
+    from django.template.loader import get_template
+
+    html_content = get_template(template_name).render(context)
+    text_content = get_template(text_template).render(context) if text_template else html_content
+
+    msg = EmailMultiAlternatives(
+        subject=subject,
+        body=text_content,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=_clean_recipients(recipient_list),
+        cc=[e.strip() for e in (cc or []) if e and e.strip()],
+        connection=connection,
+    )
+    msg.mixed_subtype = "related"
+
+    logo = _logo_mime_part()
+    if logo is not None:
+        msg.attach(logo)
+
+    # Attachments (e.g., PDF)
+    if attachments:
+        for (fname, content, mimetype) in attachments:
+            if content:
+                msg.attach(fname, content, mimetype)
+    # Files already in default storage are passed by key so the task payload stays small.
+    if storage_attachments:
+        from django.core.files.storage import default_storage
+        for (fname, key, mimetype) in storage_attachments:
+            with default_storage.open(key, "rb") as stored:
+                msg.attach(fname, stored.read(), mimetype)
+
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def _dispatch_notification(subject, notification_payload, recipients):
+    if not notification_payload:
+        return
+    if not isinstance(notification_payload, dict):
+        logger.warning("notification payload must be a dict, got %s", type(notification_payload))
+        return
+    try:
+        from client_profile.notifications import notify_users
+        user_ids = notification_payload.get("user_ids") or []
+        user_emails = notification_payload.get("user_emails")
+        if not user_ids:
+            lookup_emails = user_emails or recipients
+            if lookup_emails:
+                qs = User.objects.filter(email__in=lookup_emails).values_list("id", flat=True)
+                user_ids = list(qs)
+        user_ids = [uid for uid in {uid for uid in user_ids if uid}]
+        if not user_ids:
+            logger.info("No platform user ids resolved for notification payload; skipping in-app notification.")
+            return
+        notify_users(
+            user_ids,
+            title=notification_payload.get("title") or subject,
+            body=notification_payload.get("body") or "",
+            notification_type=notification_payload.get("type") or "task",
+            action_url=notification_payload.get("action_url"),
+            payload=notification_payload.get("payload") or {},
+        )
+    except Exception:
+        logger.exception("Failed to dispatch in-app notification for email.")
+
+
 def send_async_email(subject, 
                      recipient_list, 
                      template_name, 
@@ -17,109 +147,69 @@ def send_async_email(subject,
                      text_template=None,     
                      cc=None,                    
                      attachments=None,
-                     notification=None
+                     notification=None,
+                     storage_attachments=None,
+                     connection=None,
                      ):
-    from django.core.mail import EmailMultiAlternatives
-    from django.template.loader import render_to_string
-
-    logger = logging.getLogger("users.tasks")
     logger.info("=== EMAIL TASK ENTRY ===")
     logger.info("Subject: %s", subject)
     logger.info("Recipient List: %s", recipient_list)
     logger.info("Template Name: %s", template_name)
     logger.info("Text Template: %s", text_template)
-
-
-    def _redact_sensitive_values(data):
-        if isinstance(data, dict):
-            redacted = {}
-            for key, value in data.items():
-                if isinstance(key, str) and any(token in key.lower() for token in ["otp", "code", "token", "password"]):
-                    redacted[key] = "[REDACTED]"
-                else:
-                    redacted[key] = _redact_sensitive_values(value)
-            return redacted
-        if isinstance(data, list):
-            return [_redact_sensitive_values(item) for item in data]
-        return data
-
     logger.debug("Context: %s", _redact_sensitive_values(context))
 
-    from_email = from_email or settings.DEFAULT_FROM_EMAIL
-
-    def _dispatch_notification(notification_payload, recipients):
-        if not notification_payload:
-            return
-        if not isinstance(notification_payload, dict):
-            logger.warning("notification payload must be a dict, got %s", type(notification_payload))
-            return
-        try:
-            from client_profile.notifications import notify_users
-            user_ids = notification_payload.get("user_ids") or []
-            user_emails = notification_payload.get("user_emails")
-            if not user_ids:
-                lookup_emails = user_emails or recipients
-                if lookup_emails:
-                    qs = User.objects.filter(email__in=lookup_emails).values_list("id", flat=True)
-                    user_ids = list(qs)
-            user_ids = [uid for uid in {uid for uid in user_ids if uid}]
-            if not user_ids:
-                logger.info("No platform user ids resolved for notification payload; skipping in-app notification.")
-                return
-            notify_users(
-                user_ids,
-                title=notification_payload.get("title") or subject,
-                body=notification_payload.get("body") or "",
-                notification_type=notification_payload.get("type") or "task",
-                action_url=notification_payload.get("action_url"),
-                payload=notification_payload.get("payload") or {},
-            )
-        except Exception:
-            logger.exception("Failed to dispatch in-app notification for email.")
-
-    # Defensive clean for email addresses
-    safe_recipient_list = [e.strip().replace('\u200f','').replace('\u200e','') for e in recipient_list]
-    logger.info("Safe Recipient List: %s", safe_recipient_list)
-
     try:
-        html_content = render_to_string(template_name, context)
-        text_content = render_to_string(text_template, context) if text_template else html_content
-
-        msg = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=from_email,
-            to=safe_recipient_list,
-            cc=[e.strip() for e in (cc or []) if e and e.strip()],
+        msg = build_email_message(
+            subject, recipient_list, template_name, context,
+            from_email=from_email, text_template=text_template, cc=cc,
+            attachments=attachments, storage_attachments=storage_attachments,
+            connection=connection,
         )
-        msg.mixed_subtype = "related"
-
-        logo_filename = "clipsnap-edit-6-1-2026.png"
-        logo_path = settings.BASE_DIR / "templates" / "emails" / logo_filename
-        if not logo_path.exists():
-            logo_filename = "logo.png"
-            logo_path = settings.BASE_DIR / "templates" / "emails" / logo_filename
-        if logo_path.exists():
-            with logo_path.open("rb") as logo_file:
-                logo = MIMEImage(logo_file.read())
-            logo.add_header("Content-ID", "<chemisttasker-logo-banner>")
-            logo.add_header("Content-Disposition", "inline", filename=logo_filename)
-            msg.attach(logo)
-        else:
-            logger.warning("Email logo file not found: %s", logo_path)
-
-        # Attachments (e.g., PDF)
-        if attachments:
-            for (fname, content, mimetype) in attachments:
-                if content:
-                    msg.attach(fname, content, mimetype)
-
-        msg.attach_alternative(html_content, "text/html")
         if notification:
-            _dispatch_notification(notification, safe_recipient_list)
-        msg.send()
+            _dispatch_notification(subject, notification, msg.to)
+        try:
+            msg.send()
+        except SMTPServerDisconnected:
+            if connection is None:
+                raise
+            # A connection shared across a batch went stale: reconnect it for
+            # this and the following messages, and retry this one once.
+            logger.warning("SMTP server disconnected; reconnecting to resend.")
+            connection.close()
+            connection.open()
+            msg.send()
 
         logger.info("Email sent successfully.")
+        return True
     except Exception as e:
         logger.error("Failed to send email: %s", str(e))
         traceback.print_exc()
+        return False
+
+
+def send_email_batch(messages):
+    """
+    Send many emails over one mail-backend connection. Each item holds the
+    keyword arguments of ``send_async_email``; a failing message is logged
+    and skipped without aborting the rest, and a dropped connection is
+    reopened by ``send_async_email``. Returns the number sent.
+    """
+    from django.core.mail import get_connection
+
+    sent = 0
+    with get_connection() as connection:
+        for message in messages:
+            if send_async_email(connection=connection, **message):
+                sent += 1
+    logger.info("Email batch: sent %s of %s.", sent, len(messages))
+    return sent
+
+
+def enqueue_email_batch(messages, batch_size=EMAIL_BATCH_SIZE):
+    """Queue ``messages`` as ``send_email_batch`` tasks of up to ``batch_size`` each."""
+    from django_q.tasks import async_task
+
+    messages = list(messages)
+    for start in range(0, len(messages), batch_size):
+        async_task(EMAIL_BATCH_FUNC, messages[start:start + batch_size])
+    return len(messages)
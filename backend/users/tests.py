@@ -1,5 +1,8 @@
+from smtplib import SMTPServerDisconnected
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
+from django.core.mail.backends import locmem
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils.encoding import force_bytes
@@ -39,3 +42,138 @@ class PasswordResetConfirmTests(TestCase):
         self.assertFalse(AccessAttempt.objects.filter(username__iexact=user.email).exists())
         user.refresh_from_db()
         self.assertTrue(user.check_password("NewPassword123!"))
+
+
+class DroppingEmailBackend(locmem.EmailBackend):
+    """Locmem backend whose first connection is dropped by the server after two messages."""
+    opens = 0
+
+    def open(self):
+        DroppingEmailBackend.opens += 1
+        self.sent_on_connection = 0
+        self.alive = True
+        return True
+
+    def close(self):
+        self.alive = False
+
+    def send_messages(self, messages):
+        if not self.alive or (DroppingEmailBackend.opens == 1 and self.sent_on_connection == 2):
+            self.alive = False
+            raise SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent_on_connection += len(messages)
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class EmailBatchTests(TestCase):
+    def _message(self, index):
+        return {
+            "subject": f"Code {index}",
+            "recipient_list": [f"user{index}@example.com"],
+            "template_name": "emails/otp_email.html",
+            "context": {"otp": "123456", "user_name": f"User {index}"},
+            "text_template": "emails/otp_email.txt",
+        }
+
+    def test_batch_sends_every_message_over_one_connection(self):
+        from unittest import mock
+        from django.core import mail
+        from users import tasks
+
+        tasks._logo_mime_part.cache_clear()
+        with mock.patch("django.core.mail.get_connection", wraps=mail.get_connection) as get_connection:
+            sent = tasks.send_email_batch([self._message(i) for i in range(5)])
+
+        self.assertEqual(sent, 5)
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual([m.to for m in mail.outbox], [[f"user{i}@example.com"] for i in range(5)])
+        # The logo is read from disk once and shared by the whole batch.
+        self.assertEqual(tasks._logo_mime_part.cache_info().misses, 1)
+
+    def test_failing_message_does_not_abort_the_batch(self):
+        from django.core import mail
+        from users import tasks
+
+        broken = dict(self._message(1), template_name="emails/does_not_exist.html")
+        sent = tasks.send_email_batch([self._message(0), broken, self._message(2)])
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_BACKEND="users.tests.DroppingEmailBackend")
+    def test_batch_reconnects_after_the_server_drops_the_connection(self):
+        from django.core import mail
+        from users import tasks
+
+        DroppingEmailBackend.opens = 0
+        sent = tasks.send_email_batch([self._message(i) for i in range(5)])
+
+        self.assertEqual(sent, 5)
+        self.assertEqual(DroppingEmailBackend.opens, 2)
+        self.assertEqual([m.to for m in mail.outbox], [[f"user{i}@example.com"] for i in range(5)])
+
+    def test_enqueue_splits_messages_into_batch_tasks(self):
+        from unittest import mock
+        from users import tasks
+
+        with mock.patch("django_q.tasks.async_task") as async_task:
+            queued = tasks.enqueue_email_batch([self._message(i) for i in range(7)], batch_size=3)
+
+        self.assertEqual(queued, 7)
+        self.assertEqual([len(c.args[1]) for c in async_task.call_args_list], [3, 3, 1])
+        self.assertTrue(all(c.args[0] == tasks.EMAIL_BATCH_FUNC for c in async_task.call_args_list))
+
+
+class CurrentUserPayloadTests(TestCase):
+    url = "/api/users/me/"
+
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from client_profile.models import Membership, Organization, Pharmacy
+        from users.models import OrganizationMembership
+
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="me@example.com", password="password", role="PHARMACIST"
+        )
+        organizations = [Organization.objects.create(name=f"Org {n}") for n in range(2)]
+        self.pharmacies = [
+            Pharmacy.objects.create(name=f"Me Pharmacy {n}", organization=organizations[n % 2]) for n in range(4)
+        ]
+        for organization in organizations:
+            org_membership = OrganizationMembership.objects.create(
+                user=self.user, organization=organization, role="REGION_ADMIN"
+            )
+            org_membership.pharmacies.set([p for p in self.pharmacies if p.organization_id == organization.id])
+        for pharmacy in self.pharmacies:
+            Membership.objects.create(user=self.user, pharmacy=pharmacy)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_payload_is_built_in_fixed_queries_then_cached_with_etag(self):
+        from client_profile.models import PharmacyAdmin
+
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        memberships = response.json()["memberships"]
+        self.assertEqual(len(memberships), 6)
+        self.assertEqual([len(m["pharmacies"]) for m in memberships[:2]], [2, 2])
+
+        with self.assertNumQueries(0):
+            unchanged = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged["ETag"], response["ETag"])
+
+        PharmacyAdmin.objects.create(user=self.user, pharmacy=self.pharmacies[0])
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+        self.assertTrue(changed.json()["is_pharmacy_admin"])
+
+        self.pharmacies[1].name = "Renamed Me Pharmacy"
+        self.pharmacies[1].save()
+        names = {m.get("pharmacy_name") for m in self.client.get(self.url).json()["memberships"]}
+        self.assertIn("Renamed Me Pharmacy", names)
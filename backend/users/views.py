@@ -5,12 +5,14 @@ from django.contrib.auth.hashers import make_password, check_password, identify_
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import viewsets, permissions, filters, generics, status, mixins
 from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.http import parse_etags, urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.utils.crypto import get_random_string
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.throttling import ScopedRateThrottle
+from django.http import HttpResponseNotModified
+from .auth_payload import authenticated_user_payload, payload_etag
 from .models import OrganizationMembership, ContactMessage
 from client_profile.admin_helpers import admin_assignments_for
 from client_profile.models import Membership, Pharmacy
@@ -46,8 +48,6 @@ from .serializers import (
     OrganizationMembershipDetailSerializer,
 )
 User = get_user_model()
-import requests
-from requests.auth import HTTPBasicAuth
 from django.db.models import Q
 
 OTP_MAX_FAILED_ATTEMPTS = 5
@@ -241,77 +241,8 @@ def _clear_auth_cookies(response):
     response.delete_cookie(getattr(settings, "JWT_REFRESH_COOKIE", "ct_refresh"), path=cookie_kwargs["path"])
 
 
-def _build_authenticated_user_payload(user):
-    org_memberships = OrganizationMembership.objects.filter(user=user)
-    org_payload = [
-        {
-            "organization_id": membership.organization_id,
-            "organization_name": membership.organization.name,
-            "role": membership.role,
-            "region": membership.region,
-            "pharmacies": [{"id": p.id, "name": p.name} for p in membership.pharmacies.all()],
-            "capabilities": sorted(list(membership_capabilities(membership))),
-        }
-        for membership in org_memberships
-    ]
-
-    pharm_memberships = Membership.objects.filter(
-        user=user,
-        is_active=True,
-    ).select_related("pharmacy")
-    pharm_payload = [
-        {
-            "pharmacy_id": pm.pharmacy_id,
-            "pharmacy_name": pm.pharmacy.name if pm.pharmacy else None,
-            "role": pm.role,
-        }
-        for pm in pharm_memberships
-    ]
-    owned_pharmacies = Pharmacy.objects.filter(owner__user=user)
-    for pharmacy in owned_pharmacies:
-        pharm_payload.append(
-            {
-                "pharmacy_id": pharmacy.id,
-                "pharmacy_name": pharmacy.name,
-                "role": "OWNER",
-            }
-        )
-    deduped_pharmacy_memberships = list(
-        {entry["pharmacy_id"]: entry for entry in pharm_payload}.values()
-    )
-
-    admin_assignments = admin_assignments_for(user).select_related("pharmacy")
-    admin_payload = [
-        {
-            "id": assignment.id,
-            "pharmacy_id": assignment.pharmacy_id,
-            "pharmacy_name": assignment.pharmacy.name if assignment.pharmacy else None,
-            "admin_level": assignment.admin_level,
-            "capabilities": sorted(list(assignment.capabilities)),
-            "staff_role": assignment.staff_role,
-            "job_title": assignment.job_title,
-            "is_active": assignment.is_active,
-        }
-        for assignment in admin_assignments
-    ]
-
-    from billing.utils import is_billing_active, is_in_free_trial
-
-    return {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "role": user.role,
-        "memberships": org_payload + deduped_pharmacy_memberships,
-        "admin_assignments": admin_payload,
-        "is_pharmacy_admin": bool(admin_payload),
-        "is_mobile_verified": bool(getattr(user, "is_mobile_verified", False)),
-        "billing_active": is_billing_active(),
-        "in_free_trial": is_in_free_trial(user),
-    }
-
-
 def verify_recaptcha(token):
+    import requests
     from django.conf import settings
     secret_key = settings.RECAPTCHA_SECRET_KEY
     url = 'https://www.google.com/recaptcha/api/siteverify'
@@ -596,9 +527,6 @@ from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
 
-import requests
-from requests.auth import HTTPBasicAuth
-
 from rest_framework import status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -704,6 +632,9 @@ class RequestMobileOTPView(APIView):
             ]
         }
 
+        import requests
+        from requests.auth import HTTPBasicAuth
+
         resp = requests.post(
             "https://api.mobilemessage.com.au/v1/messages",
             json=sms_payload,
@@ -812,6 +743,9 @@ class ResendMobileOTPView(APIView):
             ]
         }
 
+        import requests
+        from requests.auth import HTTPBasicAuth
+
         resp = requests.post(
             "https://api.mobilemessage.com.au/v1/messages",
             json=sms_payload,
@@ -896,7 +830,17 @@ class CurrentUserView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        return Response(_build_authenticated_user_payload(request.user), status=200)
+        payload = authenticated_user_payload(request.user)
+        # Clients poll /me; an unchanged payload is answered with a bare 304.
+        etag = payload_etag(payload)
+        client_etags = [tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))]
+        if etag in client_etags:
+            response = HttpResponseNotModified()
+        else:
+            response = Response(payload, status=200)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     """
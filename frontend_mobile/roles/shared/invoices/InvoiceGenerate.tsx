@@ -380,6 +380,8 @@ export default function InvoiceGenerate({ basePath }: Props) {
           total: Number(li.total || 0),
           gst_applicable: li.gst_applicable !== false,
           super_applicable: li.super_applicable !== false,
+          shift_slot_id: li.shiftSlotId ?? null,
+          service_date: li.shiftSlotId ? li.date : null,
         };
       });
 
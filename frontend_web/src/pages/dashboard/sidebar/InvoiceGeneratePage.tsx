@@ -510,6 +510,8 @@ const handleGenerate = () => {
       unit_price:       li.unit_price,
       discount:         li.discount,
       total:            li.total,
+      shift_slot_id:    li.shiftSlotId ?? null,
+      service_date:     li.shiftSlotId ? li.date : null,
     }))
   ));
 
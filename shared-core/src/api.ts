@@ -564,6 +564,13 @@ export async function bulkInviteMembersService(payload) {
     const data = await bulkInviteMembers(payload);
     return data;
 }
+export function startMembershipImport(data) {
+    const body = data instanceof FormData ? data : JSON.stringify(data);
+    return fetchApi('/client-profile/memberships/bulk_import/', { method: 'POST', body });
+}
+export function getMembershipImportStatus(jobId) {
+    return fetchApi(`/client-profile/memberships/bulk_import/${jobId}/`);
+}
 export function deleteMembership(id) {
     return fetchApi(`/client-profile/memberships/${id}/`, { method: 'DELETE' });
 }
@@ -1409,12 +1416,17 @@ export function getRatingsSummary(params) {
     const query = buildQuery(params);
     return fetchApi(`/client-profile/ratings/summary/${query}`);
 }
+export function getRatingsSummaries(params) {
+    const query = buildQuery(params);
+    return fetchApi(`/client-profile/ratings/summaries/${query}`);
+}
 export function getMyRatings(params) {
     const query = buildQuery(params);
     return fetchApi(`/client-profile/ratings/mine/${query}`);
 }
-export function getPendingRatings() {
-    return fetchApi('/client-profile/ratings/pending/');
+export function getPendingRatings(params) {
+    const query = buildQuery(params);
+    return fetchApi(`/client-profile/ratings/pending/${query}`);
 }
 export async function fetchRatingsSummaryService(params) {
     const data = await getRatingsSummary({
@@ -2350,6 +2362,8 @@ export interface CalendarEventFilters {
     dateFrom?: string;
     dateTo?: string;
     source?: string;
+    // Calendar feed only: one entry per recurring series with `occurrence_dates`.
+    compact?: boolean;
 }
 
 export interface WorkNoteFilters {
@@ -2596,6 +2610,7 @@ export function getCalendarFeed(params: CalendarEventFilters) {
         organization_id: params.organizationId,
         date_from: params.dateFrom,
         date_to: params.dateTo,
+        compact: params.compact ? 1 : undefined,
     });
     return fetchApi(`/client-profile/calendar-feed/${query}`);
 }
@@ -80,6 +80,8 @@ export const API_ENDPOINTS = {
     membershipList: '/client-profile/memberships/',
     membershipCreate: '/client-profile/memberships/',
     membershipBulkInvite: '/client-profile/memberships/bulk_invite/',
+    membershipBulkImport: '/client-profile/memberships/bulk_import/',                // POST CSV/JSON file or { invitations } – returns a job
+    membershipBulkImportStatus: (jobId: string | number) => `/client-profile/memberships/bulk_import/${jobId}/`,  // GET – job progress
     membershipDelete: (membershipId: string) => `/client-profile/memberships/${membershipId}/`,
     // Magic membership links & applications
     membershipInviteLinks: '/client-profile/membership-invite-links/',              // POST to create link, GET to list (with ?pharmacy=)
@@ -190,6 +192,7 @@ export const API_ENDPOINTS = {
     // Ratings
     ratings: '/client-profile/ratings/',
     ratingsSummary: '/client-profile/ratings/summary/',
+    ratingsSummaries: '/client-profile/ratings/summaries/',
     ratingsMine: '/client-profile/ratings/mine/',
     ratingsPending: '/client-profile/ratings/pending/',
 